@@ -0,0 +1 @@
+"""离线性能基准（不依赖外部网络服务）。"""
@@ -0,0 +1,4 @@
+"""MinerU 入库吞吐基准（分阶段耗时、峰值内存、可选 profiling）。
+
+使用方式见 benchmarks/ingestion/README.md。
+"""
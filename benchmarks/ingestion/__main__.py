@@ -0,0 +1,200 @@
+"""命令行入口：python -m benchmarks.ingestion --copies 20 --profile cprofile。"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from benchmarks.ingestion.fake_server import FakeEmbeddingServer
+from benchmarks.ingestion.stages import StageTimer
+from benchmarks.retrieval.corpus import DEFAULT_SAMPLE_DIR
+
+logger = logging.getLogger("benchmarks.ingestion")
+
+
+def _default_sample() -> Optional[Path]:
+    outputs = sorted(p for p in DEFAULT_SAMPLE_DIR.iterdir() if (p / "auto").is_dir())
+    return outputs[0] if outputs else None
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="MinerU ingestion throughput benchmark")
+    parser.add_argument("--sample", type=Path, default=_default_sample(), help="MinerU output directory")
+    parser.add_argument("--copies", type=int, default=20, help="ingest the sample N times as distinct sources")
+    parser.add_argument("--collection", default="bench_ingestion")
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fake embedding server latency per request")
+    parser.add_argument("--chunk-strategy", choices=("content_list", "markdown"), default="content_list")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--embed-concurrency", type=int, default=4)
+    parser.add_argument("--write-mode", choices=("orm", "copy"), default="orm", help="VECTOR_WRITE_MODE")
+    parser.add_argument("--profile", choices=("none", "cprofile", "pyinstrument"), default="none")
+    parser.add_argument("--profile-output", type=Path, default=None)
+    parser.add_argument("--output", type=Path, default=None, help="write results as JSON")
+    return parser
+
+
+def make_copies(sample: Path, copies: int, workdir: Path) -> list[Path]:
+    """把样例复制为 copies 个不同 source 的 MinerU 输出（Markdown 重命名，图片目录软链接）。"""
+    sample_auto = sample / "auto"
+    md_file = next(sample_auto.glob("*.md"))
+    content_lists = list(sample_auto.glob("*_content_list.json"))
+    outputs = []
+    for i in range(copies):
+        name = f"{md_file.stem}_{i:04d}"
+        auto = workdir / name / "auto"
+        auto.mkdir(parents=True)
+        (auto / f"{name}.md").write_bytes(md_file.read_bytes())
+        for content_list in content_lists:
+            (auto / f"{name}_content_list.json").write_bytes(content_list.read_bytes())
+        if (sample_auto / "images").is_dir():
+            os.symlink((sample_auto / "images").resolve(), auto / "images", target_is_directory=True)
+        outputs.append(workdir / name)
+    return outputs
+
+
+def configure_environment(args: argparse.Namespace, server: FakeEmbeddingServer, images_dir: Path) -> None:
+    """通过环境变量把入库路径指向本地嵌入服务与临时图片目录。"""
+    import dashscope
+
+    from config.settings import get_settings
+
+    os.environ.update(
+        {
+            "VECTOR_COLLECTION": args.collection,
+            "EMBEDDINGS_DIMENSIONS": str(args.dimensions),
+            "DASHSCOPE_API_KEY": "bench",
+            "FRONTEND_IMAGES_DIR": str(images_dir),
+            "CHUNK_STRATEGY": args.chunk_strategy,
+            "EMBEDDING_BATCH_SIZE": str(args.batch_size),
+            "EMBEDDING_CONCURRENCY": str(args.embed_concurrency),
+            "RETRIEVAL_CACHE_ENABLED": "false",
+            "VECTOR_WRITE_MODE": args.write_mode,
+        }
+    )
+    get_settings.cache_clear()
+    dashscope.base_http_api_url = server.base_url
+
+
+async def _reset_collection(collection: str) -> None:
+    from agent.vectorstore import adelete_collection, initialize_vector_store
+
+    await adelete_collection(collection)
+    await asyncio.to_thread(initialize_vector_store, collection)
+
+
+async def _ingest(sources: list[Path], collection: str) -> tuple[int, float]:
+    from utils.mineru_processor import MineruProcessor
+
+    chunks = 0
+    start = time.perf_counter()
+    for source in sources:
+        result = await MineruProcessor().aprocess(str(source), embed=True, collection_name=collection)
+        chunks += result["chunks_created"]
+    return chunks, time.perf_counter() - start
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def _run(args: argparse.Namespace, sources: list[Path], timer: StageTimer) -> tuple[int, float]:
+    from db.database import DatabaseManager
+
+    await DatabaseManager.initialize()
+    try:
+        await _reset_collection(args.collection)
+        with timer.instrument():
+            return await _ingest(sources, args.collection)
+    finally:
+        await DatabaseManager.close()
+
+
+def _profiled_run(args: argparse.Namespace, sources: list[Path], timer: StageTimer) -> tuple[int, float]:
+    if args.profile == "cprofile":
+        # cProfile 只采样主线程（事件循环）；分块在线程中执行，其耗时见分阶段统计
+        profiler = cProfile.Profile()
+        result = profiler.runcall(asyncio.run, _run(args, sources, timer))
+        output = args.profile_output or Path("ingestion.prof")
+        profiler.dump_stats(output)
+        buffer = io.StringIO()
+        pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(30)
+        sys.stdout.write(buffer.getvalue())
+        logger.info(f"cProfile stats written to {output} (inspect with snakeviz or pstats)")
+        return result
+    if args.profile == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError as e:
+            raise SystemExit("pyinstrument is not installed: pip install pyinstrument") from e
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+        try:
+            result = asyncio.run(_run(args, sources, timer))
+        finally:
+            profiler.stop()
+        sys.stdout.write(profiler.output_text(unicode=True, color=False))
+        if args.profile_output:
+            args.profile_output.write_text(profiler.output_html(), encoding="utf-8")
+        return result
+    return asyncio.run(_run(args, sources, timer))
+
+
+def main(argv: list[str] | None = None) -> None:
+    """命令行入口。"""
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+    logger.setLevel(logging.INFO)
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    args = _build_parser().parse_args(argv)
+    if args.sample is None:
+        raise SystemExit("No MinerU sample found; pass --sample")
+
+    timer = StageTimer()
+    with tempfile.TemporaryDirectory(prefix="bench_ingestion_") as tmp:
+        workdir = Path(tmp)
+        sources = make_copies(args.sample, args.copies, workdir / "sources")
+        with FakeEmbeddingServer(args.dimensions, args.latency_ms) as server:
+            configure_environment(args, server, workdir / "images")
+            chunks, wall = _profiled_run(args, sources, timer)
+
+        report = {
+            "write_mode": args.write_mode,
+            "documents": len(sources),
+            "chunks": chunks,
+            "wall_seconds": round(wall, 3),
+            "documents_per_second": round(len(sources) / wall, 3) if wall else 0.0,
+            "chunks_per_second": round(chunks / wall, 1) if wall else 0.0,
+            "embedding_requests": server.requests,
+            "peak_rss_mb": _peak_rss_mb(),
+            "stages": timer.as_dict(wall),
+        }
+
+    lines = [f"{'stage':<14}{'seconds':>10}{'share':>8}{'calls':>8}"]
+    for stage, data in report["stages"].items():
+        lines.append(f"{stage:<14}{data['seconds']:>10.3f}{data['share']:>8.1%}{data['calls']:>8}")
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.write(json.dumps({k: v for k, v in report.items() if k != "stages"}, indent=2) + "\n")
+    if args.output:
+        args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""本地 DashScope 文本嵌入服务替身：在后台线程中提供
+POST /api/v1/services/embeddings/text-embedding/text-embedding。
+
+入库路径仍然经过真实的 DashScopeEmbeddings 客户端与 DashScope SDK（HTTP、序列化、批次拆分），
+只是服务端换成本地的 HashingEmbeddings，并可注入固定延迟模拟网络与模型耗时。
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from benchmarks.retrieval.embeddings import HashingEmbeddings
+
+
+class FakeEmbeddingServer:
+    """可作为上下文管理器使用的本地嵌入服务。"""
+
+    def __init__(self, dimensions: int = 256, latency_ms: float = 0.0, port: int = 0) -> None:
+        """初始化。
+
+        参数：
+        - dimensions: 返回向量维度
+        - latency_ms: 每个请求的附加延迟（毫秒）
+        - port: 监听端口，0 表示随机空闲端口
+        """
+        self.embeddings = HashingEmbeddings(dimensions)
+        self.latency_seconds = latency_ms / 1000
+        self.requests = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """DashScope SDK 使用的 base_http_api_url。"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:  # noqa: N802
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                inputs = (payload.get("input") or {}).get("texts", [])
+                if server.latency_seconds:
+                    time.sleep(server.latency_seconds)
+                with server._lock:
+                    server.requests += 1
+                    server.texts += len(inputs)
+
+                body = json.dumps(
+                    {
+                        "request_id": "fake",
+                        "output": {
+                            "embeddings": [
+                                {"text_index": i, "embedding": vector}
+                                for i, vector in enumerate(server.embeddings.embed_documents(inputs))
+                            ]
+                        },
+                        "usage": {"total_tokens": 0},
+                    }
+                ).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:  # noqa: A002
+                return
+
+        return Handler
+
+    def start(self) -> "FakeEmbeddingServer":
+        """在后台线程中启动服务。"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """停止服务。"""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeEmbeddingServer":
+        """启动并返回自身。"""
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        """停止服务。"""
+        self.stop()
+
+
+__all__ = ["FakeEmbeddingServer"]
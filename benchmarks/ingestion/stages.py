@@ -0,0 +1,149 @@
+"""入库各阶段计时：在上下文内包装 MineruProcessor 流水线中的各个函数并累计耗时。
+
+同步阶段（图片发布、读取改写、分块、ID 生成）按线程记录独占时间：外层生成器的耗时
+会扣除其内部拉取的下游生成器耗时；异步阶段（嵌入）与写库记录墙钟时间。
+流式入库中读取分块与嵌入写库在不同线程并行，各阶段之和可能大于总耗时。
+"""
+
+from __future__ import annotations
+
+import functools
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, Iterable, Iterator
+from unittest.mock import patch
+
+STAGES = (
+    "image_copy",
+    "read_rewrite",
+    "split",
+    "chunk_ids",
+    "embed",
+    "insert",
+    "reconcile_sql",
+)
+
+
+class StageTimer:
+    """分阶段累计耗时。"""
+
+    def __init__(self) -> None:
+        """初始化计时器。"""
+        self.seconds: dict[str, float] = defaultdict(float)
+        self.calls: dict[str, int] = defaultdict(int)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self) -> list[list[Any]]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _enter(self, stage: str) -> None:
+        self._stack().append([stage, time.perf_counter(), 0.0])
+
+    def _exit(self) -> None:
+        stack = self._stack()
+        stage, start, child = stack.pop()
+        elapsed = time.perf_counter() - start
+        if stack:
+            stack[-1][2] += elapsed
+        self._add(stage, elapsed - child)
+
+    def _add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.seconds[stage] += seconds
+            self.calls[stage] += 1
+
+    def wrap_sync(self, stage: str, func: Callable) -> Callable:
+        """包装同步函数。"""
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self._enter(stage)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._exit()
+
+        return wrapper
+
+    def wrap_iter(self, stage: str, func: Callable[..., Iterable]) -> Callable[..., Iterator]:
+        """包装返回生成器的函数：只统计每次 next() 的耗时。"""
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            iterator = iter(func(*args, **kwargs))
+            while True:
+                self._enter(stage)
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self._exit()
+                yield item
+
+        return wrapper
+
+    def wrap_async(self, stage: str, func: Callable) -> Callable:
+        """包装协程函数（记录墙钟时间）。"""
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self._add(stage, time.perf_counter() - start)
+
+        return wrapper
+
+    def as_dict(self, wall_seconds: float) -> dict[str, dict]:
+        """返回各阶段耗时、调用次数与占总耗时比例。"""
+        return {
+            stage: {
+                "seconds": round(self.seconds.get(stage, 0.0), 4),
+                "calls": self.calls.get(stage, 0),
+                "share": round(self.seconds.get(stage, 0.0) / wall_seconds, 4) if wall_seconds else 0.0,
+            }
+            for stage in STAGES
+        }
+
+    @contextmanager
+    def instrument(self) -> Iterator["StageTimer"]:
+        """在上下文内包装入库流水线中的各阶段函数。"""
+        from langchain_postgres import PGVector
+
+        from utils import mineru_processor as mp
+        from utils.content_list_chunker import ContentListChunker
+        from utils.embedding_pipeline import EmbeddingPipeline
+
+        targets = [
+            (mp.MineruProcessor, "_copy_images", self.wrap_sync("image_copy", mp.MineruProcessor._copy_images)),
+            (mp, "iter_rewritten_lines", self.wrap_iter("read_rewrite", mp.iter_rewritten_lines)),
+            (mp, "iter_json_array", self.wrap_iter("read_rewrite", mp.iter_json_array)),
+            (mp, "iter_split_text", self.wrap_iter("split", mp.iter_split_text)),
+            (ContentListChunker, "iter_split", self.wrap_iter("split", ContentListChunker.iter_split)),
+            (
+                mp.MineruProcessor,
+                "_build_documents",
+                staticmethod(self.wrap_iter("chunk_ids", mp.MineruProcessor._build_documents)),
+            ),
+            (EmbeddingPipeline, "aembed_documents", self.wrap_async("embed", EmbeddingPipeline.aembed_documents)),
+            (PGVector, "add_embeddings", self.wrap_sync("insert", PGVector.add_embeddings)),
+            (mp, "acopy_embeddings", self.wrap_async("insert", mp.acopy_embeddings)),
+            (mp, "afetch_source_chunks", self.wrap_async("reconcile_sql", mp.afetch_source_chunks)),
+            (mp, "aupdate_chunk_metadata", self.wrap_async("reconcile_sql", mp.aupdate_chunk_metadata)),
+            (mp, "adelete_chunks", self.wrap_async("reconcile_sql", mp.adelete_chunks)),
+        ]
+        with ExitStack() as stack:
+            for owner, name, wrapped in targets:
+                stack.enter_context(patch.object(owner, name, wrapped))
+            yield self
+
+
+__all__ = ["STAGES", "StageTimer"]
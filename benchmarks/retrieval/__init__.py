@@ -0,0 +1,4 @@
+"""retrieve_context 端到端检索基准。
+
+使用方式见 benchmarks/retrieval/README.md。
+"""
@@ -0,0 +1,142 @@
+"""命令行入口：python -m benchmarks.retrieval --corpus-size 20000 --queries 200。"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from dataclasses import asdict
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.retrieval.corpus import build_corpus
+from benchmarks.retrieval.embeddings import HashingEmbeddings, use_embeddings
+from benchmarks.retrieval.runner import (
+    IndexConfig,
+    configure_environment,
+    exact_top_k,
+    format_table,
+    load_corpus,
+    measure,
+    prepare_index,
+)
+
+logger = logging.getLogger("benchmarks.retrieval")
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Offline retrieve_context benchmark")
+    parser.add_argument("--collection", default="bench_retrieval")
+    parser.add_argument("--corpus-size", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--indexes", default="none,hnsw,ivfflat")
+    parser.add_argument("--top-k", type=_int_list, default=[4, 10])
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 8])
+    parser.add_argument("--ef-search", type=_int_list, default=[40, 100])
+    parser.add_argument("--probes", type=_int_list, default=[1, 10])
+    parser.add_argument("--hnsw-m", type=int, default=16)
+    parser.add_argument("--hnsw-ef-construction", type=int, default=64)
+    parser.add_argument("--ivfflat-lists", type=int, default=None)
+    parser.add_argument("--mode", choices=("vector", "hybrid"), default="vector")
+    parser.add_argument("--storage", choices=("vector", "halfvec", "binary"), default="vector")
+    parser.add_argument("--rescore-factor", type=int, default=0)
+    parser.add_argument("--skip-load", action="store_true", help="reuse an already loaded collection")
+    parser.add_argument("--output", type=Path, default=None, help="write results as JSON")
+    return parser
+
+
+def _index_configs(args: argparse.Namespace) -> list[IndexConfig]:
+    configs: list[IndexConfig] = []
+    for method in args.indexes.split(","):
+        if method == "none":
+            configs.append(IndexConfig("none", {}, {}))
+        elif method == "hnsw":
+            build = {"m": args.hnsw_m, "ef_construction": args.hnsw_ef_construction}
+            configs += [IndexConfig("hnsw", build, {"ef_search": ef}) for ef in args.ef_search]
+        elif method == "ivfflat":
+            build = {"lists": args.ivfflat_lists}
+            configs += [IndexConfig("ivfflat", build, {"probes": p}) for p in args.probes]
+        else:
+            raise SystemExit(f"Unknown index method: {method}")
+    return configs
+
+
+async def _run(args: argparse.Namespace) -> list[dict]:
+    from db.hybrid_search import migrate_hybrid_search_schema
+    from db.database import DatabaseManager
+
+    embeddings = HashingEmbeddings(args.dimensions)
+    corpus = build_corpus(args.corpus_size, args.queries, seed=args.seed)
+    configure_environment(
+        args.collection, args.dimensions, top_k=max(args.top_k), storage=args.storage
+    )
+
+    results = []
+    await DatabaseManager.initialize()
+    try:
+        with use_embeddings(embeddings):
+            if args.skip_load:
+                vectors = np.vstack([embeddings.embed_array(t) for t in corpus.texts])
+            else:
+                vectors = await load_corpus(corpus, args.collection, embeddings)
+            if args.mode == "hybrid":
+                await migrate_hybrid_search_schema()
+            truth = {k: exact_top_k(corpus, vectors, embeddings, k) for k in args.top_k}
+
+            built: tuple = ()
+            for config in _index_configs(args):
+                if (config.method, config.build) != built:
+                    build_seconds = await prepare_index(args.collection, config, args.dimensions)
+                    built = (config.method, config.build)
+                    if build_seconds is not None:
+                        logger.info(f"{config.method} index built in {build_seconds:.1f}s")
+                for top_k in args.top_k:
+                    configure_environment(
+                        args.collection,
+                        args.dimensions,
+                        top_k=top_k,
+                        retrieval_mode=args.mode,
+                        ef_search=config.search.get("ef_search", 0),
+                        probes=config.search.get("probes", 0),
+                        storage=args.storage,
+                        rescore_factor=args.rescore_factor,
+                    )
+                    for concurrency in args.concurrency:
+                        result = await measure(
+                            corpus.queries,
+                            truth[top_k],
+                            label=config.label(),
+                            top_k=top_k,
+                            concurrency=concurrency,
+                        )
+                        logger.info(f"{result}")
+                        results.append(result)
+    finally:
+        await DatabaseManager.close()
+
+    sys.stdout.write(format_table(results) + "\n")
+    return [asdict(r) for r in results]
+
+
+def main(argv: list[str] | None = None) -> None:
+    """命令行入口。"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    args = _build_parser().parse_args(argv)
+    results = asyncio.run(_run(args))
+    if args.output:
+        args.output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
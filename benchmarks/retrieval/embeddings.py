@@ -0,0 +1,83 @@
+"""确定性的本地嵌入替身：字符二元组特征哈希。
+
+与真实嵌入模型一样，文本重叠越多向量越接近，因此 recall@k 等指标有意义；
+同时完全离线、可复现，并且嵌入耗时可以忽略，测得的延迟只反映检索路径本身。
+"""
+
+from __future__ import annotations
+
+import hashlib
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class HashingEmbeddings(Embeddings):
+    """将文本的字符二元组哈希到固定维度并做 L2 归一化。"""
+
+    def __init__(self, dimensions: int = 256) -> None:
+        """初始化。
+
+        参数：
+        - dimensions: 输出向量维度（需与 EMBEDDINGS_DIMENSIONS 一致）
+        """
+        self.dimensions = dimensions
+
+    def _bucket(self, token: str) -> tuple[int, float]:
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dimensions, 1.0 if value >> 63 else -1.0
+
+    def embed_array(self, text: str) -> np.ndarray:
+        """返回 float32 向量。"""
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        normalized = "".join(ch for ch in text.lower() if ch.isalnum())
+        for i in range(len(normalized) - 1):
+            index, sign = self._bucket(normalized[i : i + 2])
+            vector[index] += sign
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            vector[0] = 1.0
+            return vector
+        return vector / norm
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """批量嵌入文档。"""
+        return [self.embed_array(text).tolist() for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        """嵌入查询。"""
+        return self.embed_array(text).tolist()
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """异步批量嵌入文档（本地计算，直接同步执行）。"""
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """异步嵌入查询。"""
+        return self.embed_query(text)
+
+
+@contextmanager
+def use_embeddings(embeddings: Embeddings) -> Iterator[None]:
+    """在上下文内将 agent.vectorstore.get_embeddings 替换为给定的嵌入实现。
+
+    检索路径（aembed_query、initialize_vector_store、查询向量缓存）都通过
+    该函数获取嵌入模型，因此替换后整个 retrieve_context 都使用本地替身。
+    """
+    from agent import vectorstore
+
+    original = vectorstore.get_embeddings
+    vectorstore.get_embeddings = lru_cache(maxsize=1)(lambda: embeddings)
+    vectorstore.get_embedding_cache.cache_clear()
+    try:
+        yield
+    finally:
+        vectorstore.get_embeddings = original
+        vectorstore.get_embedding_cache.cache_clear()
+
+
+__all__ = ["HashingEmbeddings", "use_embeddings"]
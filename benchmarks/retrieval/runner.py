@@ -0,0 +1,223 @@
+"""retrieve_context 端到端检索基准：延迟分位数、并发 QPS、相对精确检索的 recall@k。"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+
+from benchmarks.retrieval.corpus import SyntheticCorpus
+from benchmarks.retrieval.embeddings import HashingEmbeddings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IndexConfig:
+    """一组待测索引配置。
+
+    字段说明：
+    - method: none / hnsw / ivfflat
+    - build: 构建参数（m、ef_construction 或 lists）
+    - search: 查询参数（ef_search 或 probes），none 时为空
+    """
+
+    method: str
+    build: dict
+    search: dict
+
+    def label(self) -> str:
+        """用于报告的简短描述。"""
+        params = {**self.build, **self.search}
+        return self.method + "".join(f" {k}={v}" for k, v in params.items() if v is not None)
+
+
+@dataclass
+class BenchmarkResult:
+    """单组 (索引配置, top_k, 并发度) 的测量结果。"""
+
+    index: str
+    top_k: int
+    concurrency: int
+    queries: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    qps: float
+    recall: float
+
+
+def configure_environment(
+    collection: str,
+    dimensions: int,
+    *,
+    top_k: int,
+    retrieval_mode: str = "vector",
+    ef_search: int = 0,
+    probes: int = 0,
+    storage: str = "vector",
+    rescore_factor: int = 0,
+) -> None:
+    """通过环境变量配置检索路径，并清空 get_settings 缓存使其生效。
+
+    语义缓存、查询向量缓存与 Rerank 在基准中全部关闭，测得的是每次完整检索的耗时。
+    """
+    from config.settings import get_settings
+
+    os.environ.update(
+        {
+            "VECTOR_COLLECTION": collection,
+            "EMBEDDINGS_DIMENSIONS": str(dimensions),
+            "RETRIEVER_TOP_K": str(top_k),
+            "RETRIEVAL_MODE": retrieval_mode,
+            "HNSW_EF_SEARCH": str(ef_search),
+            "IVFFLAT_PROBES": str(probes),
+            "VECTOR_STORAGE": storage,
+            "VECTOR_RESCORE_FACTOR": str(rescore_factor),
+            "RERANK_ENABLED": "false",
+            "RETRIEVAL_CACHE_ENABLED": "false",
+            "EMBEDDING_CACHE_ENABLED": "false",
+        }
+    )
+    get_settings.cache_clear()
+
+
+async def load_corpus(
+    corpus: SyntheticCorpus,
+    collection: str,
+    embeddings: HashingEmbeddings,
+    *,
+    batch_size: int = 1000,
+) -> np.ndarray:
+    """重建集合并写入语料，返回全部文档块向量（用于计算精确 top-k）。"""
+    from agent.vectorstore import adelete_collection, initialize_vector_store
+
+    vectors = np.vstack([embeddings.embed_array(text) for text in corpus.texts])
+    await adelete_collection(collection)
+    store = await asyncio.to_thread(initialize_vector_store, collection)
+
+    start = time.perf_counter()
+    for offset in range(0, len(corpus), batch_size):
+        end = offset + batch_size
+        await asyncio.to_thread(
+            store.add_embeddings,
+            corpus.texts[offset:end],
+            vectors[offset:end].tolist(),
+            metadatas=corpus.metadatas[offset:end],
+            ids=corpus.ids[offset:end],
+        )
+    logger.info(f"Loaded {len(corpus)} chunks in {time.perf_counter() - start:.1f}s")
+    return vectors
+
+
+def exact_top_k(
+    corpus: SyntheticCorpus,
+    vectors: np.ndarray,
+    embeddings: HashingEmbeddings,
+    top_k: int,
+) -> list[set[str]]:
+    """用 numpy 暴力计算每个查询的精确 top-k（余弦相似度）。"""
+    truth: list[set[str]] = []
+    for query in corpus.queries:
+        scores = vectors @ embeddings.embed_array(query)
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        truth.append({corpus.ids[i] for i in best})
+    return truth
+
+
+async def _timed_retrieve(query: str, call_id: int) -> tuple[float, list[str]]:
+    from tools.retrieval import retrieve_context
+
+    start = time.perf_counter()
+    message = await retrieve_context.ainvoke(
+        {"name": "retrieve_context", "args": {"query": query}, "id": str(call_id), "type": "tool_call"}
+    )
+    elapsed = time.perf_counter() - start
+    return elapsed, [doc.id for doc in message.artifact or []]
+
+
+async def measure(
+    queries: Sequence[str],
+    truth: Sequence[set[str]],
+    *,
+    label: str,
+    top_k: int,
+    concurrency: int,
+    warmup: int = 10,
+) -> BenchmarkResult:
+    """以给定并发度执行全部查询，统计延迟分位数、QPS 与 recall@k。"""
+    for i, query in enumerate(queries[:warmup]):
+        await _timed_retrieve(query, -1 - i)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def worker(i: int) -> tuple[float, list[str]]:
+        async with semaphore:
+            return await _timed_retrieve(queries[i], i)
+
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(worker(i) for i in range(len(queries))))
+    wall = time.perf_counter() - start
+
+    latencies_ms = np.array([elapsed for elapsed, _ in outcomes]) * 1000
+    recalls = [
+        len(expected.intersection(ids)) / len(expected) if expected else 1.0
+        for (_, ids), expected in zip(outcomes, truth)
+    ]
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return BenchmarkResult(
+        index=label,
+        top_k=top_k,
+        concurrency=concurrency,
+        queries=len(queries),
+        p50_ms=round(float(p50), 2),
+        p95_ms=round(float(p95), 2),
+        p99_ms=round(float(p99), 2),
+        mean_ms=round(float(latencies_ms.mean()), 2),
+        qps=round(len(queries) / wall, 1),
+        recall=round(float(np.mean(recalls)), 4),
+    )
+
+
+async def prepare_index(collection: str, config: IndexConfig, dimensions: int) -> Optional[float]:
+    """删除集合已有的 ANN 索引并按配置重建，返回构建耗时（秒）。"""
+    from db.vector_index import create_collection_index, drop_collection_index
+
+    await drop_collection_index(collection)
+    if config.method == "none":
+        return None
+    report = await create_collection_index(
+        collection, config.method, dimensions=dimensions, **config.build
+    )
+    return report.build_seconds
+
+
+def format_table(results: Sequence[BenchmarkResult]) -> str:
+    """将结果格式化为对齐的文本表格。"""
+    headers = ["index", "top_k", "conc", "p50_ms", "p95_ms", "p99_ms", "qps", "recall"]
+    rows = [
+        [r.index, r.top_k, r.concurrency, r.p50_ms, r.p95_ms, r.p99_ms, r.qps, r.recall]
+        for r in results
+    ]
+    widths = [max(len(str(x)) for x in column) for column in zip(headers, *rows)]
+    lines = ["  ".join(str(h).ljust(w) for h, w in zip(headers, widths))]
+    lines += ["  ".join(str(v).ljust(w) for v, w in zip(row, widths)) for row in rows]
+    return "\n".join(lines)
+
+
+__all__ = [
+    "BenchmarkResult",
+    "IndexConfig",
+    "configure_environment",
+    "exact_top_k",
+    "format_table",
+    "load_corpus",
+    "measure",
+    "prepare_index",
+]
@@ -0,0 +1,202 @@
+"""查询向量缓存：进程内 LRU+TTL 一级缓存 + 可选的 Redis 共享二级缓存。"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from infra.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """规范化查询文本：NFKC 归一（全角转半角）、合并空白、去除首尾空白。"""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+@dataclass
+class EmbeddingCacheStats:
+    """查询向量缓存统计。
+
+    字段说明：
+    - local_hits: 进程内缓存命中次数
+    - redis_hits: Redis 缓存命中次数
+    - misses: 两级均未命中、实际调用嵌入接口的次数
+    - coalesced: 与进行中的相同请求合并的次数
+    - redis_errors: Redis 读写失败次数（失败时降级为直接调用嵌入接口）
+    """
+
+    local_hits: int = 0
+    redis_hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    redis_errors: int = 0
+
+    def as_dict(self) -> dict:
+        """转换为便于日志/接口输出的字典。"""
+        lookups = self.local_hits + self.redis_hits + self.misses + self.coalesced
+        hits = lookups - self.misses
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "redis_errors": self.redis_errors,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class EmbeddingCache:
+    """嵌入模型前的两级查询向量缓存。
+
+    缓存键 = 嵌入模型标识 + 规范化后查询文本的 SHA-256。
+    查找顺序：进程内 LRU → Redis → 嵌入接口；相同文本的并发请求只发起一次调用。
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_key: str,
+        *,
+        maxsize: int = 1024,
+        ttl_seconds: int = 86400,
+        redis_client: Any = None,
+        redis_prefix: str = "embedding_cache",
+    ) -> None:
+        """初始化缓存。
+
+        参数：
+        - embeddings: 实际执行嵌入的模型
+        - model_key: 模型标识（模型名称 + 维度等），不同模型的向量互不混用
+        - maxsize: 进程内缓存最大条目数
+        - ttl_seconds: 两级缓存的过期时间（秒）
+        - redis_client: 异步 Redis 客户端，为 None 时仅使用进程内缓存
+        - redis_prefix: Redis key 前缀
+        """
+        self._embeddings = embeddings
+        self._model_key = model_key
+        self._ttl_seconds = ttl_seconds
+        self._local: TTLCache[str, list[float]] = TTLCache(maxsize, ttl_seconds)
+        self._redis = redis_client
+        self._redis_prefix = redis_prefix
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.stats = EmbeddingCacheStats()
+
+    def cache_key(self, text: str) -> str:
+        """生成缓存键。"""
+        digest = hashlib.sha256(normalize_query(text).encode("utf-8")).hexdigest()
+        return f"{self._model_key}:{digest}"
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self._redis_prefix}:{key}"
+
+    async def _redis_get(self, key: str) -> Optional[list[float]]:
+        if self._redis is None:
+            return None
+        try:
+            raw = await self._redis.get(self._redis_key(key))
+        except Exception as e:
+            self.stats.redis_errors += 1
+            logger.warning(f"[EMBEDDING_CACHE] Redis read failed: {e}")
+            return None
+        return json.loads(raw) if raw else None
+
+    async def _redis_set(self, key: str, vector: list[float]) -> None:
+        if self._redis is None:
+            return
+        try:
+            await self._redis.set(
+                self._redis_key(key),
+                json.dumps(vector),
+                ex=self._ttl_seconds if self._ttl_seconds > 0 else None,
+            )
+        except Exception as e:
+            self.stats.redis_errors += 1
+            logger.warning(f"[EMBEDDING_CACHE] Redis write failed: {e}")
+
+    async def _load(self, key: str, text: str) -> list[float]:
+        vector = await self._redis_get(key)
+        if vector is not None:
+            self.stats.redis_hits += 1
+        else:
+            self.stats.misses += 1
+            vector = await self._embeddings.aembed_query(normalize_query(text))
+            await self._redis_set(key, vector)
+        self._local.set(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """返回查询文本的向量，优先使用缓存。"""
+        key = self.cache_key(text)
+        vector = self._local.get(key)
+        if vector is not None:
+            self.stats.local_hits += 1
+            return vector
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.ensure_future(self._load(key, text))
+        self._inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if future.done():
+                self._inflight.pop(key, None)
+            else:
+                future.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+    async def aembed_queries(self, texts: list[str]) -> list[list[float]]:
+        """批量返回多个查询的向量。
+
+        先逐条查两级缓存，剩余未命中的文本（去重后）合并为一次 aembed_documents 请求。
+        """
+        keys = [self.cache_key(text) for text in texts]
+        vectors: dict[str, list[float]] = {}
+        pending: dict[str, str] = {}
+
+        for key, text in zip(keys, texts):
+            if key in vectors or key in pending:
+                continue
+            vector = self._local.get(key)
+            if vector is not None:
+                self.stats.local_hits += 1
+                vectors[key] = vector
+                continue
+            vector = await self._redis_get(key)
+            if vector is not None:
+                self.stats.redis_hits += 1
+                self._local.set(key, vector)
+                vectors[key] = vector
+                continue
+            pending[key] = normalize_query(text)
+
+        if pending:
+            self.stats.misses += len(pending)
+            fresh = await self._embeddings.aembed_documents(list(pending.values()))
+            for key, vector in zip(pending, fresh):
+                self._local.set(key, vector)
+                await self._redis_set(key, vector)
+                vectors[key] = vector
+
+        return [vectors[key] for key in keys]
+
+    def clear(self) -> None:
+        """清空进程内缓存（Redis 中的条目依赖 TTL 过期）。"""
+        self._local.clear()
+
+
+__all__ = ["EmbeddingCache", "EmbeddingCacheStats", "normalize_query"]
@@ -8,23 +8,27 @@
 3. 基于检索的上下文生成答案
 """
 
+import logging
 from datetime import datetime, timezone
 from functools import lru_cache
 from typing import List, Optional
 
-from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END, MessagesState, StateGraph
 from langgraph.prebuilt import ToolNode, tools_condition
 from langgraph.store.base import BaseStore
 
 from agent import prompts
+from agent.thread_documents import get_thread_document_index, has_indexed_uploads
 from config.settings import get_settings
-from tools.retrieval import retrieve_context
+from tools.retrieval import aretrieve_batch, retrieve_context
 from tools.project_search import search_projects
+from tools.uploaded_documents import search_uploaded_documents
 from tools.web_search import web_search
 from utils.llm import load_chat_model
 
+logger = logging.getLogger(__name__)
 
 # ============================================================================
 # 模型
@@ -66,11 +70,13 @@ def _extract_user_question(messages: List) -> str:
 
 
 def _extract_retrieved_context(messages: List) -> str:
-    """返回最新的工具输出（如果有）。"""
+    """返回最近一轮工具调用的全部输出（同一轮可能有多个工具调用）。"""
+    outputs: List[str] = []
     for message in reversed(messages):
-        if isinstance(message, ToolMessage):
-            return message.content
-    return ""
+        if not isinstance(message, ToolMessage):
+            break
+        outputs.append(message.content)
+    return "\n\n".join(reversed(outputs))
 
 
 # ============================================================================
@@ -85,6 +91,8 @@ async def query_or_respond(state: MessagesState, config: Optional[RunnableConfig
         config: 可选的 LangGraph 配置，包含可配置参数
             - chat_model: 使用的聊天模型
             - enable_websearch: 是否启用网络搜索（默认 False）
+            - thread_id: 会话标识；该会话有已索引的上传文档时提供 search_uploaded_documents
+              （历史消息中有索引标记即提供：索引过期时工具会提示用户重新上传，而不是让模型猜测）
         
     返回：
         dict: 更新后的状态，包含 AI 响应（如需检索则包含 tool_calls）
@@ -92,15 +100,23 @@ async def query_or_respond(state: MessagesState, config: Optional[RunnableConfig
     # 从配置中提取参数
     chat_model = None
     enable_websearch = False
+    thread_id = None
     if config and hasattr(config, "configurable") and config.configurable:
         chat_model = config.configurable.get("chat_model")
         enable_websearch = config.configurable.get("enable_websearch", False)
+        thread_id = config.configurable.get("thread_id")
     elif config and isinstance(config, dict) and "configurable" in config:
         chat_model = config["configurable"].get("chat_model")
         enable_websearch = config["configurable"].get("enable_websearch", False)
+        thread_id = config["configurable"].get("thread_id")
     
     # 根据配置构建工具列表
     tools = [retrieve_context]
+    if thread_id and (
+        has_indexed_uploads(state["messages"])
+        or get_thread_document_index().has_documents(thread_id)
+    ):
+        tools.append(search_uploaded_documents)
     settings = get_settings()
     if settings.project_search_enabled:
         tools.append(search_projects)
@@ -143,6 +159,57 @@ async def generate(state: MessagesState, config: Optional[RunnableConfig] = None
     return {"messages": [response]}
 
 
+async def call_tools(state: MessagesState, config: Optional[RunnableConfig] = None):
+    """执行最近一条 AI 消息中的工具调用。
+
+    同一轮中有多个 retrieve_context 调用时，合并为一次嵌入请求 + 一条 SQL
+    （tools.retrieval.aretrieve_batch）；其它工具调用仍交给 ToolNode 执行。
+    批量检索失败时整体回退到 ToolNode 逐个执行。
+
+    参数：
+        state: 最后一条消息为带 tool_calls 的 AIMessage
+        config: LangGraph 配置（透传给 ToolNode）
+
+    返回：
+        dict: 按 tool_calls 顺序排列的 ToolMessage 列表
+    """
+    messages = state["messages"]
+    ai_message = messages[-1]
+    tool_calls = ai_message.tool_calls
+    retrieval_calls = [call for call in tool_calls if call["name"] == retrieve_context.name]
+    if len(retrieval_calls) < 2:
+        return await _tool_node.ainvoke(state, config)
+
+    try:
+        retrieved = await aretrieve_batch([call["args"] for call in retrieval_calls])
+    except Exception as e:
+        logger.warning(f"Batched retrieval failed, falling back to ToolNode: {e}")
+        return await _tool_node.ainvoke(state, config)
+
+    outputs = {
+        call["id"]: ToolMessage(
+            content=content,
+            artifact=artifact,
+            name=call["name"],
+            tool_call_id=call["id"],
+        )
+        for call, (content, artifact) in zip(retrieval_calls, retrieved)
+    }
+
+    other_calls = [call for call in tool_calls if call["id"] not in outputs]
+    if other_calls:
+        remaining = AIMessage(
+            content=ai_message.content,
+            tool_calls=other_calls,
+            id=ai_message.id,
+        )
+        result = await _tool_node.ainvoke({"messages": [*messages[:-1], remaining]}, config)
+        for message in result["messages"]:
+            outputs[message.tool_call_id] = message
+
+    return {"messages": [outputs[call["id"]] for call in tool_calls]}
+
+
 # ============================================================================
 # 构建图
 # ============================================================================
@@ -151,16 +218,18 @@ async def generate(state: MessagesState, config: Optional[RunnableConfig] = None
 workflow = StateGraph(MessagesState)
 
 # 根据配置构建工具列表
-_tools = [retrieve_context]
+_tools = [retrieve_context, search_uploaded_documents]
 _settings = get_settings()
 if _settings.project_search_enabled:
     _tools.append(search_projects)
 if _settings.tavily_api_key:
     _tools.append(web_search)
 
+_tool_node = ToolNode(_tools)
+
 # 添加节点
 workflow.add_node("query_or_respond", query_or_respond)
-workflow.add_node("tools", ToolNode(_tools))
+workflow.add_node("tools", call_tools)
 workflow.add_node("generate", generate)
 
 # 设置入口点
@@ -0,0 +1,267 @@
+"""检索结果语义缓存：按查询向量的余弦距离命中，按集合代数（generation）失效。"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import count
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from config.settings import get_settings
+from infra.cache import CacheStats
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    """单条缓存记录。"""
+
+    collection: str
+    params_key: str
+    generation: int
+    vector: np.ndarray
+    result: Any
+    expires_at: float
+
+
+@dataclass
+class SemanticCacheStats(CacheStats):
+    """语义缓存统计（在 CacheStats 基础上增加失效次数）。"""
+
+    invalidations: int = 0
+    last_hit_distance: Optional[float] = None
+
+    def as_dict(self) -> dict:
+        """转换为便于日志/接口输出的字典。"""
+        return {**super().as_dict(), "invalidations": self.invalidations}
+
+
+class SemanticResultCache:
+    """`retrieve_context` 最终输出 (content, artifact) 的语义缓存。
+
+    - 查找：在同一集合、同一检索参数、当前代数的条目中，找到与查询向量余弦距离最小者；
+      距离不超过 max_distance 即命中
+    - 失效：每个集合维护一个代数计数器，写入新文档时递增，旧代数的条目全部失效
+    - 可选 Redis：代数计数器存放在 Redis 中，使多个 worker 之间的失效保持一致
+
+    未配置 Redis 时失效只作用于当前进程：其他进程（批量入库 CLI、其他 worker）写入的文档
+    要等条目 TTL 过期后才会反映到本进程的缓存中。
+    """
+
+    def __init__(
+        self,
+        *,
+        max_distance: float = 0.08,
+        maxsize: int = 512,
+        ttl_seconds: int = 300,
+        redis_client: Any = None,
+        redis_prefix: str = "retrieval_cache",
+    ) -> None:
+        """初始化缓存。
+
+        参数：
+        - max_distance: 命中所需的最大余弦距离（1 - 余弦相似度）
+        - maxsize: 最大条目数，超过时淘汰最久未使用的条目
+        - ttl_seconds: 条目存活时间（秒）
+        - redis_client: 异步 Redis 客户端，用于跨 worker 共享集合代数
+        - redis_prefix: Redis key 前缀
+        """
+        self.max_distance = max_distance
+        self.maxsize = max(1, maxsize)
+        self.ttl_seconds = ttl_seconds
+        self.stats = SemanticCacheStats()
+        self._redis = redis_client
+        self._redis_prefix = redis_prefix
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._generations: dict[str, int] = {}
+        self._ids = count()
+
+    # ------------------------------------------------------------------
+    # 集合代数
+    # ------------------------------------------------------------------
+
+    def _generation_key(self, collection: str) -> str:
+        return f"{self._redis_prefix}:generation:{collection}"
+
+    async def current_generation(self, collection: str) -> int:
+        """返回集合当前代数（启用 Redis 时以 Redis 为准）。"""
+        if self._redis is not None:
+            try:
+                raw = await self._redis.get(self._generation_key(collection))
+                return int(raw or 0)
+            except Exception as e:
+                logger.warning(f"[RETRIEVAL_CACHE] Redis generation read failed: {e}")
+        return self._generations.get(collection, 0)
+
+    def _drop_collection(self, collection: str) -> None:
+        self._generations[collection] = self._generations.get(collection, 0) + 1
+        for entry_id in [i for i, e in self._entries.items() if e.collection == collection]:
+            del self._entries[entry_id]
+        self.stats.invalidations += 1
+
+    async def _bump_shared_generation(self, collection: str) -> None:
+        try:
+            await self._redis.incr(self._generation_key(collection))
+        except Exception as e:
+            logger.warning(f"[RETRIEVAL_CACHE] Redis generation bump failed: {e}")
+
+    async def ainvalidate_collection(self, collection: str) -> None:
+        """递增集合代数，使该集合的全部缓存条目失效。
+
+        未配置 Redis 时只影响当前进程，其他进程的条目在 TTL 过期后失效。
+        """
+        self._drop_collection(collection)
+        if self._redis is not None:
+            await self._bump_shared_generation(collection)
+
+    def invalidate_collection(self, collection: str) -> None:
+        """同步版本的失效接口，供同步写入路径调用。
+
+        本进程条目立即失效；如果当前线程有运行中的事件循环，
+        Redis 中的共享代数会在后台递增。
+        """
+        self._drop_collection(collection)
+        if self._redis is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logger.warning(
+                f"[RETRIEVAL_CACHE] No running loop; shared generation for "
+                f"{collection} not bumped (entries expire via TTL)"
+            )
+            return
+        loop.create_task(self._bump_shared_generation(collection))
+
+    # ------------------------------------------------------------------
+    # 读写
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        arr = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(arr))
+        return arr / norm if norm else arr
+
+    async def aget(
+        self,
+        collection: str,
+        embedding: Sequence[float],
+        params_key: str = "",
+        *,
+        generation: Optional[int] = None,
+    ) -> Optional[Any]:
+        """查找语义相近的缓存结果，未命中返回 None。
+
+        参数：
+        - collection: 集合名称
+        - embedding: 查询向量
+        - params_key: 影响检索结果的参数（top_k、rerank 等）组成的键
+        - generation: 已读取的集合代数，为 None 时重新读取
+        """
+        if generation is None:
+            generation = await self.current_generation(collection)
+        now = time.monotonic()
+
+        candidates: list[tuple[int, _Entry]] = []
+        for entry_id, entry in list(self._entries.items()):
+            if entry.collection != collection or entry.params_key != params_key:
+                continue
+            if entry.expires_at <= now or entry.generation != generation:
+                del self._entries[entry_id]
+                continue
+            candidates.append((entry_id, entry))
+
+        if not candidates:
+            self.stats.misses += 1
+            return None
+
+        query = self._normalize(embedding)
+        matrix = np.vstack([entry.vector for _, entry in candidates])
+        distances = 1.0 - matrix @ query
+        best = int(np.argmin(distances))
+        best_distance = float(distances[best])
+
+        if best_distance > self.max_distance:
+            self.stats.misses += 1
+            return None
+
+        entry_id, entry = candidates[best]
+        self._entries.move_to_end(entry_id)
+        self.stats.hits += 1
+        self.stats.last_hit_distance = best_distance
+        return entry.result
+
+    async def aset(
+        self,
+        collection: str,
+        embedding: Sequence[float],
+        result: Any,
+        params_key: str = "",
+        *,
+        generation: Optional[int] = None,
+    ) -> None:
+        """写入检索结果。
+
+        generation 应传入检索开始前读取的代数，这样检索期间发生的写入
+        会使本条结果立即失效，而不是被当作新代数的结果缓存下来。
+        """
+        if generation is None:
+            generation = await self.current_generation(collection)
+        expires_at = (
+            time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else float("inf")
+        )
+        self._entries[next(self._ids)] = _Entry(
+            collection=collection,
+            params_key=params_key,
+            generation=generation,
+            vector=self._normalize(embedding),
+            result=result,
+            expires_at=expires_at,
+        )
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def clear(self) -> None:
+        """清空所有条目。"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        """返回当前条目数。"""
+        return len(self._entries)
+
+
+@lru_cache(maxsize=1)
+def get_retrieval_cache() -> SemanticResultCache:
+    """返回缓存的检索结果语义缓存实例。"""
+    settings = get_settings()
+    redis_client = None
+    if settings.retrieval_cache_redis_enabled:
+        try:
+            from infra.redis_pubsub import get_redis_client
+
+            redis_client = get_redis_client()
+        except RuntimeError as e:
+            logger.warning(f"Retrieval cache Redis tier disabled: {e}")
+    if redis_client is None:
+        logger.warning(
+            "[RETRIEVAL_CACHE] Invalidation is process-local without Redis; writes from other "
+            f"processes become visible after RETRIEVAL_CACHE_TTL_SECONDS={settings.retrieval_cache_ttl_seconds}s"
+        )
+    return SemanticResultCache(
+        max_distance=settings.retrieval_cache_max_distance,
+        maxsize=settings.retrieval_cache_size,
+        ttl_seconds=settings.retrieval_cache_ttl_seconds,
+        redis_client=redis_client,
+    )
+
+
+__all__ = ["SemanticResultCache", "SemanticCacheStats", "get_retrieval_cache"]
@@ -0,0 +1,361 @@
+"""会话内上传文档的检索索引：按 thread_id 隔离的内存向量索引 + PGVector 持久化。
+
+聊天时上传的大文档不再整篇拼进用户消息（否则每一轮都把全文发给 LLM，并写进每个 checkpoint），
+而是在首次出现时分块、嵌入一次，存入该会话的索引；代理通过
+search_uploaded_documents 工具只检索相关片段，提示词长度与首 token 延迟不再随上传大小增长。
+
+- 内存索引是进程内的热缓存，空闲超过 ttl_seconds 或会话数超过 max_threads 时按最久未使用淘汰
+- THREAD_DOCS_PERSIST=true（默认）时块与向量同时写入该会话专属的 PGVector 集合
+  （thread_collection_name）；内存中没有该会话（过期、被淘汰、进程重启或由其他 worker 处理）时，
+  检索或追加上传前先把集合整体加载回内存，之前上传的文档不会丢失
+- 集合与会话的 checkpoint 一样长期保留，只在删除会话（DELETE /threads/{thread_id}）时删除
+- 同一会话重复上传同一份文档（按内容 SHA-256）不会重复嵌入
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.messages import HumanMessage
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from agent.vectorstore import acopy_embeddings, adelete_collection, afetch_collection_embeddings
+from config.settings import get_settings
+from db.vector_index import aget_collection_id
+
+logger = logging.getLogger(__name__)
+
+EmbedFunc = Callable[[Sequence[Document]], Awaitable[list[list[float]]]]
+
+# chat 路由在带有已索引上传文档的用户消息 additional_kwargs 中写入的键（值为文件名列表）
+INDEXED_UPLOADS_KWARG = "indexed_uploads"
+
+# 会话文档集合名称前缀
+THREAD_COLLECTION_PREFIX = "thread_docs_"
+
+
+def has_indexed_uploads(messages: Sequence[Any]) -> bool:
+    """会话历史中是否有建立了检索索引的上传文档（用户消息的 additional_kwargs 标记，不看消息文本）。"""
+    return any(
+        isinstance(message, HumanMessage) and message.additional_kwargs.get(INDEXED_UPLOADS_KWARG)
+        for message in messages
+    )
+
+
+def thread_collection_name(thread_id: str) -> str:
+    """返回会话上传文档的 PGVector 集合名称。"""
+    return f"{THREAD_COLLECTION_PREFIX}{thread_id}"
+
+
+class PGVectorThreadStore:
+    """会话上传文档的持久化存储：每个会话一个 PGVector 集合。"""
+
+    @staticmethod
+    def _chunk_id(collection_name: str, chunk: Document) -> str:
+        """由 (集合, 文档内容哈希, 块序号) 生成确定性 ID，重复写入时覆盖而不是新增。"""
+        name = f"{collection_name}\x00{chunk.metadata['digest']}\x00{chunk.metadata['chunk_index']}"
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, name))
+
+    async def aadd(
+        self, thread_id: str, chunks: Sequence[Document], vectors: Sequence[Sequence[float]]
+    ) -> int:
+        """写入文档块与向量（集合不存在时自动创建），返回写入行数。"""
+        collection_name = thread_collection_name(thread_id)
+        return await acopy_embeddings(
+            [chunk.page_content for chunk in chunks],
+            vectors,
+            [chunk.metadata for chunk in chunks],
+            [self._chunk_id(collection_name, chunk) for chunk in chunks],
+            collection_name=collection_name,
+        )
+
+    async def aload(self, thread_id: str) -> list[tuple[Document, list[float]]]:
+        """读取会话集合中全部 (文档块, 向量)；集合不存在时返回空列表。"""
+        return await afetch_collection_embeddings(thread_collection_name(thread_id))
+
+    async def aexists(self, thread_id: str) -> bool:
+        """会话集合是否存在。"""
+        return await aget_collection_id(thread_collection_name(thread_id)) is not None
+
+    async def adrop(self, thread_id: str) -> None:
+        """删除会话集合（不存在时忽略）。"""
+        if await self.aexists(thread_id):
+            await adelete_collection(thread_collection_name(thread_id))
+
+
+@dataclass
+class _ThreadEntry:
+    """单个会话的索引。"""
+
+    chunks: list[Document] = field(default_factory=list)
+    matrix: Optional[np.ndarray] = None  # 归一化后的块向量，形状 (块数, 维度)
+    digests: set[str] = field(default_factory=set)
+    filenames: list[str] = field(default_factory=list)
+    expires_at: float = float("inf")
+
+
+class ThreadDocumentIndex:
+    """按 thread_id 隔离的上传文档内存向量索引。"""
+
+    def __init__(
+        self,
+        embed: EmbedFunc,
+        *,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        max_threads: int = 128,
+        ttl_seconds: int = 7200,
+        store: Optional[PGVectorThreadStore] = None,
+    ) -> None:
+        """初始化索引。
+
+        参数：
+        - embed: 嵌入 Document 列表的异步函数（返回与输入顺序一致的向量）
+        - chunk_size: 分块大小（字符）
+        - chunk_overlap: 相邻块重叠字符数
+        - max_threads: 最多保留的会话数，超过时淘汰最久未使用的会话
+        - ttl_seconds: 会话索引的空闲过期时间（秒），0 表示不过期
+        - store: 持久化存储；为 None 时只使用内存索引
+        """
+        self._embed = embed
+        self._splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            add_start_index=True,
+        )
+        self.max_threads = max(1, max_threads)
+        self.ttl_seconds = ttl_seconds
+        self._threads: OrderedDict[str, _ThreadEntry] = OrderedDict()
+        self._store = store
+
+    def _touch(self, entry: _ThreadEntry) -> None:
+        entry.expires_at = (
+            time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else float("inf")
+        )
+
+    def _get(self, thread_id: str) -> Optional[_ThreadEntry]:
+        """返回未过期的会话索引并刷新其使用时间。"""
+        entry = self._threads.get(thread_id)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._threads[thread_id]
+            return None
+        self._threads.move_to_end(thread_id)
+        self._touch(entry)
+        return entry
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for thread_id in [t for t, e in self._threads.items() if e.expires_at <= now]:
+            del self._threads[thread_id]
+        while len(self._threads) > self.max_threads:
+            thread_id, _ = self._threads.popitem(last=False)
+            logger.info(f"[THREAD_DOCS] Evicted index of thread {thread_id}")
+
+    @staticmethod
+    def _normalize(vectors: Sequence[Sequence[float]]) -> np.ndarray:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
+
+    def _entry_for_update(self, thread_id: str) -> _ThreadEntry:
+        """返回会话索引，不存在时新建。"""
+        entry = self._get(thread_id)
+        if entry is None:
+            entry = _ThreadEntry()
+            self._touch(entry)
+            self._threads[thread_id] = entry
+        return entry
+
+    def _merge(
+        self, entry: _ThreadEntry, chunks: Sequence[Document], vectors: Sequence[Sequence[float]]
+    ) -> tuple[list[Document], list[Sequence[float]]]:
+        """把块加入会话索引（跳过索引中已有的文档），返回实际加入的块与向量。"""
+        kept_chunks: list[Document] = []
+        kept_vectors: list[Sequence[float]] = []
+        added: set[str] = set()
+        for chunk, vector in zip(chunks, vectors):
+            digest = chunk.metadata["digest"]
+            if digest in entry.digests:
+                continue
+            if digest not in added:
+                added.add(digest)
+                entry.filenames.append(chunk.metadata["source"])
+            kept_chunks.append(chunk)
+            kept_vectors.append(vector)
+        entry.digests |= added
+        if kept_chunks:
+            new_matrix = self._normalize(kept_vectors)
+            entry.matrix = (
+                new_matrix if entry.matrix is None else np.vstack([entry.matrix, new_matrix])
+            )
+            entry.chunks.extend(kept_chunks)
+        return kept_chunks, kept_vectors
+
+    async def _aload(self, thread_id: str) -> Optional[_ThreadEntry]:
+        """返回会话索引；内存中没有时从持久化存储加载（存储中也没有时返回 None）。"""
+        entry = self._get(thread_id)
+        if entry is not None or self._store is None:
+            return entry
+        try:
+            rows = await self._store.aload(thread_id)
+        except Exception as e:
+            logger.error(f"[THREAD_DOCS] Failed to load persisted chunks of thread {thread_id}: {e}")
+            return None
+        if not rows:
+            return None
+        # 加载期间可能有并发请求建立了该会话的内存索引，合并时跳过其中已有的文档
+        rows.sort(key=lambda row: (row[0].metadata["digest"], row[0].metadata["chunk_index"]))
+        entry = self._entry_for_update(thread_id)
+        loaded, _ = self._merge(entry, [doc for doc, _ in rows], [vector for _, vector in rows])
+        self._evict()
+        logger.info(f"[THREAD_DOCS] Loaded {len(loaded)} persisted chunks for thread {thread_id}")
+        return entry
+
+    async def aadd_documents(self, thread_id: str, documents: Sequence[Any]) -> int:
+        """分块、嵌入并加入会话索引。
+
+        参数：
+        - thread_id: 会话线程标识
+        - documents: 带 filename / format / markdown_content 属性的上传文档
+
+        返回：
+        - 新增的块数（已索引过的文档跳过）
+        """
+        pending: list[tuple[str, Any]] = []
+        entry = await self._aload(thread_id)
+        for doc in documents:
+            digest = hashlib.sha256(doc.markdown_content.encode("utf-8")).hexdigest()
+            if entry is not None and digest in entry.digests:
+                continue
+            if any(digest == d for d, _ in pending):
+                continue
+            pending.append((digest, doc))
+        if not pending:
+            return 0
+
+        chunks: list[Document] = []
+        for digest, doc in pending:
+            pieces = self._splitter.create_documents(
+                [doc.markdown_content],
+                metadatas=[{"source": doc.filename, "format": doc.format, "digest": digest}],
+            )
+            for i, piece in enumerate(pieces):
+                piece.metadata["chunk_index"] = i
+            chunks.extend(pieces)
+
+        start = time.perf_counter()
+        vectors = await self._embed(chunks) if chunks else []
+
+        # 嵌入期间可能有并发请求写入了同一会话，重新获取并跳过已索引的文档
+        entry = self._entry_for_update(thread_id)
+        kept_chunks, kept_vectors = self._merge(entry, chunks, vectors)
+        self._evict()
+
+        if kept_chunks and self._store is not None:
+            try:
+                await self._store.aadd(thread_id, kept_chunks, kept_vectors)
+            except Exception as e:
+                # 内存索引仍可用，只是无法跨进程 / 重启保留
+                logger.error(f"[THREAD_DOCS] Failed to persist chunks of thread {thread_id}: {e}")
+
+        logger.info(
+            f"[THREAD_DOCS] Indexed {len(kept_chunks)} chunks from {len(pending)} documents "
+            f"for thread {thread_id} in {(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+        return len(kept_chunks)
+
+    def search(
+        self, thread_id: str, embedding: Sequence[float], k: int = 6
+    ) -> list[tuple[Document, float]]:
+        """按余弦相似度检索会话内最相关的 k 个块。
+
+        返回：
+        - (文档块, 相似度) 列表，按相似度从高到低；会话没有索引时返回空列表
+        """
+        entry = self._get(thread_id)
+        if entry is None or entry.matrix is None:
+            return []
+        query = self._normalize(embedding)
+        scores = entry.matrix @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(entry.chunks[i], float(scores[i])) for i in top]
+
+    async def asearch(
+        self, thread_id: str, embedding: Sequence[float], k: int = 6
+    ) -> list[tuple[Document, float]]:
+        """检索会话内最相关的 k 个块；内存中没有该会话时先从持久化存储加载。"""
+        await self._aload(thread_id)
+        return self.search(thread_id, embedding, k)
+
+    def filenames(self, thread_id: str) -> list[str]:
+        """返回会话已索引的文档文件名（没有索引时返回空列表）。"""
+        entry = self._get(thread_id)
+        return list(entry.filenames) if entry is not None else []
+
+    def has_documents(self, thread_id: str) -> bool:
+        """会话是否有可检索的上传文档。"""
+        entry = self._get(thread_id)
+        return entry is not None and entry.matrix is not None
+
+    async def ahas_documents(self, thread_id: str) -> bool:
+        """会话是否有可检索的上传文档（内存索引或持久化存储中）。"""
+        entry = await self._aload(thread_id)
+        return entry is not None and entry.matrix is not None
+
+    def drop(self, thread_id: str) -> None:
+        """删除会话的内存索引。"""
+        self._threads.pop(thread_id, None)
+
+    async def adrop(self, thread_id: str) -> None:
+        """删除会话的内存索引与持久化存储。"""
+        self.drop(thread_id)
+        if self._store is not None:
+            await self._store.adrop(thread_id)
+
+    def __len__(self) -> int:
+        """返回当前保留的会话数。"""
+        return len(self._threads)
+
+
+async def _aembed_chunks(chunks: Sequence[Document]) -> list[list[float]]:
+    """使用入库嵌入流水线（分批、并发、重试）嵌入文档块。"""
+    from utils.embedding_pipeline import get_embedding_pipeline
+
+    return await get_embedding_pipeline().aembed_documents(chunks)
+
+
+@lru_cache(maxsize=1)
+def get_thread_document_index() -> ThreadDocumentIndex:
+    """返回进程内共享的会话文档索引。"""
+    settings = get_settings()
+    return ThreadDocumentIndex(
+        _aembed_chunks,
+        chunk_size=settings.chunk_size,
+        chunk_overlap=settings.chunk_overlap,
+        max_threads=settings.thread_docs_max_threads,
+        ttl_seconds=settings.thread_docs_ttl_seconds,
+        store=PGVectorThreadStore() if settings.thread_docs_persist else None,
+    )
+
+
+__all__ = [
+    "INDEXED_UPLOADS_KWARG",
+    "PGVectorThreadStore",
+    "ThreadDocumentIndex",
+    "get_thread_document_index",
+    "has_indexed_uploads",
+    "thread_collection_name",
+]
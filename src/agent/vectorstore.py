@@ -1,28 +1,73 @@
 """RAG 系统的向量存储工具。
 
 主要工作流：使用 MinerU 处理器（utils.mineru_processor）进行文档处理。
+检索路径使用原生异步查询（asimilarity_search），直接复用 DatabaseManager 连接池。
 下面的遗留函数支持 PyPDFLoader 以实现向后兼容性。
 """
 
+import asyncio
+import logging
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional, Sequence
 
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_community.embeddings import DashScopeEmbeddings
+from langchain_community.embeddings.dashscope import embed_with_retry
 from langchain_core.documents import Document
 from langchain_postgres import PGVector
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from psycopg import sql
+from psycopg.types.json import Jsonb
 
+from agent.embedding_cache import EmbeddingCache
 from config.settings import get_settings
+from db.database import DatabaseManager
+from db.hybrid_search import BIGRAM_SEPARATORS
+from db.vector_index import (
+    IndexLayout,
+    aget_collection_id,
+    aget_index_layout,
+    ann_distance,
+    drop_collection_index,
+    exact_distance,
+    invalidate_collection_id,
+)
 
+logger = logging.getLogger(__name__)
 
+
+class _DashScopeEmbeddings(DashScopeEmbeddings):
+    """DashScopeEmbeddings，可选向 text-embedding-v3/v4 请求降维输出（dimension 参数）。"""
+
+    dimension: Optional[int] = None
+
+    def _embed(self, texts: Any, text_type: str) -> list[dict]:
+        kwargs = {"dimension": self.dimension} if self.dimension else {}
+        return embed_with_retry(self, input=texts, text_type=text_type, model=self.model, **kwargs)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """嵌入文档文本（text_type=document）。"""
+        return [item["embedding"] for item in self._embed(texts, "document")]
+
+    def embed_query(self, text: str) -> list[float]:
+        """嵌入查询文本（text_type=query）。"""
+        return self._embed(text, "query")[0]["embedding"]
+
+
+@lru_cache(maxsize=1)
 def get_embeddings() -> DashScopeEmbeddings:
-    """初始化 DashScope Qwen 嵌入模型。"""
+    """返回缓存的 DashScope Qwen 嵌入模型。
+
+    DashScope SDK 只提供同步调用；aembed_query / aembed_documents 由 langchain 的
+    Embeddings 基类放到线程池中执行，不阻塞事件循环。
+    """
     settings = get_settings()
-    return DashScopeEmbeddings(
+    return _DashScopeEmbeddings(
         model=settings.embeddings_model,
         dashscope_api_key=settings.dashscope_api_key,
+        # 降维输出：向量更小，索引与存储随之缩小
+        dimension=settings.embeddings_dimensions if settings.embeddings_request_dimensions else None,
     )
 
 
@@ -53,6 +98,8 @@ def initialize_vector_store(
         connection=connection_string,
         use_jsonb=True,
     )
+    # PGVector 初始化时可能新建集合，丢弃可能过期的集合 UUID 缓存
+    invalidate_collection_id(collection_name)
     
     return vector_store
 
@@ -75,6 +122,753 @@ def get_vector_store(
     return initialize_vector_store(collection_name=collection_name)
 
 
+async def adelete_collection(collection_name: str) -> None:
+    """删除集合及其全部文档块，并丢弃该集合的 UUID / 索引缓存与缓存的 PGVector 实例。
+
+    按集合的 ANN 部分索引（WHERE collection_id = ...）不会随集合删除，先一并删除。
+    之后再调用 get_vector_store(collection_name) 会重新创建空集合（新的 UUID）。
+    """
+    collection_name = resolve_collection_name(collection_name)
+    if await aget_collection_id(collection_name) is not None:
+        await drop_collection_index(collection_name)
+    store = await asyncio.to_thread(initialize_vector_store, collection_name)
+    await asyncio.to_thread(store.delete_collection)
+    invalidate_collection_id(collection_name)
+    get_vector_store.cache_clear()
+
+
+def resolve_collection_name(collection_name: Optional[str] = None) -> str:
+    """将默认占位名称 "pdf_documents"（或 None）解析为配置的默认集合。"""
+    if collection_name is None or collection_name == "pdf_documents":
+        return get_settings().default_collection
+    return collection_name
+
+
+@lru_cache(maxsize=1)
+def get_embedding_cache() -> EmbeddingCache:
+    """返回缓存的查询向量缓存（进程内 LRU+TTL，可选 Redis 共享层）。"""
+    settings = get_settings()
+    redis_client = None
+    if settings.embedding_cache_redis_enabled:
+        try:
+            from infra.redis_pubsub import get_redis_client
+
+            redis_client = get_redis_client()
+        except RuntimeError as e:
+            logger.warning(f"Embedding cache Redis tier disabled: {e}")
+    return EmbeddingCache(
+        get_embeddings(),
+        model_key=(
+            f"{settings.embeddings_model}:{settings.embeddings_dimensions}"
+            if settings.embeddings_request_dimensions
+            else settings.embeddings_model
+        ),
+        maxsize=settings.embedding_cache_size,
+        ttl_seconds=settings.embedding_cache_ttl_seconds,
+        redis_client=redis_client,
+    )
+
+
+async def aembed_query(query: str) -> list[float]:
+    """异步嵌入查询文本（启用缓存时经过两级查询向量缓存）。"""
+    if get_settings().embedding_cache_enabled:
+        return await get_embedding_cache().aembed_query(query)
+    return await get_embeddings().aembed_query(query)
+
+
+async def aembed_queries(queries: Sequence[str]) -> list[list[float]]:
+    """批量嵌入多个查询文本（未命中缓存的部分合并为一次嵌入请求）。"""
+    if get_settings().embedding_cache_enabled:
+        return await get_embedding_cache().aembed_queries(list(queries))
+    return await get_embeddings().aembed_documents(list(queries))
+
+
+def _to_vector_literal(embedding: Sequence[float]) -> str:
+    """将向量转换为 pgvector 文本字面量（'[x1,x2,...]'）。"""
+    return "[" + ",".join(repr(float(x)) for x in embedding) + "]"
+
+
+async def _apply_search_params(
+    cur,
+    k: int,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    filtered: bool = False,
+) -> None:
+    """在当前事务内设置 ANN 查询参数（set_config(..., true) 仅对本事务生效）。
+
+    未显式传入时使用 HNSW_EF_SEARCH / IVFFLAT_PROBES，值为 0 则保持服务端默认。
+    HNSW 每次最多返回 ef_search 个结果，因此 ef_search 至少取 k。
+    带元数据过滤时，按 VECTOR_ITERATIVE_SCAN 开启 pgvector 0.8+ 的迭代扫描，
+    避免索引扫描的候选被过滤后不足 k 条。
+    """
+    settings = get_settings()
+    if filtered and settings.vector_iterative_scan:
+        for name in ("hnsw.iterative_scan", "ivfflat.iterative_scan"):
+            await cur.execute(
+                "SELECT set_config(%s, %s, true)", (name, settings.vector_iterative_scan)
+            )
+    ef_search = ef_search if ef_search is not None else settings.hnsw_ef_search
+    probes = probes if probes is not None else settings.ivfflat_probes
+    if ef_search:
+        await cur.execute(
+            "SELECT set_config('hnsw.ef_search', %s, true)", (str(max(ef_search, k)),)
+        )
+    if probes:
+        await cur.execute("SELECT set_config('ivfflat.probes', %s, true)", (str(probes),))
+
+
+def _rescore_candidates(k: int, layout: Optional[IndexLayout]) -> int:
+    """量化索引的候选数：集合索引为量化精度且 VECTOR_RESCORE_FACTOR > 1 时取 k * factor。"""
+    factor = get_settings().vector_rescore_factor
+    if layout is not None and layout.storage != "vector" and factor > 1:
+        return k * factor
+    return k
+
+
+def _candidate_sql(
+    query_vector: sql.Composable,
+    collection_id: str,
+    filters: sql.Composable,
+    limit: sql.Composable,
+    layout: Optional[IndexLayout],
+    columns: sql.Composable = sql.SQL("e.id, e.document, e.cmetadata"),
+) -> sql.Composed:
+    """按 ANN 索引表达式取候选，并计算全精度余弦距离。
+
+    排序使用与集合索引一致的（可能是量化的）距离以命中索引；集合没有登记索引时
+    直接按未做维度转换的全精度距离排序。返回的 distance 总是全精度，
+    外层按 distance 重排即得到全精度 top-k。
+    """
+    dimensions = layout.dimensions if layout is not None else None
+    return sql.SQL(
+        """
+        SELECT {columns}, {exact} AS distance
+        FROM langchain_pg_embedding e
+        WHERE e.collection_id = {collection_id} {filters}
+        ORDER BY {ann}
+        LIMIT {limit}
+        """
+    ).format(
+        columns=columns,
+        exact=exact_distance(query_vector, dimensions),
+        ann=ann_distance(query_vector, dimensions, layout.storage if layout else "vector"),
+        collection_id=sql.Literal(collection_id),
+        filters=filters,
+        limit=limit,
+    )
+
+
+# ============================================================================
+# 元数据预过滤（source / document_type）
+# ============================================================================
+
+# 支持预过滤的元数据字段（MineruProcessor._build_documents 写入）
+METADATA_FILTER_KEYS = ("source", "document_type")
+
+# 按 (collection_id, cmetadata->>key) 建立表达式 B-tree 索引：
+# 过滤条件选择性高时，规划器先用索引缩小候选集，再对少量行计算距离；
+# 其它键的等值过滤走已有的 cmetadata GIN（jsonb_path_ops）索引
+def _metadata_index_name(key: str) -> str:
+    return f"ix_langchain_pg_embedding_meta_{key}"
+
+
+# CONCURRENTLY：在已有数据的表上建索引时不阻塞写入（连接池为 autocommit，不在事务块内执行）
+METADATA_INDEX_SQL = tuple(
+    f"""
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS {_metadata_index_name(key)}
+    ON langchain_pg_embedding (collection_id, (cmetadata->>'{key}'))
+    """
+    for key in METADATA_FILTER_KEYS
+)
+
+MetadataFilter = dict[str, Any]
+
+
+async def ensure_metadata_indexes() -> None:
+    """并发创建元数据预过滤所需的表达式索引（幂等）。
+
+    CONCURRENTLY 构建中断会留下无效索引，IF NOT EXISTS 会跳过它，因此先删除无效的同名索引。
+    """
+    pool = await DatabaseManager.get_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT to_regclass('langchain_pg_embedding')")
+            row = await cur.fetchone()
+            if row is None or row[0] is None:
+                logger.warning("langchain_pg_embedding does not exist yet; metadata indexes skipped")
+                return
+            for key, statement in zip(METADATA_FILTER_KEYS, METADATA_INDEX_SQL):
+                name = _metadata_index_name(key)
+                await cur.execute(
+                    "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)",
+                    (name,),
+                )
+                invalid = await cur.fetchone()
+                if invalid is not None and invalid[0]:
+                    logger.warning(f"Dropping invalid metadata index {name}")
+                    await cur.execute(
+                        sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(name))
+                    )
+                await cur.execute(statement)
+    logger.info("Metadata filter indexes are ready")
+
+
+def _metadata_filter_sql(
+    metadata_filter: Optional[MetadataFilter],
+) -> tuple[sql.Composable, dict[str, Any]]:
+    """将元数据过滤条件转换为 WHERE 子句片段（以 AND 开头）与查询参数。
+
+    - source / document_type：`cmetadata->>key = ANY(...)`，值可以是字符串或字符串列表
+    - 其它键：`cmetadata @> {...}` 等值包含匹配
+    - 值为 None 或空列表的键会被忽略
+    """
+    clauses: list[sql.Composable] = []
+    params: dict[str, Any] = {}
+    containment: dict[str, Any] = {}
+
+    for key, value in (metadata_filter or {}).items():
+        if value is None or value == []:
+            continue
+        if key in METADATA_FILTER_KEYS:
+            values = [value] if isinstance(value, str) else [str(v) for v in value]
+            param = f"filter_{key}"
+            clauses.append(
+                sql.SQL("AND e.cmetadata->>{key} = ANY({param})").format(
+                    key=sql.Literal(key), param=sql.Placeholder(param)
+                )
+            )
+            params[param] = values
+        else:
+            containment[key] = value
+
+    if containment:
+        clauses.append(sql.SQL("AND e.cmetadata @> {}::jsonb").format(sql.Placeholder("filter_contains")))
+        params["filter_contains"] = Jsonb(containment)
+
+    return sql.SQL(" ").join(clauses), params
+
+
+async def asimilarity_search_by_vector_with_score(
+    embedding: Sequence[float],
+    k: Optional[int] = None,
+    collection_name: str = "pdf_documents",
+    *,
+    metadata_filter: Optional[MetadataFilter] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> list[tuple[Document, float]]:
+    """在共享异步连接池上按向量执行余弦距离检索。
+
+    直接查询 PGVector 的 langchain_pg_embedding 表，不经过 SQLAlchemy 同步引擎，
+    因此不会占用线程池线程。集合 UUID 以字面量写入 SQL；集合在 db.vector_index 登记了
+    索引时，排序使用与该索引相同的 embedding::vector(N)（或其量化）表达式以命中按集合的
+    部分索引，量化索引可按 VECTOR_RESCORE_FACTOR 多取候选后以全精度重排。
+
+    参数：
+        embedding: 查询向量
+        k: 返回的文档数量，默认使用 RETRIEVER_TOP_K
+        collection_name: 向量存储中集合的名称
+        metadata_filter: 元数据预过滤条件，如 {"source": "xx.pdf", "document_type": "mineru_markdown"}
+        ef_search: 本次查询的 hnsw.ef_search，默认使用 HNSW_EF_SEARCH
+        probes: 本次查询的 ivfflat.probes，默认使用 IVFFLAT_PROBES
+
+    返回：
+        (Document, 余弦距离) 元组列表，按距离升序排列
+    """
+    settings = get_settings()
+    if k is None:
+        k = settings.retriever_top_k
+    collection_name = resolve_collection_name(collection_name)
+    collection_id = await aget_collection_id(collection_name)
+    if collection_id is None:
+        logger.warning(f"Collection {collection_name} does not exist; returning no results")
+        return []
+    layout = await aget_index_layout(collection_id)
+    candidates = _rescore_candidates(k, layout)
+    filter_sql, filter_params = _metadata_filter_sql(metadata_filter)
+
+    query = sql.SQL(
+        """
+        SELECT id, document, cmetadata, distance
+        FROM ({candidates}) c
+        ORDER BY distance
+        LIMIT %(k)s
+        """
+    ).format(
+        candidates=_candidate_sql(
+            sql.Placeholder("embedding"),
+            collection_id,
+            filter_sql,
+            sql.Placeholder("candidates"),
+            layout,
+        ),
+    )
+
+    pool = await DatabaseManager.get_pool()
+    async with pool.connection() as conn:
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                await _apply_search_params(
+                    cur, candidates, ef_search, probes, filtered=bool(filter_params)
+                )
+                await cur.execute(
+                    query,
+                    {
+                        "embedding": _to_vector_literal(embedding),
+                        "k": k,
+                        "candidates": candidates,
+                        **filter_params,
+                    },
+                )
+                rows = await cur.fetchall()
+
+    return [
+        (
+            Document(id=row_id, page_content=document or "", metadata=cmetadata or {}),
+            float(distance),
+        )
+        for row_id, document, cmetadata, distance in rows
+    ]
+
+
+async def abatch_similarity_search_by_vector(
+    embeddings: Sequence[Sequence[float]],
+    k: Optional[int] = None,
+    collection_name: str = "pdf_documents",
+    *,
+    metadata_filter: Optional[MetadataFilter] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> list[list[tuple[Document, float]]]:
+    """在一条 SQL 中为多个查询向量分别检索 top-k。
+
+    查询向量以数组传入，经 unnest ... WITH ORDINALITY 展开后，
+    通过 CROSS JOIN LATERAL 对每个向量执行与单条检索相同的 ORDER BY distance LIMIT k，
+    因此每个子查询同样可以命中按集合的 ANN 部分索引。
+
+    参数：
+        embeddings: 查询向量列表
+        k: 每个查询返回的文档数量，默认使用 RETRIEVER_TOP_K
+        collection_name: 向量存储中集合的名称
+        metadata_filter: 元数据预过滤条件（对所有查询生效）
+        ef_search: 本次查询的 hnsw.ef_search，默认使用 HNSW_EF_SEARCH
+        probes: 本次查询的 ivfflat.probes，默认使用 IVFFLAT_PROBES
+
+    返回：
+        与 embeddings 顺序一致的结果列表，每项为 (Document, 余弦距离) 列表
+    """
+    if not embeddings:
+        return []
+    settings = get_settings()
+    if k is None:
+        k = settings.retriever_top_k
+    collection_name = resolve_collection_name(collection_name)
+    collection_id = await aget_collection_id(collection_name)
+    if collection_id is None:
+        logger.warning(f"Collection {collection_name} does not exist; returning no results")
+        return [[] for _ in embeddings]
+    layout = await aget_index_layout(collection_id)
+    candidates = _rescore_candidates(k, layout)
+    filter_sql, filter_params = _metadata_filter_sql(metadata_filter)
+
+    query = sql.SQL(
+        """
+        SELECT q.ord, r.id, r.document, r.cmetadata, r.distance
+        FROM unnest(%(embeddings)s::text[]) WITH ORDINALITY AS q(vec, ord)
+        CROSS JOIN LATERAL (
+            SELECT id, document, cmetadata, distance
+            FROM ({candidates}) c
+            ORDER BY distance
+            LIMIT %(k)s
+        ) r
+        ORDER BY q.ord, r.distance
+        """
+    ).format(
+        candidates=_candidate_sql(
+            sql.SQL("q.vec"), collection_id, filter_sql, sql.Placeholder("candidates"), layout
+        ),
+    )
+
+    pool = await DatabaseManager.get_pool()
+    async with pool.connection() as conn:
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                await _apply_search_params(
+                    cur, candidates, ef_search, probes, filtered=bool(filter_params)
+                )
+                await cur.execute(
+                    query,
+                    {
+                        "embeddings": [_to_vector_literal(e) for e in embeddings],
+                        "k": k,
+                        "candidates": candidates,
+                        **filter_params,
+                    },
+                )
+                rows = await cur.fetchall()
+
+    results: list[list[tuple[Document, float]]] = [[] for _ in embeddings]
+    for ordinal, row_id, document, cmetadata, distance in rows:
+        results[ordinal - 1].append(
+            (
+                Document(id=row_id, page_content=document or "", metadata=cmetadata or {}),
+                float(distance),
+            )
+        )
+    return results
+
+
+async def asimilarity_search(
+    query: str,
+    k: Optional[int] = None,
+    collection_name: str = "pdf_documents",
+    metadata_filter: Optional[MetadataFilter] = None,
+) -> list[Document]:
+    """异步嵌入查询并在向量存储中检索最相似的文档。
+
+    参数：
+        query: 查询文本
+        k: 返回的文档数量，默认使用 RETRIEVER_TOP_K
+        collection_name: 向量存储中集合的名称
+        metadata_filter: 元数据预过滤条件
+
+    返回：
+        按相似度排序的 Document 列表
+    """
+    embedding = await aembed_query(query)
+    results = await asimilarity_search_by_vector_with_score(
+        embedding, k=k, collection_name=collection_name, metadata_filter=metadata_filter
+    )
+    return [doc for doc, _ in results]
+
+
+# ============================================================================
+# 按 source 的文档块增量维护
+# ============================================================================
+
+
+async def afetch_source_chunks(
+    source: str, collection_name: str = "pdf_documents"
+) -> dict[str, dict]:
+    """返回集合中某个 source 已存储的文档块 {行 ID: cmetadata}。"""
+    collection_id = await aget_collection_id(resolve_collection_name(collection_name))
+    if collection_id is None:
+        return {}
+
+    pool = await DatabaseManager.get_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT id, cmetadata FROM langchain_pg_embedding
+                WHERE collection_id = %s::uuid AND cmetadata->>'source' = %s
+                """,
+                (collection_id, source),
+            )
+            rows = await cur.fetchall()
+    return {row_id: cmetadata or {} for row_id, cmetadata in rows}
+
+
+async def afetch_collection_embeddings(
+    collection_name: str = "pdf_documents",
+) -> list[tuple[Document, list[float]]]:
+    """返回集合中全部文档块及其向量（用于把小集合整体加载到内存，如会话上传文档）。"""
+    collection_id = await aget_collection_id(resolve_collection_name(collection_name))
+    if collection_id is None:
+        return []
+
+    pool = await DatabaseManager.get_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT id, document, cmetadata, embedding::real[]
+                FROM langchain_pg_embedding
+                WHERE collection_id = %s::uuid
+                ORDER BY id
+                """,
+                (collection_id,),
+            )
+            rows = await cur.fetchall()
+    return [
+        (Document(id=row_id, page_content=document or "", metadata=cmetadata or {}), list(embedding))
+        for row_id, document, cmetadata, embedding in rows
+    ]
+
+
+async def aupdate_chunk_metadata(
+    metadata_by_id: dict[str, dict], collection_name: str = "pdf_documents"
+) -> int:
+    """批量替换文档块的 cmetadata（内容与向量不变），返回更新行数。"""
+    collection_id = await aget_collection_id(resolve_collection_name(collection_name))
+    if collection_id is None or not metadata_by_id:
+        return 0
+
+    pool = await DatabaseManager.get_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                UPDATE langchain_pg_embedding e
+                SET cmetadata = u.cmetadata
+                FROM unnest(%s::varchar[], %s::jsonb[]) AS u(id, cmetadata)
+                WHERE e.id = u.id AND e.collection_id = %s::uuid
+                """,
+                (
+                    list(metadata_by_id),
+                    [Jsonb(metadata) for metadata in metadata_by_id.values()],
+                    collection_id,
+                ),
+            )
+            return cur.rowcount
+
+
+async def adelete_chunks(ids: Sequence[str], collection_name: str = "pdf_documents") -> int:
+    """删除集合中的指定文档块，返回删除行数。"""
+    collection_id = await aget_collection_id(resolve_collection_name(collection_name))
+    if collection_id is None or not ids:
+        return 0
+
+    pool = await DatabaseManager.get_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                DELETE FROM langchain_pg_embedding
+                WHERE collection_id = %s::uuid AND id = ANY(%s::varchar[])
+                """,
+                (collection_id, list(ids)),
+            )
+            return cur.rowcount
+
+
+# COPY 暂存表：只在当前事务内存在，提交后自动删除
+_COPY_STAGE_SQL = """
+CREATE TEMP TABLE rag_embedding_stage (
+    id varchar,
+    embedding vector,
+    document varchar,
+    cmetadata jsonb
+) ON COMMIT DROP
+"""
+
+# 与 PGVector.add_embeddings 相同的 upsert 语义：ID 已存在时覆盖向量、内容与元数据
+_COPY_MERGE_SQL = """
+INSERT INTO langchain_pg_embedding (id, collection_id, embedding, document, cmetadata)
+SELECT id, %s::uuid, embedding, document, cmetadata FROM rag_embedding_stage
+ON CONFLICT (id) DO UPDATE SET
+    embedding = EXCLUDED.embedding,
+    document = EXCLUDED.document,
+    cmetadata = EXCLUDED.cmetadata
+"""
+
+
+async def acopy_embeddings(
+    texts: Sequence[str],
+    embeddings: Sequence[Sequence[float]],
+    metadatas: Sequence[dict],
+    ids: Sequence[str],
+    collection_name: str = "pdf_documents",
+) -> int:
+    """通过 COPY 批量写入文档块，返回写入行数。
+
+    行数据以 COPY 协议流式写入事务内的临时表，再用一条 INSERT ... ON CONFLICT
+    合并到 langchain_pg_embedding；相比 PGVector 的 ORM 路径，省去了 SQLAlchemy
+    逐行构造参数与超长多值 INSERT 的解析开销。
+
+    参数：
+        texts: 文档块内容
+        embeddings: 向量（与 texts 一一对应）
+        metadatas: 元数据
+        ids: 行 ID
+        collection_name: 向量存储集合名称
+
+    返回：
+        写入（插入或覆盖）的行数
+    """
+    if not texts:
+        return 0
+    name = resolve_collection_name(collection_name)
+    collection_id = await aget_collection_id(name)
+    if collection_id is None:
+        # 集合尚不存在：由 PGVector 创建（与 ORM 写入路径一致）
+        await asyncio.to_thread(get_vector_store, collection_name)
+        collection_id = await aget_collection_id(name)
+        if collection_id is None:
+            raise ValueError(f"Collection not found: {name}")
+
+    pool = await DatabaseManager.get_pool()
+    async with pool.connection() as conn:
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                await cur.execute(_COPY_STAGE_SQL)
+                async with cur.copy(
+                    "COPY rag_embedding_stage (id, embedding, document, cmetadata) FROM STDIN"
+                ) as copy:
+                    for row_id, embedding, text, metadata in zip(ids, embeddings, texts, metadatas):
+                        await copy.write_row(
+                            (row_id, _to_vector_literal(embedding), text, Jsonb(metadata or {}))
+                        )
+                await cur.execute(_COPY_MERGE_SQL, (collection_id,))
+                return cur.rowcount
+
+
+# ============================================================================
+# 混合检索（中文二元组全文检索 + 向量检索，RRF 融合）
+# ============================================================================
+
+# 二元组全文检索依赖 langchain_pg_embedding.document_bigrams 列及其 GIN 索引，
+# 由一次性迁移创建：python -m db.hybrid_search migrate
+
+# 单次查询最多使用的二元组数量，避免超长问题生成过大的 tsquery
+MAX_QUERY_BIGRAMS = 64
+
+
+_BIGRAM_SEPARATOR_SET = frozenset(BIGRAM_SEPARATORS)
+
+
+def _keep_for_bigrams(ch: str) -> bool:
+    """与 rag_bigram_tsvector 一致：去除 BIGRAM_SEPARATORS 中显式列出的空白与标点。"""
+    return ch not in _BIGRAM_SEPARATOR_SET
+
+
+def query_bigrams(text: str) -> list[str]:
+    """将查询文本切分为去重的二元组（与 rag_bigram_tsvector 的切分方式一致）。
+
+    引号与反斜杠属于标点、已被去除，因此生成的词素无需转义即可直接拼接为 tsquery。
+    """
+    normalized = "".join(ch for ch in text.lower() if _keep_for_bigrams(ch))
+    bigrams = dict.fromkeys(normalized[i : i + 2] for i in range(len(normalized) - 1))
+    return list(bigrams)[:MAX_QUERY_BIGRAMS]
+
+
+def _bigram_tsquery(bigrams: Sequence[str], operator: str) -> Optional[str]:
+    if not bigrams:
+        return None
+    return f" {operator} ".join(f"'{bigram}'" for bigram in bigrams)
+
+
+async def ahybrid_search_by_vector(
+    query: str,
+    embedding: Sequence[float],
+    k: Optional[int] = None,
+    collection_name: str = "pdf_documents",
+    *,
+    metadata_filter: Optional[MetadataFilter] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> list[tuple[Document, float, bool]]:
+    """在一条 SQL 中执行向量检索 + 二元组全文检索，并用 RRF 融合排序。
+
+    两路各取 HYBRID_CANDIDATES 个候选，融合分数为 Σ 1 / (HYBRID_RRF_K + rank)。
+
+    参数：
+        query: 查询文本（用于全文检索）
+        embedding: 查询向量（用于向量检索）
+        k: 返回的文档数量，默认使用 RETRIEVER_TOP_K
+        collection_name: 向量存储中集合的名称
+        metadata_filter: 元数据预过滤条件（同时作用于向量与全文两路）
+        ef_search: 本次查询的 hnsw.ef_search，默认使用 HNSW_EF_SEARCH
+        probes: 本次查询的 ivfflat.probes，默认使用 IVFFLAT_PROBES
+
+    返回：
+        (Document, RRF 分数, exact_match) 元组列表，按分数降序排列；
+        exact_match 表示文档包含查询的全部二元组（如公司名、项目代码的精确命中）
+    """
+    settings = get_settings()
+    if k is None:
+        k = settings.retriever_top_k
+    collection_name = resolve_collection_name(collection_name)
+    collection_id = await aget_collection_id(collection_name)
+    if collection_id is None:
+        logger.warning(f"Collection {collection_name} does not exist; returning no results")
+        return []
+    bigrams = query_bigrams(query)
+    candidates = max(settings.hybrid_candidates, k)
+    layout = await aget_index_layout(collection_id)
+    vector_candidates = _rescore_candidates(candidates, layout)
+    filter_sql, filter_params = _metadata_filter_sql(metadata_filter)
+
+    statement = sql.SQL(
+        """
+        WITH vec AS (
+            SELECT id, rnk
+            FROM (
+                SELECT id, row_number() OVER (ORDER BY distance) AS rnk
+                FROM ({vector_candidates}) v
+            ) ranked
+            WHERE rnk <= %(candidates)s
+        ),
+        lex AS (
+            SELECT id, row_number() OVER (ORDER BY lex_score DESC) AS rnk
+            FROM (
+                SELECT e.id, ts_rank(e.document_bigrams, q.query) AS lex_score
+                FROM langchain_pg_embedding e,
+                     (SELECT %(any_query)s::tsquery AS query) q
+                WHERE e.collection_id = {collection_id} {filters}
+                  AND e.document_bigrams @@ q.query
+                ORDER BY lex_score DESC
+                LIMIT %(candidates)s
+            ) l
+        ),
+        fused AS (
+            SELECT id, sum(1.0 / (%(rrf_k)s + rnk)) AS score
+            FROM (SELECT id, rnk FROM vec UNION ALL SELECT id, rnk FROM lex) ranked
+            GROUP BY id
+        )
+        SELECT e.id, e.document, e.cmetadata, f.score,
+               coalesce(e.document_bigrams @@ %(all_query)s::tsquery, false) AS exact_match
+        FROM fused f
+        JOIN langchain_pg_embedding e ON e.id = f.id
+        ORDER BY f.score DESC
+        LIMIT %(k)s
+        """
+    ).format(
+        vector_candidates=_candidate_sql(
+            sql.Placeholder("embedding"),
+            collection_id,
+            filter_sql,
+            sql.Placeholder("vector_candidates"),
+            layout,
+            columns=sql.SQL("e.id"),
+        ),
+        collection_id=sql.Literal(collection_id),
+        filters=filter_sql,
+    )
+
+    pool = await DatabaseManager.get_pool()
+    async with pool.connection() as conn:
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                await _apply_search_params(
+                    cur, vector_candidates, ef_search, probes, filtered=bool(filter_params)
+                )
+                await cur.execute(
+                    statement,
+                    {
+                        "embedding": _to_vector_literal(embedding),
+                        "any_query": _bigram_tsquery(bigrams, "|"),
+                        "all_query": _bigram_tsquery(bigrams, "&"),
+                        "candidates": candidates,
+                        "vector_candidates": vector_candidates,
+                        "rrf_k": settings.hybrid_rrf_k,
+                        "k": k,
+                        **filter_params,
+                    },
+                )
+                rows = await cur.fetchall()
+
+    return [
+        (
+            Document(id=row_id, page_content=document or "", metadata=cmetadata or {}),
+            float(score),
+            bool(exact_match),
+        )
+        for row_id, document, cmetadata, score, exact_match in rows
+    ]
+
+
 def load_and_split_pdfs(
     pdf_dir: str = "./data",
     chunk_size: Optional[int] = None,
@@ -200,8 +994,25 @@ def get_retriever(
 
 __all__ = [
     "get_embeddings",
+    "get_embedding_cache",
+    "resolve_collection_name",
+    "aembed_query",
+    "aembed_queries",
     "initialize_vector_store",
     "get_vector_store",
+    "adelete_collection",
+    "asimilarity_search",
+    "asimilarity_search_by_vector_with_score",
+    "abatch_similarity_search_by_vector",
+    "ahybrid_search_by_vector",
+    "afetch_source_chunks",
+    "afetch_collection_embeddings",
+    "aupdate_chunk_metadata",
+    "adelete_chunks",
+    "acopy_embeddings",
+    "ensure_metadata_indexes",
+    "METADATA_FILTER_KEYS",
+    "query_bigrams",
     "load_and_split_pdfs",
     "index_documents",
     "get_retriever",
@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+import asyncio
+import logging
 import sys
 
 from contextlib import asynccontextmanager
@@ -12,16 +14,23 @@ from fastapi.middleware.cors import CORSMiddleware
 
 # Windows 需要选择器事件循环以实现 psycopg/asyncio 兼容性
 if sys.platform == "win32":
-    import asyncio
-
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 from agent.graph import build_graph
+from agent.vectorstore import ensure_metadata_indexes, get_vector_store
+from config.settings import get_settings
 from db.checkpointer import CheckpointerManager
 from db.database import DatabaseManager
+from db.hybrid_search import hybrid_search_schema_ready
 from api.routes.chat import router as chat_router
 from api.routes.stream import router as stream_router
 from api.routes.documents import router as documents_router
+from infra.jobs import close_job_manager
+from utils.markitdown_converter import close_conversion_pool, get_conversion_pool
+from utils.mineru_processor import close_ingestion_pool
+from utils.reranker import close_reranker
+
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
@@ -30,12 +39,29 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     await DatabaseManager.initialize()
     await CheckpointerManager.initialize()
 
+    # PGVector 初始化时创建表，然后补充元数据过滤所需的索引
+    await asyncio.to_thread(get_vector_store)
+    await ensure_metadata_indexes()
+    # 混合检索的生成列会重写整张表，由一次性迁移创建，启动时只做检查
+    if get_settings().retrieval_mode == "hybrid" and not await hybrid_search_schema_ready():
+        logger.error(
+            "RETRIEVAL_MODE=hybrid but document_bigrams is missing; "
+            "run `python -m db.hybrid_search migrate` before serving hybrid queries"
+        )
+
     checkpointer = CheckpointerManager.get_checkpointer()
     app.state.graph = build_graph(checkpointer=checkpointer)
 
+    # 预先启动文档转换进程（工作进程在后台加载 MarkItDown）
+    await get_conversion_pool().start()
+
     try:
         yield
     finally:
+        await close_job_manager()
+        await close_ingestion_pool()
+        await close_conversion_pool()
+        await close_reranker()
         await CheckpointerManager.close()
         await DatabaseManager.close()
 
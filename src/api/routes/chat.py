@@ -5,15 +5,17 @@ from __future__ import annotations
 import asyncio
 import logging
 import time
-from typing import Any
+from typing import Any, Optional
 
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 
+from agent.thread_documents import INDEXED_UPLOADS_KWARG, get_thread_document_index
 from api.dependencies import get_graph, get_redis_publisher
 from db.checkpointer import CheckpointerManager
 from api.schemas import (
     ChatRequest,
     ChatResponse,
+    DocumentMetadata,
     StreamStartResponse,
     HistoryMessage,
     ThreadHistory,
@@ -121,6 +123,52 @@ def _normalize_update(obj: Any) -> Any:
     return obj
 
 
+def _build_document_section(
+    documents: list[DocumentMetadata],
+    *,
+    index_large: bool = True,
+) -> tuple[str, list[DocumentMetadata]]:
+    """把上传文档拼接为消息中的 <uploaded_documents> 段落。
+
+    ✅ 规则：
+    - 不超过 THREAD_DOCS_INLINE_MAX_CHARS 字符的文档直接附带全文
+    - 更大的文档只保留标记和一句提示，全文交给会话内检索索引
+      （agent.thread_documents），代理通过 search_uploaded_documents 工具检索相关片段
+    - index_large=False（检索索引建立失败时的回退）时，大文档截断到
+      THREAD_DOCS_INLINE_MAX_CHARS 字符后附带
+    - THREAD_DOCS_ENABLED=false 时所有文档都附带全文（旧行为）
+
+    参数：
+    - documents: 请求中的上传文档
+    - index_large: 大文档是否交给检索索引
+
+    返回：
+    - (doc_section, to_index): 追加到用户消息后的段落，以及需要建立检索索引的文档
+    """
+    settings = get_settings()
+    doc_section = "\n\n<uploaded_documents>\n"
+    to_index: list[DocumentMetadata] = []
+    for idx, doc in enumerate(documents):
+        content = doc.markdown_content
+        limit = settings.thread_docs_inline_max_chars
+        if settings.thread_docs_enabled and len(content) > limit:
+            if index_large:
+                to_index.append(doc)
+                content = (
+                    f"[{len(content)} characters, indexed for retrieval. "
+                    "Use the search_uploaded_documents tool to look up relevant passages.]"
+                )
+            else:
+                content = (
+                    f"{content[:limit]}\n[Truncated: showing the first {limit} "
+                    f"of {len(content)} characters.]"
+                )
+        # Include metadata in markers for frontend to parse
+        doc_section += f'<document index="{idx}" filename="{doc.filename}" format="{doc.format}">\n{content}\n</document>\n'
+    doc_section += "</uploaded_documents>"
+    return doc_section, to_index
+
+
 async def _stream_workflow_to_redis(
     *,
     graph,
@@ -128,6 +176,8 @@ async def _stream_workflow_to_redis(
     config: dict[str, Any],
     thread_id: str,
     publisher: RedisPublisher,
+    documents: Optional[list[DocumentMetadata]] = None,
+    fallback_payload: Optional[dict[str, Any]] = None,
 ) -> None:
     """后台执行工作流并将节点更新发布到 Redis。
 
@@ -144,6 +194,8 @@ async def _stream_workflow_to_redis(
     - config: LangGraph 配置，包含 thread_id、user_id
     - thread_id: 会话线程 ID，用于 Redis 频道命名
     - publisher: Redis 发布器实例
+    - documents: 需要先加入会话检索索引的上传文档（在执行工作流之前完成分块和嵌入）
+    - fallback_payload: 检索索引建立失败时改用的输入（大文档截断后直接附带在消息中）
 
     事件发布：
     - workflow:{thread_id}:{node_name}:token - LLM token 流式输出
@@ -166,8 +218,19 @@ async def _stream_workflow_to_redis(
     timeout_seconds = settings.workflow_timeout_seconds
 
     async def _process_stream():
+        workflow_input = payload
+        if documents:
+            try:
+                await get_thread_document_index().aadd_documents(thread_id, documents)
+            except Exception as e:
+                logger.error(
+                    f"Failed to index uploaded documents for thread {thread_id}, "
+                    f"inlining truncated content instead: {e}"
+                )
+                workflow_input = fallback_payload or payload
+
         async for stream_mode, chunk in graph.astream(
-            payload,
+            workflow_input,
             config,
             stream_mode=["updates", "messages", "custom"],
         ):
@@ -305,6 +368,8 @@ async def chat_stream_endpoint(
     - 实际工作流在后台异步执行，通过 Redis Pub/Sub 推送更新
     - 前端需要主动订阅 WebSocket 才能接收更新
     - 同一个 thread_id 可以多次调用，共享对话上下文
+    - 超过 THREAD_DOCS_INLINE_MAX_CHARS 的上传文档不随消息发送全文，
+      而是在工作流开始前分块嵌入到该 thread 的检索索引中
     """
     config: dict[str, Any] = {"configurable": {"thread_id": req.thread_id}}
     if req.user_id:
@@ -314,20 +379,26 @@ async def chat_stream_endpoint(
     if req.enable_websearch:
         config["configurable"]["enable_websearch"] = req.enable_websearch
 
-    # Combine message with uploaded documents for LLM
+    # Combine message with uploaded documents for LLM（大文档只保留标记，全文进入会话检索索引）
     message_content = req.message
+    to_index: list[DocumentMetadata] = []
     if req.documents:
-        # Add document metadata markers for frontend extraction
-        doc_section = "\n\n<uploaded_documents>\n"
-        for idx, doc in enumerate(req.documents):
-            # Include metadata in markers for frontend to parse
-            doc_section += f'<document index="{idx}" filename="{doc.filename}" format="{doc.format}">\n{doc.markdown_content}\n</document>\n'
-        doc_section += "</uploaded_documents>"
+        doc_section, to_index = _build_document_section(req.documents)
         message_content += doc_section
 
     payload: dict[str, Any] = {
         "messages": [{"role": "user", "content": message_content}]
     }
+    fallback_payload: Optional[dict[str, Any]] = None
+    if to_index:
+        # 结构化标记（不依赖消息文本）：图据此在后续轮次提供 search_uploaded_documents 工具
+        payload["messages"][0]["additional_kwargs"] = {
+            INDEXED_UPLOADS_KWARG: [doc.filename for doc in to_index]
+        }
+        fallback_section, _ = _build_document_section(req.documents, index_large=False)
+        fallback_payload = {
+            "messages": [{"role": "user", "content": req.message + fallback_section}]
+        }
 
     background_tasks.add_task(
         _stream_workflow_to_redis,
@@ -336,6 +407,8 @@ async def chat_stream_endpoint(
         config=config,
         thread_id=req.thread_id,
         publisher=publisher,
+        documents=to_index,
+        fallback_payload=fallback_payload,
     )
 
     return StreamStartResponse(
@@ -675,6 +748,9 @@ async def delete_thread(thread_id: str):
                     f"{writes_deleted} checkpoint_writes, "
                     f"and {blobs_deleted} checkpoint_blobs for thread {thread_id}"
                 )
+
+        # 删除该会话上传文档的内存索引与 PGVector 集合
+        await get_thread_document_index().adrop(thread_id)
         
         return None
     except Exception as exc:
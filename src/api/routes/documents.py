@@ -5,22 +5,42 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+import os
+import shutil
+import tempfile
 import time
+from contextlib import aclosing
 from typing import Optional
 
 from fastapi import APIRouter, File, HTTPException, UploadFile, status
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from utils.markitdown_converter import convert_upload_file
-from utils.mineru_processor import MineruProcessor, ProcessingRequest, ProcessingResponse
+from agent.retrieval_cache import get_retrieval_cache
+from agent.vectorstore import resolve_collection_name
+from config.settings import get_settings
+from infra.jobs import JobReporter, get_job_manager
+from utils.markitdown_converter import (
+    SpooledUpload,
+    UploadTooLargeError,
+    convert_spooled_upload,
+    get_conversion_cache,
+    get_conversion_pool,
+    iter_converted_pages,
+    spool_upload,
+)
+from utils.mineru_processor import (
+    MineruProcessor,
+    ProcessingRequest,
+    ProcessingResponse,
+    get_ingestion_pool,
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# 常量配置
-MAX_FILES = 2
+# 常量配置（单次上传的文件数上限见 MARKITDOWN_MAX_FILES）
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 MAX_TOTAL_SIZE = 100 * 1024 * 1024  # 100MB
 CONVERSION_TIMEOUT = 60  # 秒
@@ -44,6 +64,37 @@ class DocumentConversionResult(BaseModel):
     markdown_content: Optional[str] = None
     size_bytes: Optional[int] = None
     conversion_time_ms: Optional[float] = None
+    cache_hit: bool = False  # 是否直接返回了缓存的转换结果
+    error: Optional[str] = None
+
+
+class PageConversionEvent(BaseModel):
+    """逐页转换中单页的结果事件."""
+
+    type: str = "page"
+    index: int  # 文件在上传列表中的位置
+    filename: str
+    page: Optional[int] = None  # 页码（从 1 开始）；整份文档一次性返回时为 None
+    total_pages: Optional[int] = None
+    markdown: Optional[str] = None
+    conversion_time_ms: float
+    cache_hit: bool = False
+    error: Optional[str] = None
+
+
+class PageConversionSummary(BaseModel):
+    """逐页转换中单个文件转换结束后的汇总事件."""
+
+    type: str = "summary"
+    index: int
+    filename: str
+    format: str
+    status: str  # "success"、"partial"（部分页失败）或 "error"
+    pages: int = 0  # 已产出的页数（整份返回时为 1）
+    failed_pages: list[int] = []
+    size_bytes: int = 0  # Markdown 总长度
+    conversion_time_ms: Optional[float] = None
+    cache_hit: bool = False
     error: Optional[str] = None
 
 
@@ -55,6 +106,28 @@ class DocumentMetadata(BaseModel):
     markdown_content: str  # 完整的 Markdown 内容
 
 
+class JobSubmitResponse(BaseModel):
+    """后台任务提交结果."""
+
+    job_id: str
+    status: str
+    stream_path: str  # 订阅阶段事件的 WebSocket 路径
+
+
+class JobStatusResponse(BaseModel):
+    """后台任务状态."""
+
+    job_id: str
+    kind: str
+    status: str
+    stage: Optional[str] = None
+    progress: dict = {}
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+
+
 def _get_file_format(filename: str) -> str:
     """从文件名提取文件格式."""
     return filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
@@ -62,10 +135,11 @@ def _get_file_format(filename: str) -> str:
 
 def _validate_files(files: list[UploadFile]) -> None:
     """验证上传的文件."""
-    if len(files) > MAX_FILES:
+    max_files = get_settings().markitdown_max_files
+    if len(files) > max_files:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"最多允许 {MAX_FILES} 个文件，当前 {len(files)} 个",
+            detail=f"最多允许 {max_files} 个文件，当前 {len(files)} 个",
         )
 
     total_size = 0
@@ -94,6 +168,42 @@ def _validate_files(files: list[UploadFile]) -> None:
         )
 
 
+async def _spool_files(files: list[UploadFile]) -> tuple[str, list[SpooledUpload]]:
+    """
+    把所有上传文件分块写入新建的临时目录（边写边计算哈希、检查大小）.
+
+    必须在 StreamingResponse 之前完成，因为 FastAPI 会在响应开始后关闭 request body。
+
+    返回：
+        (spool_dir, uploads) 元组；spool_dir 由调用方在转换结束后删除，出错时在此删除
+    """
+    spool_dir = tempfile.mkdtemp(prefix="markitdown_")
+    uploads: list[SpooledUpload] = []
+    total_size = 0
+    try:
+        for idx, f in enumerate(files):
+            budget = min(MAX_FILE_SIZE, MAX_TOTAL_SIZE - total_size)
+            try:
+                upload = await spool_upload(f, os.path.join(spool_dir, str(idx)), max_bytes=budget)
+            except UploadTooLargeError:
+                detail = (
+                    f"文件 {f.filename} 超过 {MAX_FILE_SIZE // 1024 // 1024}MB 限制"
+                    if budget == MAX_FILE_SIZE
+                    else f"总大小超过 {MAX_TOTAL_SIZE // 1024 // 1024}MB 限制"
+                )
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail
+                ) from None
+            finally:
+                await f.close()
+            total_size += upload.size_bytes
+            uploads.append(upload)
+    except BaseException:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+        raise
+    return spool_dir, uploads
+
+
 @router.post("/process-markitdown")
 async def process_markitdown(files: list[UploadFile] = File(...)):
     """
@@ -108,86 +218,174 @@ async def process_markitdown(files: list[UploadFile] = File(...)):
     - **URL**: YouTube 链接
 
     约束条件：
-    - 最多 2 个文件
+    - 最多 MARKITDOWN_MAX_FILES 个文件（默认 2）
     - 单文件最大 50MB
     - 总计最大 100MB
     - 超时时间: 60 秒/文件
 
+    多个文件在转换进程池中并发转换，每个文件完成后立即推送一条事件，
+    事件顺序为完成顺序；客户端按结果中的 index（上传顺序）重新排序。
+    内容相同的文件命中转换缓存时立即返回，结果中 cache_hit 为 true。
+
     返回：
         Server-Sent Events 流，包含转换结果
     """
     # 验证文件
     _validate_files(files)
+    spool_dir, uploads = await _spool_files(files)
+
+    async def convert(idx: int, upload: SpooledUpload) -> DocumentConversionResult:
+        """转换单个文件，失败时返回 error 结果（不抛出）."""
+        filename = upload.filename
+        fmt = _get_file_format(filename)
+        try:
+            logger.info(f"[MARKITDOWN] 转换中 {filename} ({upload.size_bytes} 字节)")
+            markdown, elapsed_ms, cache_hit = await convert_spooled_upload(
+                upload, timeout=CONVERSION_TIMEOUT
+            )
+            return DocumentConversionResult(
+                index=idx,
+                filename=filename,
+                format=fmt,
+                status="success",
+                markdown_content=markdown,
+                size_bytes=len(markdown),
+                conversion_time_ms=elapsed_ms,
+                cache_hit=cache_hit,
+            )
 
-    # 在 StreamingResponse 之前一次性读完所有文件
-    # 这是必要的，因为 FastAPI 会在响应开始后关闭 request body
-    file_buffers = []
-    for f in files:
-        content = await f.read()
-        file_buffers.append({
-            "filename": f.filename,
-            "content": content,
-        })
-        await f.close()
+        except asyncio.TimeoutError:
+            logger.error(f"[MARKITDOWN] 转换超时 {filename}")
+            return DocumentConversionResult(
+                index=idx,
+                filename=filename,
+                format=fmt,
+                status="error",
+                error=f"转换超时（>{CONVERSION_TIMEOUT}秒）",
+            )
+
+        except Exception as e:
+            error_msg = f"{type(e).__name__}: {str(e)}"
+            logger.error(f"[MARKITDOWN] 转换错误 {filename}: {error_msg}", exc_info=True)
+            return DocumentConversionResult(
+                index=idx,
+                filename=filename,
+                format=fmt,
+                status="error",
+                error=error_msg,
+            )
 
     async def generate():
-        """流式返回转换结果（一个转化好立即返回）."""
+        """并发转换，按完成顺序流式返回（一个转化好立即返回）."""
         start_time = time.time()
+        tasks = [asyncio.create_task(convert(idx, upload)) for idx, upload in enumerate(uploads)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                yield f"data: {json.dumps(result.model_dump())}\n\n"
+        finally:
+            # 客户端断开时取消未完成的转换（进程池会终止对应的工作进程）
+            for task in tasks:
+                task.cancel()
+            # 等取消真正完成后再删除临时目录，避免仍在读取的转换看到文件消失
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await asyncio.to_thread(shutil.rmtree, spool_dir, True)
 
-        for idx, fb in enumerate(file_buffers):
-            filename = fb["filename"]
-            content = fb["content"]
+        total_time = (time.time() - start_time) * 1000
+        logger.info(f"[MARKITDOWN] 所有转换完成，耗时 {total_time:.1f}ms")
 
-            try:
-                fmt = _get_file_format(filename)
-
-                logger.info(f"[MARKITDOWN] 转换中 {filename} ({len(content)} 字节)")
-
-                # 转换文件
-                markdown, elapsed_ms = await convert_upload_file(content, filename, timeout=CONVERSION_TIMEOUT)
-
-                # 发送成功结果
-                result = DocumentConversionResult(
-                    index=idx,
-                    filename=filename,
-                    format=fmt,
-                    status="success",
-                    markdown_content=markdown,
-                    size_bytes=len(markdown),
-                    conversion_time_ms=elapsed_ms,
-                )
+    return StreamingResponse(generate(), media_type="text/event-stream")
 
-                yield f"data: {json.dumps(result.model_dump())}\n\n"
 
-            except asyncio.TimeoutError:
-                logger.error(f"[MARKITDOWN] 转换超时 {filename}")
-                result = DocumentConversionResult(
-                    index=idx,
-                    filename=filename,
-                    format=_get_file_format(filename),
-                    status="error",
-                    error="转换超时（>60秒）",
-                )
-                yield f"data: {json.dumps(result.model_dump())}\n\n"
+@router.post("/process-markitdown/stream")
+async def process_markitdown_pages(files: list[UploadFile] = File(...)):
+    """
+    逐页转换上传的文档，每页（幻灯片）完成即推送，适合长 PDF / PPTX.
 
-            except Exception as e:
-                error_msg = f"{type(e).__name__}: {str(e)}"
-                logger.error(f"[MARKITDOWN] 转换错误 {filename}: {error_msg}", exc_info=True)
-                result = DocumentConversionResult(
-                    index=idx,
-                    filename=filename,
-                    format=_get_file_format(filename),
-                    status="error",
-                    error=error_msg,
-                )
-                yield f"data: {json.dumps(result.model_dump())}\n\n"
+    与 /process-markitdown 的约束相同。文件按上传顺序依次转换：
 
-        total_time = (time.time() - start_time) * 1000
-        logger.info(f"[MARKITDOWN] 所有转换完成，耗时 {total_time:.1f}ms")
+    - PDF 按页、PPTX 按幻灯片推送 type="page" 事件（含 page / total_pages / markdown），
+      客户端可以在其余页转换期间先展示内容、开始提问
+    - 其他格式或命中转换缓存时推送一条 page 为 None 的整份结果
+    - 每个文件结束时推送一条 type="summary" 事件（status 为 success / partial / error）
+
+    超时时间为 60 秒/页（整份转换时为 60 秒/文件），单页失败不影响后续页。
+
+    返回：
+        Server-Sent Events 流
+    """
+    _validate_files(files)
+    spool_dir, uploads = await _spool_files(files)
+
+    async def generate():
+        """按上传顺序逐个文件、按页码顺序逐页流式返回."""
+        try:
+            for idx, upload in enumerate(uploads):
+                filename = upload.filename
+                start_time = time.time()
+                summary = PageConversionSummary(
+                    index=idx, filename=filename, format=_get_file_format(filename), status="success"
+                )
+                try:
+                    # aclosing：客户端断开时立即关闭页迭代器，取消尚未完成的页
+                    async with aclosing(iter_converted_pages(upload, timeout=CONVERSION_TIMEOUT)) as pages:
+                        async for page in pages:
+                            event = PageConversionEvent(
+                                index=idx,
+                                filename=filename,
+                                page=page.page,
+                                total_pages=page.total_pages,
+                                markdown=page.markdown,
+                                conversion_time_ms=page.conversion_time_ms,
+                                cache_hit=page.cache_hit,
+                                error=page.error,
+                            )
+                            summary.pages += 1
+                            summary.cache_hit = page.cache_hit
+                            if page.error is not None:
+                                summary.failed_pages.append(page.page)
+                            else:
+                                summary.size_bytes += len(page.markdown)
+                            yield f"data: {json.dumps(event.model_dump())}\n\n"
+
+                    if summary.failed_pages:
+                        summary.status = "error" if len(summary.failed_pages) == summary.pages else "partial"
+
+                except asyncio.TimeoutError:
+                    logger.error(f"[MARKITDOWN] 转换超时 {filename}")
+                    summary.status = "error"
+                    summary.error = f"转换超时（>{CONVERSION_TIMEOUT}秒）"
+
+                except Exception as e:
+                    error_msg = f"{type(e).__name__}: {str(e)}"
+                    logger.error(f"[MARKITDOWN] 转换错误 {filename}: {error_msg}", exc_info=True)
+                    summary.status = "error"
+                    summary.error = error_msg
+
+                summary.conversion_time_ms = (time.time() - start_time) * 1000
+                yield f"data: {json.dumps(summary.model_dump())}\n\n"
+        finally:
+            await asyncio.to_thread(shutil.rmtree, spool_dir, True)
 
     return StreamingResponse(generate(), media_type="text/event-stream")
 
 
+@router.get("/process-markitdown/metrics")
+async def markitdown_pool_metrics() -> dict:
+    """
+    MarkItDown 转换进程池与转换缓存状态.
+
+    返回：
+        工作进程数、空闲/忙碌进程数、排队深度（queue_depth）、完成/失败/超时次数、
+        进程重启次数、最近任务耗时的 p50 / p95 / max（毫秒），以及 cache 命中统计
+    """
+    cache = get_conversion_cache()
+    return {
+        **get_conversion_pool().metrics(),
+        "cache": cache.stats.as_dict() if cache is not None else None,
+    }
+
+
 @router.post("/process-mineru", response_model=ProcessingResponse)
 async def process_mineru_document(request: ProcessingRequest) -> ProcessingResponse:
     """
@@ -215,7 +413,7 @@ async def process_mineru_document(request: ProcessingRequest) -> ProcessingRespo
     """
     try:
         processor = MineruProcessor()
-        result = processor.process(
+        result = await processor.aprocess(
             source_path=request.source_path,
             embed=request.embed,
             collection_name=request.collection_name,
@@ -227,6 +425,9 @@ async def process_mineru_document(request: ProcessingRequest) -> ProcessingRespo
             images_copied=result["images_copied"],
             chunks_created=result["chunks_created"],
             embedded=result["embedded"],
+            chunks_embedded=result["chunks_embedded"],
+            chunks_unchanged=result["chunks_unchanged"],
+            chunks_deleted=result["chunks_deleted"],
             collection_name=result["collection_name"],
         )
 
@@ -244,4 +445,73 @@ async def process_mineru_document(request: ProcessingRequest) -> ProcessingRespo
         )
 
 
+@router.post(
+    "/process-mineru/jobs",
+    response_model=JobSubmitResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def submit_mineru_job(request: ProcessingRequest) -> JobSubmitResponse:
+    """
+    以后台任务方式处理 MinerU 文档，立即返回 job_id。
+
+    任务在独立的入库进程池中执行（INGESTION_MAX_CONCURRENT_JOBS 个工作进程），
+    解析、分块与对账不占用 API 事件循环；阶段事件（preparing / prepared / embedding / writing / cleanup / completed）
+    发布到 Redis Stream，可通过 /ws/{job_id} 订阅，或轮询 GET /documents/jobs/{job_id}。
+
+    参数：
+        request：ProcessingRequest，与 /process-mineru 相同
+
+    返回：
+        JobSubmitResponse，包含 job_id 与订阅路径
+    """
+
+    async def run(reporter: JobReporter) -> dict:
+        result = await get_ingestion_pool().run(
+            request.source_path,
+            request.embed,
+            request.collection_name,
+            on_progress=lambda progress: reporter.stage(*progress),
+        )
+        # 工作进程只能使本进程外的共享代数失效，本进程的检索缓存在这里同步失效
+        settings = get_settings()
+        if settings.retrieval_cache_enabled and result.get("embedded"):
+            await get_retrieval_cache().ainvalidate_collection(
+                resolve_collection_name(request.collection_name or settings.default_collection)
+            )
+        return result
+
+    record = await get_job_manager().submit(
+        "mineru_ingestion", run, params=request.model_dump()
+    )
+    logger.info(f"[JOBS] Submitted MinerU ingestion {record.job_id} for {request.source_path}")
+    return JobSubmitResponse(
+        job_id=record.job_id,
+        status=record.status,
+        stream_path=f"/ws/{record.job_id}",
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str) -> JobStatusResponse:
+    """
+    查询后台任务状态。
+
+    限制：任务记录保存在接收提交的 API 进程内存中（配置 Redis 时镜像一份供其他 worker 查询）；
+    API 进程重启后，运行中与排队中的任务不会恢复，需要重新提交（已写入的文档块按内容哈希跳过，不会重复嵌入）。
+
+    参数：
+        job_id：提交任务时返回的 ID
+
+    返回：
+        JobStatusResponse；任务不存在或已过期时返回 404
+    """
+    record = await get_job_manager().get(job_id)
+    if record is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"任务不存在或已过期: {job_id}",
+        )
+    return JobStatusResponse(**{k: v for k, v in record.to_dict().items() if k != "params"})
+
+
 __all__ = ["router"]
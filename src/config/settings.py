@@ -31,6 +31,16 @@ def _coerce_int(name: str, default: int) -> int:
         return default
 
 
+def _coerce_float(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        return default
+
+
 def _normalize_conn_string(conn_str: str) -> str:
     """确保连接字符串查询参数格式正确。"""
     parts = urlsplit(conn_str)
@@ -60,15 +70,60 @@ class Settings:
     dashscope_api_key: Optional[str]
     dascope_base_url: Optional[str]
     embeddings_model: str
+    embeddings_dimensions: int
+    # 是否向嵌入接口请求 embeddings_dimensions 维输出（text-embedding-v4 支持 64~2048）
+    embeddings_request_dimensions: bool
     litellm_base_url: Optional[str]
     postgres_connection_string: str
     default_collection: str
     chunk_size: int
     chunk_overlap: int
+    # markdown（默认）: 对 Markdown 做字符分块；content_list: 按 MinerU content_list.json 结构分块（需显式开启）
+    chunk_strategy: str
+    chunk_max_tokens: int
     retriever_top_k: int
+    retrieval_mode: str
+    hybrid_candidates: int
+    hybrid_rrf_k: int
+    # ANN 索引查询参数（0 表示使用服务端默认值）
+    hnsw_ef_search: int
+    ivfflat_probes: int
+    vector_iterative_scan: str
+    # ANN 索引的向量精度（vector / halfvec / binary）与全精度重排倍数（0 表示不重排）
+    vector_storage: str
+    vector_rescore_factor: int
+    # 入库写库方式：orm（PGVector.add_embeddings）/ copy（COPY 到临时表后批量 upsert）
+    vector_write_mode: str
     rerank_enabled: bool
     rerank_model: str
     rerank_top_n: int
+    rerank_timeout_ms: int
+    rerank_url: Optional[str]
+    rerank_cache_size: int
+    rerank_cache_ttl_seconds: int
+    # 查询向量缓存配置
+    embedding_cache_enabled: bool
+    embedding_cache_size: int
+    embedding_cache_ttl_seconds: int
+    embedding_cache_redis_enabled: bool
+    # 文档入库嵌入流水线配置
+    embedding_batch_size: int
+    embedding_concurrency: int
+    embedding_max_retries: int
+    embedding_retry_backoff_seconds: float
+    # 检索结果语义缓存配置
+    retrieval_cache_enabled: bool
+    retrieval_cache_max_distance: float
+    retrieval_cache_size: int
+    retrieval_cache_ttl_seconds: int
+    retrieval_cache_redis_enabled: bool
+    # 会话内上传文档检索配置（大文档分块嵌入到按 thread 隔离的索引并持久化到 PGVector，不再整篇拼进消息）
+    thread_docs_enabled: bool
+    thread_docs_inline_max_chars: int
+    thread_docs_top_k: int
+    thread_docs_max_threads: int
+    thread_docs_ttl_seconds: int
+    thread_docs_persist: bool
     redis_url: Optional[str]
     redis_stream_enabled: bool
     stream_ttl_seconds: int
@@ -81,6 +136,16 @@ class Settings:
     # Document processing 配置
     frontend_images_dir: str
     frontend_image_prefix: str
+    image_publish_workers: int
+    ingestion_max_concurrent_jobs: int
+    ingestion_job_ttl_seconds: int
+    markitdown_workers: int
+    markitdown_max_files: int
+    markitdown_cache_enabled: bool
+    markitdown_cache_dir: str
+    markitdown_cache_max_mb: int
+    markitdown_cache_ttl_seconds: int
+    markitdown_cache_redis_enabled: bool
     # Project search API 配置
     project_search_api_url: Optional[str]
     project_search_api_username: Optional[str]
@@ -113,15 +178,56 @@ def get_settings() -> Settings:
         dashscope_api_key=os.getenv("DASHSCOPE_API_KEY"),
         dascope_base_url=os.getenv("DASHSCOPE_BASE_URL"),
         embeddings_model=os.getenv("EMBEDDINGS_MODEL", "text-embedding-v4"),
+        embeddings_dimensions=_coerce_int("EMBEDDINGS_DIMENSIONS", 1024),
+        embeddings_request_dimensions=os.getenv("EMBEDDINGS_REQUEST_DIMENSIONS", "false").lower()
+        == "true",
         litellm_base_url=os.getenv("LITELLM_BASE_URL"),
         postgres_connection_string=normalized_conn,
         default_collection=os.getenv("VECTOR_COLLECTION", "pdf_documents"),
         chunk_size=_coerce_int("CHUNK_SIZE", 1000),
         chunk_overlap=_coerce_int("CHUNK_OVERLAP", 200),
+        chunk_strategy=os.getenv("CHUNK_STRATEGY", "markdown").lower(),
+        chunk_max_tokens=_coerce_int("CHUNK_MAX_TOKENS", 512),
         retriever_top_k=_coerce_int("RETRIEVER_TOP_K", 4),
+        retrieval_mode=os.getenv("RETRIEVAL_MODE", "vector").lower(),
+        hybrid_candidates=_coerce_int("HYBRID_CANDIDATES", 20),
+        hybrid_rrf_k=_coerce_int("HYBRID_RRF_K", 60),
+        hnsw_ef_search=_coerce_int("HNSW_EF_SEARCH", 0),
+        ivfflat_probes=_coerce_int("IVFFLAT_PROBES", 0),
+        vector_iterative_scan=os.getenv("VECTOR_ITERATIVE_SCAN", "").lower(),
+        vector_storage=os.getenv("VECTOR_STORAGE", "vector").lower(),
+        vector_rescore_factor=_coerce_int("VECTOR_RESCORE_FACTOR", 0),
+        vector_write_mode=os.getenv("VECTOR_WRITE_MODE", "orm").lower(),
         rerank_enabled=os.getenv("RERANK_ENABLED", "false").lower() == "true",
         rerank_model=os.getenv("RERANK_MODEL", "qwen3-rerank"),
         rerank_top_n=_coerce_int("RERANK_TOP_N", 3),
+        rerank_timeout_ms=_coerce_int("RERANK_TIMEOUT_MS", 1500),
+        rerank_url=os.getenv("RERANK_URL"),
+        rerank_cache_size=_coerce_int("RERANK_CACHE_SIZE", 4096),
+        rerank_cache_ttl_seconds=_coerce_int("RERANK_CACHE_TTL_SECONDS", 3600),
+        # 查询向量缓存配置
+        embedding_cache_enabled=os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true",
+        embedding_cache_size=_coerce_int("EMBEDDING_CACHE_SIZE", 1024),
+        embedding_cache_ttl_seconds=_coerce_int("EMBEDDING_CACHE_TTL_SECONDS", 86400),
+        embedding_cache_redis_enabled=os.getenv("EMBEDDING_CACHE_REDIS_ENABLED", "false").lower() == "true",
+        # 文档入库嵌入流水线配置
+        embedding_batch_size=_coerce_int("EMBEDDING_BATCH_SIZE", 10),
+        embedding_concurrency=_coerce_int("EMBEDDING_CONCURRENCY", 4),
+        embedding_max_retries=_coerce_int("EMBEDDING_MAX_RETRIES", 3),
+        embedding_retry_backoff_seconds=_coerce_float("EMBEDDING_RETRY_BACKOFF_SECONDS", 1.0),
+        # 检索结果语义缓存配置
+        retrieval_cache_enabled=os.getenv("RETRIEVAL_CACHE_ENABLED", "false").lower() == "true",
+        retrieval_cache_max_distance=_coerce_float("RETRIEVAL_CACHE_MAX_DISTANCE", 0.08),
+        retrieval_cache_size=_coerce_int("RETRIEVAL_CACHE_SIZE", 512),
+        retrieval_cache_ttl_seconds=_coerce_int("RETRIEVAL_CACHE_TTL_SECONDS", 300),
+        retrieval_cache_redis_enabled=os.getenv("RETRIEVAL_CACHE_REDIS_ENABLED", "false").lower() == "true",
+        # 会话内上传文档检索配置
+        thread_docs_enabled=os.getenv("THREAD_DOCS_ENABLED", "true").lower() == "true",
+        thread_docs_inline_max_chars=_coerce_int("THREAD_DOCS_INLINE_MAX_CHARS", 4000),
+        thread_docs_top_k=_coerce_int("THREAD_DOCS_TOP_K", 6),
+        thread_docs_max_threads=_coerce_int("THREAD_DOCS_MAX_THREADS", 128),
+        thread_docs_ttl_seconds=_coerce_int("THREAD_DOCS_TTL_SECONDS", 7200),
+        thread_docs_persist=os.getenv("THREAD_DOCS_PERSIST", "true").lower() == "true",
         redis_url=os.getenv("REDIS_URL"),
         redis_stream_enabled=os.getenv("REDIS_STREAM_ENABLED", "false").lower() == "true",
         stream_ttl_seconds=_coerce_int("STREAM_TTL_SECONDS", 3600),
@@ -134,6 +240,16 @@ def get_settings() -> Settings:
         # Document processing 配置
         frontend_images_dir=os.getenv("FRONTEND_IMAGES_DIR", "./frontend/public/documents/images"),
         frontend_image_prefix=os.getenv("FRONTEND_IMAGE_PREFIX", "/documents/images"),
+        image_publish_workers=_coerce_int("IMAGE_PUBLISH_WORKERS", 8),
+        ingestion_max_concurrent_jobs=_coerce_int("INGESTION_MAX_CONCURRENT_JOBS", 2),
+        ingestion_job_ttl_seconds=_coerce_int("INGESTION_JOB_TTL_SECONDS", 86400),
+        markitdown_workers=_coerce_int("MARKITDOWN_WORKERS", 2),
+        markitdown_max_files=_coerce_int("MARKITDOWN_MAX_FILES", 2),
+        markitdown_cache_enabled=os.getenv("MARKITDOWN_CACHE_ENABLED", "true").lower() == "true",
+        markitdown_cache_dir=os.getenv("MARKITDOWN_CACHE_DIR", "./.cache/markitdown"),
+        markitdown_cache_max_mb=_coerce_int("MARKITDOWN_CACHE_MAX_MB", 1024),
+        markitdown_cache_ttl_seconds=_coerce_int("MARKITDOWN_CACHE_TTL_SECONDS", 604800),
+        markitdown_cache_redis_enabled=os.getenv("MARKITDOWN_CACHE_REDIS_ENABLED", "false").lower() == "true",
         # Project search API 配置
         project_search_api_url=os.getenv("PROJECT_SEARCH_API_URL"),
         project_search_api_username=os.getenv("PROJECT_SEARCH_API_USERNAME"),
@@ -1,4 +1,4 @@
 """数据库工具包。"""
 
-__all__ = ["database", "checkpointer", "memory_store"]
+__all__ = ["database", "checkpointer", "memory_store", "vector_index", "hybrid_search"]
 
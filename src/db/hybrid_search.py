@@ -0,0 +1,184 @@
+"""混合检索（RETRIEVAL_MODE=hybrid）所需的数据库结构：一次性迁移。
+
+在 langchain_pg_embedding 上增加二元组全文索引：
+- rag_bigram_tsvector：去除空白/标点（BIGRAM_SEPARATORS 中显式列出的字符）后按相邻两个字符切分，
+  适用于不分词的中文
+  （逐字符拆分后用 lag() 取相邻字符，线性时间；多字节文本上的 substr(t, i, 2) 每次都从头扫描）
+- document_bigrams：由 document 自动生成并存储的 tsvector 列
+- GIN 索引支撑 @@ 匹配
+
+为已有数据添加 STORED 生成列会重写整张表（持有 ACCESS EXCLUSIVE 锁），
+因此不在应用启动时执行，而是在切换到 hybrid 模式前手动运行一次：
+
+命令行用法：
+    python -m db.hybrid_search migrate
+    python -m db.hybrid_search status
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import string
+import sys
+from typing import Any, Optional
+
+from .database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# 切分二元组前去除的空白与标点。显式列出而不用 [[:space:][:punct:]]，
+# 后者的范围取决于数据库的 locale（C locale 下不含全角标点）；查询侧 query_bigrams 使用同一集合
+BIGRAM_SEPARATORS = "".join(
+    [
+        "\t\n\v\f\r \u00a0\u1680\u202f\u205f\u3000\ufeff",
+        "".join(map(chr, range(0x2000, 0x200C))),  # 各类宽度空格与零宽空格
+        string.punctuation,
+        "\u00a1\u00a7\u00ab\u00b6\u00b7\u00bb\u00bf",  # ¡ § « ¶ · » ¿
+        "".join(map(chr, range(0x2010, 0x2028))),  # 连字符、破折号、引号、•、…
+        "".join(map(chr, range(0x2030, 0x203F))),  # ‰ ′ ″ ‹ › ※ ‼ ‽ ‾
+        "\u3001\u3002\u3003",  # 、 。 〃
+        "".join(map(chr, range(0x3008, 0x3012))),  # 〈〉《》「」『』【】
+        "".join(map(chr, range(0x3014, 0x3020))),  # 〔〕〖〗〘〙〚〛〜〝〞〟
+        "\u30fb",  # ・
+        "".join(map(chr, range(0xFF01, 0xFF10))),  # 全角 ！＂＃＄％＆＇（）＊＋，－．／
+        "".join(map(chr, range(0xFF1A, 0xFF21))),  # 全角 ：；＜＝＞？＠
+        "".join(map(chr, range(0xFF3B, 0xFF41))),  # 全角 ［＼］＾＿｀
+        "".join(map(chr, range(0xFF5B, 0xFF66))),  # 全角 ｛｜｝～ 与半角 ｟｠｡｢｣､･
+    ]
+)
+
+# 字符逐个写成 \uXXXX 转义，不受 standard_conforming_strings、方括号内特殊字符与引号的影响
+_BIGRAM_SEPARATORS_RE = "[" + "".join(f"\\u{ord(ch):04x}" for ch in BIGRAM_SEPARATORS) + "]+"
+
+HYBRID_SEARCH_SCHEMA_SQL = (
+    f"""
+    CREATE OR REPLACE FUNCTION rag_bigram_tsvector(doc text) RETURNS tsvector
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+        SELECT coalesce(array_to_tsvector(array(
+            SELECT DISTINCT c.prev || c.ch
+            FROM (
+                SELECT ch, lag(ch) OVER (ORDER BY n) AS prev
+                FROM regexp_split_to_table(
+                    regexp_replace(lower(coalesce(doc, '')), '{_BIGRAM_SEPARATORS_RE}', '', 'g'), ''
+                ) WITH ORDINALITY AS x(ch, n)
+            ) c
+            WHERE c.prev IS NOT NULL
+        )), ''::tsvector)
+    $$
+    """,
+    """
+    ALTER TABLE langchain_pg_embedding
+    ADD COLUMN IF NOT EXISTS document_bigrams tsvector
+    GENERATED ALWAYS AS (rag_bigram_tsvector(document)) STORED
+    """,
+)
+
+# GIN 索引在事务外并发创建，不阻塞写入
+_BIGRAM_INDEX_SQL = """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_langchain_pg_embedding_bigrams
+    ON langchain_pg_embedding USING gin (document_bigrams)
+"""
+
+_FUNCTION_SOURCE_SQL = "SELECT prosrc FROM pg_proc WHERE proname = 'rag_bigram_tsvector'"
+
+# 切分规则变化后，已存储的生成列不会自动重算，需删除后重新生成
+_DROP_BIGRAM_COLUMN_SQL = """
+    ALTER TABLE langchain_pg_embedding DROP COLUMN IF EXISTS document_bigrams
+"""
+
+_SCHEMA_READY_SQL = """
+    SELECT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'langchain_pg_embedding' AND column_name = 'document_bigrams'
+    )
+"""
+
+
+async def hybrid_search_schema_ready() -> bool:
+    """langchain_pg_embedding 上是否已有 document_bigrams 列。"""
+    pool = await DatabaseManager.get_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_SCHEMA_READY_SQL)
+            row = await cur.fetchone()
+    return bool(row and row[0])
+
+
+async def migrate_hybrid_search_schema() -> bool:
+    """创建混合检索所需的函数、生成列与 GIN 索引（幂等）。
+
+    rag_bigram_tsvector 的定义有变化时（如切分字符集更新），删除并重新生成 document_bigrams 列，
+    与首次迁移一样会重写整张表。
+
+    返回：
+        是否执行了迁移（langchain_pg_embedding 尚不存在时返回 False）
+    """
+    pool = await DatabaseManager.get_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT to_regclass('langchain_pg_embedding')")
+            row = await cur.fetchone()
+            if row is None or row[0] is None:
+                logger.warning("langchain_pg_embedding does not exist yet; hybrid schema skipped")
+                return False
+            async with conn.transaction():
+                create_function, add_column = HYBRID_SEARCH_SCHEMA_SQL
+                await cur.execute(_FUNCTION_SOURCE_SQL)
+                previous = await cur.fetchone()
+                await cur.execute(create_function)
+                await cur.execute(_FUNCTION_SOURCE_SQL)
+                current = await cur.fetchone()
+                if previous is not None and previous[0] != current[0]:
+                    logger.warning("rag_bigram_tsvector changed; regenerating document_bigrams")
+                    await cur.execute(_DROP_BIGRAM_COLUMN_SQL)
+                await cur.execute(add_column)
+            # 连接池为 autocommit，CREATE INDEX CONCURRENTLY 在事务块外执行
+            await cur.execute(_BIGRAM_INDEX_SQL)
+    logger.info("Hybrid search schema is ready")
+    return True
+
+
+# ============================================================================
+# 命令行
+# ============================================================================
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Manage the hybrid search (bigram full-text) schema")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("migrate")
+    sub.add_parser("status")
+    return parser
+
+
+async def _run(args: argparse.Namespace) -> Any:
+    try:
+        if args.command == "migrate":
+            return {"migrated": await migrate_hybrid_search_schema()}
+        return {"ready": await hybrid_search_schema_ready()}
+    finally:
+        await DatabaseManager.close()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """命令行入口。"""
+    logging.basicConfig(level=logging.INFO)
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    result = asyncio.run(_run(_build_parser().parse_args(argv)))
+    sys.stdout.write(json.dumps(result, ensure_ascii=False, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
+
+
+__all__ = [
+    "BIGRAM_SEPARATORS",
+    "HYBRID_SEARCH_SCHEMA_SQL",
+    "hybrid_search_schema_ready",
+    "migrate_hybrid_search_schema",
+]
@@ -0,0 +1,618 @@
+"""PGVector 的 ANN 索引管理（按集合的 HNSW / IVFFlat 部分索引）。
+
+PGVector 默认不创建任何向量索引，检索时会顺序扫描所有集合的全部向量。
+本模块为每个集合在 langchain_pg_embedding 上建立 `WHERE collection_id = ...`
+的部分索引，并记录构建耗时，供检索路径按集合命中。
+
+索引可以建立在量化后的向量表达式上（VECTOR_STORAGE）：halfvec 使索引约缩小一半，
+binary（binary_quantize 后按汉明距离）约缩小到 1/32；表中仍保留 float32 原始向量，
+检索时可按 VECTOR_RESCORE_FACTOR 取更多候选后以全精度重排。
+
+命令行用法：
+    python -m db.vector_index create --collection bp_pdf --method hnsw --m 16 --ef-construction 64
+    python -m db.vector_index rebuild --collection bp_pdf --method ivfflat --lists 100
+    python -m db.vector_index rebuild --collection bp_pdf --method hnsw --storage binary
+    python -m db.vector_index drop --collection bp_pdf
+    python -m db.vector_index report
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Optional
+
+from psycopg import sql
+from psycopg.types.json import Jsonb
+
+from config.settings import get_settings
+from infra.cache import TTLCache
+from .database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+INDEX_METHODS = ("hnsw", "ivfflat")
+
+# 索引向量精度 → (距离运算符, 索引 operator class)
+VECTOR_STORAGES = {
+    "vector": ("<=>", "vector_cosine_ops"),
+    "halfvec": ("<=>", "halfvec_cosine_ops"),
+    "binary": ("<~>", "bit_hamming_ops"),
+}
+
+# 索引构建记录表（索引名 → 集合、参数、构建耗时）
+INDEX_REGISTRY_SQL = """
+CREATE TABLE IF NOT EXISTS rag_vector_indexes (
+    index_name text PRIMARY KEY,
+    collection_name text NOT NULL,
+    collection_id uuid NOT NULL,
+    method text NOT NULL,
+    params jsonb NOT NULL DEFAULT '{}'::jsonb,
+    dimensions integer NOT NULL,
+    build_seconds double precision,
+    row_count bigint,
+    built_at timestamptz NOT NULL DEFAULT now()
+)
+"""
+
+# 集合名称 → UUID（集合极少变动，短 TTL 避免每次检索多一次查询；
+# 本进程创建/删除集合时由 invalidate_collection_id 主动失效）
+_collection_ids: TTLCache[str, str] = TTLCache(maxsize=256, ttl_seconds=300)
+
+
+@dataclass(frozen=True)
+class IndexLayout:
+    """集合已登记索引的向量表达式参数（检索 SQL 需使用同一表达式才能命中索引）。
+
+    字段说明：
+    - dimensions: 索引表达式的向量维度
+    - storage: 索引向量精度（vector / halfvec / binary）
+    """
+
+    dimensions: int
+    storage: str
+
+
+# 集合 UUID → 已登记的可用索引布局（没有索引时缓存 (None,)）；本进程建/删索引时主动失效
+_index_layouts: TTLCache[str, tuple[Optional[IndexLayout]]] = TTLCache(
+    maxsize=256, ttl_seconds=300
+)
+
+
+@dataclass
+class IndexReport:
+    """单个向量索引的状态。
+
+    字段说明：
+    - index_name: 索引名称
+    - collection_name: 集合名称
+    - method: 索引类型（hnsw / ivfflat）
+    - params: 构建参数（m、ef_construction 或 lists）
+    - dimensions: 索引表达式使用的向量维度
+    - size_bytes: 索引占用磁盘大小（字节）
+    - build_seconds: 最近一次构建耗时（秒）
+    - row_count: 构建时集合中的向量数量
+    - built_at: 最近一次构建时间（ISO 格式）
+    - valid: 索引是否可用（CONCURRENTLY 构建失败会留下无效索引）
+    """
+
+    index_name: str
+    collection_name: str
+    method: str
+    params: dict
+    dimensions: int
+    size_bytes: Optional[int]
+    build_seconds: Optional[float]
+    row_count: Optional[int]
+    built_at: Optional[str]
+    valid: bool
+
+
+def _resolve_storage(storage: Optional[str]) -> str:
+    storage = storage or get_settings().vector_storage
+    if storage not in VECTOR_STORAGES:
+        raise ValueError(f"Unsupported vector storage: {storage}")
+    return storage
+
+
+def storage_expression(value: sql.Composable, dimensions: int, storage: str) -> sql.Composable:
+    """返回向量值在指定精度下的表达式（vector(N) / halfvec(N) / binary_quantize(...)::bit(N)）。"""
+    if storage == "halfvec":
+        return sql.SQL("{}::halfvec({})").format(value, sql.Literal(dimensions))
+    if storage == "binary":
+        return sql.SQL("binary_quantize({}::vector({}))::bit({})").format(
+            value, sql.Literal(dimensions), sql.Literal(dimensions)
+        )
+    return sql.SQL("{}::vector({})").format(value, sql.Literal(dimensions))
+
+
+def embedding_expression(
+    dimensions: Optional[int] = None, storage: str = "vector"
+) -> sql.Composable:
+    """返回检索使用的向量表达式。
+
+    langchain_pg_embedding.embedding 列没有声明维度，而 HNSW / IVFFlat 索引需要固定维度，
+    因此索引建立在 `e.embedding::vector(N)`（或其量化形式）上；集合有索引时检索 SQL
+    必须使用同一表达式才能命中索引。dimensions 为 None（集合没有登记索引）时不做维度转换，
+    避免与 EMBEDDINGS_DIMENSIONS 不一致的集合在检索时报错。
+    """
+    if dimensions is None:
+        return sql.SQL("e.embedding")
+    return storage_expression(sql.SQL("e.embedding"), int(dimensions), storage)
+
+
+def ann_distance(
+    query: sql.Composable, dimensions: Optional[int] = None, storage: str = "vector"
+) -> sql.Composable:
+    """返回可命中 ANN 索引的排序表达式：索引表达式 <运算符> 同精度的查询向量。
+
+    参数：
+        query: 查询向量（文本字面量参数或列引用）
+        dimensions: 索引的向量维度，None 表示集合没有索引（不做维度转换、按全精度距离排序）
+        storage: 索引精度（vector / halfvec / binary）
+    """
+    if dimensions is None:
+        return sql.SQL("e.embedding <=> {}::vector").format(query)
+    return sql.SQL("{} {} {}").format(
+        embedding_expression(dimensions, storage),
+        sql.SQL(VECTOR_STORAGES[storage][0]),
+        storage_expression(query, int(dimensions), storage),
+    )
+
+
+def exact_distance(query: sql.Composable, dimensions: Optional[int] = None) -> sql.Composable:
+    """返回全精度余弦距离表达式（用于返回分数与重排）。"""
+    return ann_distance(query, dimensions, "vector")
+
+
+async def aget_collection_id(collection_name: str) -> Optional[str]:
+    """返回集合的 UUID（不存在时返回 None）。"""
+    cached = _collection_ids.get(collection_name)
+    if cached is not None:
+        return cached
+
+    pool = await DatabaseManager.get_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT uuid FROM langchain_pg_collection WHERE name = %s",
+                (collection_name,),
+            )
+            row = await cur.fetchone()
+
+    if row is None:
+        return None
+    collection_id = str(row[0])
+    _collection_ids.set(collection_name, collection_id)
+    return collection_id
+
+
+def invalidate_collection_id(collection_name: Optional[str] = None) -> None:
+    """丢弃缓存的集合 UUID（创建或删除集合后调用）；为 None 时清空全部。"""
+    if collection_name is None:
+        _collection_ids.clear()
+        _index_layouts.clear()
+        return
+    collection_id = _collection_ids.get(collection_name)
+    _collection_ids.pop(collection_name)
+    if collection_id is not None:
+        _index_layouts.pop(collection_id)
+
+
+async def aget_index_layout(collection_id: str) -> Optional[IndexLayout]:
+    """返回集合已登记且可用的 ANN 索引布局；集合没有索引时返回 None。
+
+    同一集合有多个索引时取最近构建的一个（rebuild 会删除其它索引，正常情况下只有一个）。
+    """
+    cached = _index_layouts.get(collection_id)
+    if cached is not None:
+        return cached[0]
+
+    layout: Optional[IndexLayout] = None
+    pool = await DatabaseManager.get_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT to_regclass('rag_vector_indexes') IS NOT NULL")
+            if (await cur.fetchone())[0]:
+                await cur.execute(
+                    """
+                    SELECT r.dimensions, coalesce(r.params->>'storage', 'vector')
+                    FROM rag_vector_indexes r
+                    JOIN pg_index i ON i.indexrelid = to_regclass(r.index_name)
+                    WHERE r.collection_id = %s AND i.indisvalid
+                    ORDER BY r.built_at DESC
+                    LIMIT 1
+                    """,
+                    (collection_id,),
+                )
+                row = await cur.fetchone()
+                if row is not None:
+                    layout = IndexLayout(dimensions=int(row[0]), storage=row[1])
+
+    _index_layouts.set(collection_id, (layout,))
+    return layout
+
+
+def index_name_for(collection_id: str, method: str) -> str:
+    """生成集合索引名称：ix_lpe_<method>_<uuid 前 12 位>。"""
+    return f"ix_lpe_{method}_{collection_id.replace('-', '')[:12]}"
+
+
+def _index_sql(
+    name: str,
+    collection_id: str,
+    method: str,
+    dimensions: int,
+    params: dict,
+    storage: str = "vector",
+) -> sql.Composed:
+    if method == "hnsw":
+        with_clause = sql.SQL("m = {}, ef_construction = {}").format(
+            sql.Literal(params["m"]), sql.Literal(params["ef_construction"])
+        )
+    else:
+        with_clause = sql.SQL("lists = {}").format(sql.Literal(params["lists"]))
+
+    return sql.SQL(
+        "CREATE INDEX CONCURRENTLY {name} ON langchain_pg_embedding "
+        "USING {method} (({expression}) {opclass}) "
+        "WITH ({with_clause}) WHERE collection_id = {collection_id}"
+    ).format(
+        name=sql.Identifier(name),
+        method=sql.SQL(method),
+        expression=storage_expression(sql.SQL("embedding"), dimensions, storage),
+        opclass=sql.SQL(VECTOR_STORAGES[storage][1]),
+        with_clause=with_clause,
+        collection_id=sql.Literal(collection_id),
+    )
+
+
+async def create_collection_index(
+    collection_name: str,
+    method: str = "hnsw",
+    *,
+    m: int = 16,
+    ef_construction: int = 64,
+    lists: Optional[int] = None,
+    dimensions: Optional[int] = None,
+    storage: Optional[str] = None,
+    maintenance_work_mem: Optional[str] = None,
+    replace: bool = False,
+) -> IndexReport:
+    """为集合创建（或重建）ANN 部分索引。
+
+    使用 CREATE INDEX CONCURRENTLY，构建期间不阻塞写入。
+    replace=True 时先以临时名称构建新索引，再删除旧索引并改名，检索全程可用。
+
+    参数：
+        collection_name: 集合名称
+        method: 索引类型，hnsw 或 ivfflat
+        m: HNSW 每层最大连接数
+        ef_construction: HNSW 构建时的候选列表大小
+        lists: IVFFlat 聚类数，默认按 pgvector 建议取 行数 / 1000（至少 10）
+        dimensions: 向量维度，默认使用 EMBEDDINGS_DIMENSIONS
+        storage: 索引向量精度（vector / halfvec / binary），默认使用 VECTOR_STORAGE；
+            检索时按登记的精度生成同一表达式
+        maintenance_work_mem: 构建时的 maintenance_work_mem（如 "1GB"）
+        replace: 索引已存在时是否重建；重建时同时删除该集合登记的其它索引（如换用其它 method）
+
+    返回：
+        IndexReport: 构建完成后的索引状态
+    """
+    if method not in INDEX_METHODS:
+        raise ValueError(f"Unsupported index method: {method}")
+    dims = int(dimensions or get_settings().embeddings_dimensions)
+    storage = _resolve_storage(storage)
+    collection_id = await aget_collection_id(collection_name)
+    if collection_id is None:
+        raise ValueError(f"Collection not found: {collection_name}")
+
+    name = index_name_for(collection_id, method)
+    pool = await DatabaseManager.get_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(INDEX_REGISTRY_SQL)
+            await cur.execute(
+                "SELECT count(*) FROM langchain_pg_embedding WHERE collection_id = %s",
+                (collection_id,),
+            )
+            row_count = (await cur.fetchone())[0]
+
+            if method == "hnsw":
+                params: dict[str, Any] = {"m": m, "ef_construction": ef_construction}
+            else:
+                params = {"lists": lists or max(10, row_count // 1000)}
+            params["storage"] = storage
+
+            await cur.execute("SELECT to_regclass(%s) IS NOT NULL", (name,))
+            exists = (await cur.fetchone())[0]
+            if exists and not replace:
+                raise ValueError(f"Index {name} already exists; use rebuild to replace it")
+
+            build_name = f"{name}_new" if exists else name
+            await cur.execute(
+                sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(build_name))
+            )
+
+            logger.info(f"Building {method} index {name} for {collection_name} ({row_count} rows)")
+            # CREATE INDEX CONCURRENTLY 不能在事务内执行，无法用事务级 set_config；
+            # 会话级设置在归还连接池前重置，避免泄漏到其它请求
+            if maintenance_work_mem:
+                await cur.execute(
+                    "SELECT set_config('maintenance_work_mem', %s, false)",
+                    (maintenance_work_mem,),
+                )
+            try:
+                start = time.perf_counter()
+                await cur.execute(
+                    _index_sql(build_name, collection_id, method, dims, params, storage)
+                )
+                build_seconds = time.perf_counter() - start
+            finally:
+                if maintenance_work_mem:
+                    await cur.execute("RESET maintenance_work_mem")
+
+            if exists:
+                await cur.execute(
+                    sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(name))
+                )
+                await cur.execute(
+                    sql.SQL("ALTER INDEX {} RENAME TO {}").format(
+                        sql.Identifier(build_name), sql.Identifier(name)
+                    )
+                )
+
+            await cur.execute(
+                """
+                INSERT INTO rag_vector_indexes
+                    (index_name, collection_name, collection_id, method, params,
+                     dimensions, build_seconds, row_count, built_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, now())
+                ON CONFLICT (index_name) DO UPDATE SET
+                    collection_name = EXCLUDED.collection_name,
+                    params = EXCLUDED.params,
+                    dimensions = EXCLUDED.dimensions,
+                    build_seconds = EXCLUDED.build_seconds,
+                    row_count = EXCLUDED.row_count,
+                    built_at = EXCLUDED.built_at
+                """,
+                (name, collection_name, collection_id, method, Jsonb(params), dims, build_seconds, row_count),
+            )
+
+            if replace:
+                # 换用其它 method 重建时，删除该集合登记的其它索引（新索引已可用）
+                await cur.execute(
+                    """
+                    SELECT index_name FROM rag_vector_indexes
+                    WHERE collection_id = %s AND index_name <> %s
+                    """,
+                    (collection_id, name),
+                )
+                for (stale,) in await cur.fetchall():
+                    await cur.execute(
+                        sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(stale))
+                    )
+                    await cur.execute("DELETE FROM rag_vector_indexes WHERE index_name = %s", (stale,))
+                    logger.info(f"Dropped superseded index {stale}")
+
+    _index_layouts.pop(collection_id)
+    logger.info(f"Built index {name} in {build_seconds:.2f}s")
+    reports = await index_report(collection_name)
+    return next(r for r in reports if r.index_name == name)
+
+
+async def rebuild_collection_index(collection_name: str, method: str = "hnsw", **kwargs: Any) -> IndexReport:
+    """重建集合索引（不存在时直接创建）。"""
+    return await create_collection_index(collection_name, method, replace=True, **kwargs)
+
+
+async def drop_collection_index(collection_name: str, method: Optional[str] = None) -> list[str]:
+    """删除集合的 ANN 索引，返回被删除的索引名称。
+
+    参数：
+        collection_name: 集合名称
+        method: 只删除指定类型的索引，为 None 时删除该集合的全部索引
+    """
+    collection_id = await aget_collection_id(collection_name)
+    if collection_id is None:
+        raise ValueError(f"Collection not found: {collection_name}")
+
+    dropped: list[str] = []
+    pool = await DatabaseManager.get_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(INDEX_REGISTRY_SQL)
+            for m in [method] if method else list(INDEX_METHODS):
+                name = index_name_for(collection_id, m)
+                await cur.execute(
+                    sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(name))
+                )
+                await cur.execute("DELETE FROM rag_vector_indexes WHERE index_name = %s", (name,))
+                dropped.append(name)
+    _index_layouts.pop(collection_id)
+    return dropped
+
+
+@asynccontextmanager
+async def deferred_index_build(
+    collection_name: str, method: Optional[str] = None, **index_kwargs: Any
+) -> AsyncIterator[list[IndexReport]]:
+    """批量导入期间暂时删除集合的 ANN 索引，导入结束后一次性构建。
+
+    逐行维护 HNSW / IVFFlat 索引会显著拖慢大批量写入，且 IVFFlat 在空表上训练的聚类
+    没有意义；先写数据再建索引通常快得多。导入期间该集合的检索退化为顺序扫描。
+
+    - 已登记的索引：按原参数重建（IVFFlat 的 lists 按导入后的行数重新计算），
+      导入失败时同样重建，保证检索可用；此时重建失败只记录日志，抛出原始导入错误
+    - 没有索引且指定了 method：导入成功后按 method 与 index_kwargs 新建
+
+    参数：
+        collection_name: 集合名称
+        method: 导入前没有索引时新建的索引类型（hnsw / ivfflat），None 表示不新建
+        index_kwargs: 传给 create_collection_index 的构建参数
+
+    返回：
+        上下文变量为导入前已存在的索引列表
+    """
+    existing = [r for r in await index_report(collection_name) if r.size_bytes is not None]
+    for report in existing:
+        await drop_collection_index(collection_name, report.method)
+    if existing:
+        logger.info(
+            f"Deferred {len(existing)} index(es) on {collection_name} until the bulk load finishes"
+        )
+
+    async def restore() -> None:
+        for report in existing:
+            params = report.params
+            await create_collection_index(
+                collection_name,
+                report.method,
+                m=params.get("m", 16),
+                ef_construction=params.get("ef_construction", 64),
+                dimensions=report.dimensions,
+                storage=params.get("storage", "vector"),
+                maintenance_work_mem=index_kwargs.get("maintenance_work_mem"),
+            )
+
+    try:
+        yield existing
+    except BaseException as load_error:
+        # 导入失败时仍尝试恢复索引；恢复失败只记录日志，向上抛出的始终是原始导入错误
+        logger.error(f"Bulk load into {collection_name} failed ({load_error!r}); restoring indexes")
+        try:
+            await restore()
+        except Exception:
+            logger.exception(f"Failed to restore deferred indexes on {collection_name}")
+        raise
+    await restore()
+    if not existing and method is not None:
+        await create_collection_index(collection_name, method, **index_kwargs)
+
+
+async def index_report(collection_name: Optional[str] = None) -> list[IndexReport]:
+    """列出已登记的向量索引及其磁盘大小、构建耗时。"""
+    pool = await DatabaseManager.get_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(INDEX_REGISTRY_SQL)
+            await cur.execute(
+                """
+                SELECT r.index_name, r.collection_name, r.method, r.params, r.dimensions,
+                       pg_relation_size(i.indexrelid), r.build_seconds, r.row_count,
+                       r.built_at, coalesce(i.indisvalid, false)
+                FROM rag_vector_indexes r
+                LEFT JOIN pg_index i ON i.indexrelid = to_regclass(r.index_name)
+                WHERE %(collection)s::text IS NULL OR r.collection_name = %(collection)s
+                ORDER BY r.collection_name, r.method
+                """,
+                {"collection": collection_name},
+            )
+            rows = await cur.fetchall()
+
+    return [
+        IndexReport(
+            index_name=name,
+            collection_name=collection,
+            method=method,
+            params=params or {},
+            dimensions=dims,
+            size_bytes=size,
+            build_seconds=build_seconds,
+            row_count=row_count,
+            built_at=built_at.isoformat() if built_at else None,
+            valid=valid,
+        )
+        for name, collection, method, params, dims, size, build_seconds, row_count, built_at, valid in rows
+    ]
+
+
+# ============================================================================
+# 命令行
+# ============================================================================
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Manage per-collection pgvector ANN indexes")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for command in ("create", "rebuild"):
+        p = sub.add_parser(command)
+        p.add_argument("--collection", required=True)
+        p.add_argument("--method", choices=INDEX_METHODS, default="hnsw")
+        p.add_argument("--m", type=int, default=16)
+        p.add_argument("--ef-construction", type=int, default=64)
+        p.add_argument("--lists", type=int, default=None)
+        p.add_argument("--dimensions", type=int, default=None)
+        p.add_argument("--storage", choices=tuple(VECTOR_STORAGES), default=None)
+        p.add_argument("--maintenance-work-mem", default=None)
+
+    p = sub.add_parser("drop")
+    p.add_argument("--collection", required=True)
+    p.add_argument("--method", choices=INDEX_METHODS, default=None)
+
+    p = sub.add_parser("report")
+    p.add_argument("--collection", default=None)
+    return parser
+
+
+async def _run(args: argparse.Namespace) -> Any:
+    try:
+        if args.command in ("create", "rebuild"):
+            report = await create_collection_index(
+                args.collection,
+                args.method,
+                m=args.m,
+                ef_construction=args.ef_construction,
+                lists=args.lists,
+                dimensions=args.dimensions,
+                storage=args.storage,
+                maintenance_work_mem=args.maintenance_work_mem,
+                replace=args.command == "rebuild",
+            )
+            return asdict(report)
+        if args.command == "drop":
+            return {"dropped": await drop_collection_index(args.collection, args.method)}
+        return [asdict(r) for r in await index_report(args.collection)]
+    finally:
+        await DatabaseManager.close()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """命令行入口。"""
+    logging.basicConfig(level=logging.INFO)
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    result = asyncio.run(_run(_build_parser().parse_args(argv)))
+    sys.stdout.write(json.dumps(result, ensure_ascii=False, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
+
+
+__all__ = [
+    "INDEX_METHODS",
+    "IndexLayout",
+    "IndexReport",
+    "VECTOR_STORAGES",
+    "aget_collection_id",
+    "aget_index_layout",
+    "ann_distance",
+    "create_collection_index",
+    "deferred_index_build",
+    "drop_collection_index",
+    "embedding_expression",
+    "exact_distance",
+    "index_name_for",
+    "index_report",
+    "invalidate_collection_id",
+    "rebuild_collection_index",
+    "storage_expression",
+]
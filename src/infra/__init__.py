@@ -1,5 +1,5 @@
 """基础设施相关的辅助函数（Redis 等）。"""
 
-__all__ = ["redis_pubsub"]
+__all__ = ["redis_pubsub", "cache", "jobs"]
 
 
@@ -0,0 +1,120 @@
+"""进程内缓存工具（LRU + TTL）。"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass
+class CacheStats:
+    """缓存命中统计。
+
+    字段说明：
+    - hits: 命中次数
+    - misses: 未命中次数（含过期）
+    - evictions: 因容量淘汰的条目数
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """命中率（0.0 ~ 1.0）。"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> dict:
+        """转换为便于日志/接口输出的字典。"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+
+class TTLCache(Generic[K, V]):
+    """带过期时间的 LRU 缓存。
+
+    - 超过 maxsize 时淘汰最久未使用的条目
+    - 每个条目写入后 ttl_seconds 秒过期（ttl_seconds <= 0 表示不过期）
+    - 线程安全，可同时被事件循环和线程池中的同步代码使用
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl_seconds: float = 3600,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """初始化缓存。
+
+        参数：
+        - maxsize: 最大条目数
+        - ttl_seconds: 条目存活时间（秒）
+        - clock: 时间函数（测试时可替换）
+        """
+        self.maxsize = max(1, maxsize)
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._clock = clock
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self._lock = Lock()
+
+    def _expires_at(self) -> float:
+        if self.ttl_seconds <= 0:
+            return float("inf")
+        return self._clock() + self.ttl_seconds
+
+    def get(self, key: K) -> Optional[V]:
+        """读取条目，未命中或已过期时返回 None。"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.stats.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at <= self._clock():
+                del self._data[key]
+                self.stats.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: K, value: V) -> None:
+        """写入条目，必要时淘汰最久未使用的条目。"""
+        with self._lock:
+            self._data[key] = (self._expires_at(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+
+    def pop(self, key: K) -> Optional[V]:
+        """删除并返回条目（不计入命中统计）。"""
+        with self._lock:
+            item = self._data.pop(key, None)
+            return item[1] if item is not None else None
+
+    def clear(self) -> None:
+        """清空所有条目。"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        """返回当前条目数（可能包含尚未清理的过期条目）。"""
+        return len(self._data)
+
+
+__all__ = ["CacheStats", "TTLCache"]
@@ -0,0 +1,248 @@
+"""后台任务管理：提交后立即返回 job_id，在有界并发的事件循环任务中执行，进度推送到 Redis Stream。"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Optional
+
+from config.settings import get_settings
+from infra.redis_pubsub import RedisPublisher, get_redis_client
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+
+
+@dataclass
+class JobRecord:
+    """任务状态。
+
+    字段说明：
+    - job_id: 任务 ID（同时作为 Redis Stream 的 thread_id）
+    - kind: 任务类型（如 "mineru_ingestion"）
+    - status: queued / running / succeeded / failed / cancelled
+    - stage: 当前阶段（由任务上报）
+    - progress: 当前阶段的进度数据
+    - result: 成功时的结果
+    - error: 失败时的错误信息
+    - params: 提交参数
+    """
+
+    job_id: str
+    kind: str
+    status: str = "queued"
+    stage: Optional[str] = None
+    progress: dict = field(default_factory=dict)
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    params: dict = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> dict:
+        """转换为字典。"""
+        return asdict(self)
+
+
+class JobReporter:
+    """传给任务函数的进度上报器：更新任务状态并发布阶段事件。"""
+
+    def __init__(self, manager: "JobManager", record: JobRecord) -> None:
+        """绑定任务管理器与任务记录。"""
+        self._manager = manager
+        self._record = record
+
+    @property
+    def job_id(self) -> str:
+        """任务 ID。"""
+        return self._record.job_id
+
+    async def stage(self, stage: str, data: Optional[dict] = None) -> None:
+        """上报阶段进度。"""
+        self._record.stage = stage
+        self._record.progress = data or {}
+        await self._manager._update(self._record, message_type="output")
+
+
+JobFunc = Callable[[JobReporter], Awaitable[dict]]
+
+
+class JobManager:
+    """进程内后台任务管理器。
+
+    - submit() 立即返回任务记录，任务在后台 asyncio 任务中协调；CPU 密集的任务体应交给进程池
+      （如入库任务的 get_ingestion_pool），只在事件循环中等待结果、转发阶段事件
+    - 最多 max_concurrent 个任务同时运行，其余排队，避免入库占满连接池/嵌入配额
+    - 任务状态保存在内存中，并镜像到 Redis（如已配置），多 worker 部署时任意 worker 都能查询；
+      进程重启后运行中与排队中的任务不会恢复
+    - 阶段事件通过 RedisPublisher 发布到 workflow:execution:{job_id}，可用 /ws/{job_id} 订阅
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrent: int = 2,
+        ttl_seconds: int = 86400,
+        publisher: Optional[RedisPublisher] = None,
+        redis_client: Any = None,
+        redis_prefix: str = "job",
+    ) -> None:
+        """初始化管理器。
+
+        参数：
+        - max_concurrent: 同时运行的最大任务数
+        - ttl_seconds: 已结束任务的保留时间（秒）
+        - publisher: Redis 发布器，为 None 时不推送阶段事件
+        - redis_client: 异步 Redis 客户端，为 None 时任务状态只保存在本进程
+        - redis_prefix: Redis key 前缀
+        """
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrent))
+        self._ttl_seconds = ttl_seconds
+        self._publisher = publisher
+        self._redis = redis_client
+        self._redis_prefix = redis_prefix
+        self._jobs: dict[str, JobRecord] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def _redis_key(self, job_id: str) -> str:
+        return f"{self._redis_prefix}:{job_id}"
+
+    async def _update(self, record: JobRecord, *, message_type: str) -> None:
+        record.updated_at = time.time()
+        if self._redis is not None:
+            try:
+                await self._redis.set(
+                    self._redis_key(record.job_id),
+                    json.dumps(record.to_dict(), ensure_ascii=False, default=str),
+                    ex=self._ttl_seconds,
+                )
+            except Exception as e:
+                logger.warning(f"[JOBS] Failed to mirror job {record.job_id} to Redis: {e}")
+        if self._publisher is not None:
+            await self._publisher.publish_node_output(
+                record.job_id,
+                record.kind,
+                {
+                    "status": record.status,
+                    "stage": record.stage,
+                    "progress": record.progress,
+                    "result": record.result,
+                    "error": record.error,
+                },
+                status=record.status,
+                message_type=message_type,
+            )
+
+    def _prune(self) -> None:
+        """丢弃超过保留时间的已结束任务。"""
+        cutoff = time.time() - self._ttl_seconds
+        for job_id in [
+            job_id
+            for job_id, record in self._jobs.items()
+            if record.status not in ("queued", "running") and record.updated_at < cutoff
+        ]:
+            del self._jobs[job_id]
+
+    async def submit(self, kind: str, func: JobFunc, params: Optional[dict] = None) -> JobRecord:
+        """提交任务并立即返回任务记录。
+
+        参数：
+            kind: 任务类型
+            func: 异步任务函数，接收 JobReporter，返回结果字典
+            params: 提交参数（仅用于展示）
+
+        返回：
+            JobRecord: 状态为 queued 的任务记录
+        """
+        self._prune()
+        record = JobRecord(job_id=uuid.uuid4().hex, kind=kind, params=params or {})
+        self._jobs[record.job_id] = record
+        await self._update(record, message_type="start")
+        task = asyncio.create_task(self._run(record, func), name=f"job-{record.job_id}")
+        self._tasks[record.job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(record.job_id, None))
+        return record
+
+    async def _run(self, record: JobRecord, func: JobFunc) -> None:
+        start = time.perf_counter()
+        try:
+            async with self._semaphore:
+                record.status = "running"
+                await self._update(record, message_type="output")
+                record.result = await func(JobReporter(self, record))
+            record.status = "succeeded"
+            record.stage = "completed"
+            await self._update(record, message_type="complete")
+            logger.info(
+                f"[JOBS] {record.kind} {record.job_id} succeeded in {time.perf_counter() - start:.1f}s"
+            )
+        except asyncio.CancelledError:
+            record.status = "cancelled"
+            await self._update(record, message_type="error")
+            raise
+        except Exception as e:
+            logger.exception(f"[JOBS] {record.kind} {record.job_id} failed: {e}")
+            record.status = "failed"
+            record.error = str(e)
+            await self._update(record, message_type="error")
+
+    async def get(self, job_id: str) -> Optional[JobRecord]:
+        """查询任务状态（本进程没有时从 Redis 读取）。"""
+        record = self._jobs.get(job_id)
+        if record is not None or self._redis is None:
+            return record
+        try:
+            raw = await self._redis.get(self._redis_key(job_id))
+        except Exception as e:
+            logger.warning(f"[JOBS] Failed to read job {job_id} from Redis: {e}")
+            return None
+        return JobRecord(**json.loads(raw)) if raw else None
+
+    async def shutdown(self) -> None:
+        """取消所有未完成的任务。"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@lru_cache(maxsize=1)
+def get_job_manager() -> JobManager:
+    """返回进程内共享的任务管理器。"""
+    settings = get_settings()
+    redis_client = None
+    publisher: Optional[RedisPublisher] = None
+    try:
+        redis_client = get_redis_client()
+        publisher = RedisPublisher(redis_client)
+    except RuntimeError as e:
+        logger.warning(f"Job progress events disabled: {e}")
+    return JobManager(
+        max_concurrent=settings.ingestion_max_concurrent_jobs,
+        ttl_seconds=settings.ingestion_job_ttl_seconds,
+        publisher=publisher,
+        redis_client=redis_client,
+    )
+
+
+async def close_job_manager() -> None:
+    """取消共享任务管理器中未完成的任务（如果已创建）。"""
+    if get_job_manager.cache_info().currsize:
+        await get_job_manager().shutdown()
+        get_job_manager.cache_clear()
+
+
+__all__ = [
+    "JOB_STATUSES",
+    "JobManager",
+    "JobRecord",
+    "JobReporter",
+    "close_job_manager",
+    "get_job_manager",
+]
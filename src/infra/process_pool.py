@@ -0,0 +1,269 @@
+"""可强制超时的常驻进程池：每个任务独占一个工作进程，超时或取消时直接杀掉该进程并补充新进程。
+
+concurrent.futures.ProcessPoolExecutor 无法终止单个正在执行的任务（杀掉工作进程会让整个池失效），
+因此这里为每个工作进程维护一条 Pipe，由事件循环分派任务、等待结果：
+
+- 工作进程启动时执行 initializer（如预加载转换器），之后常驻复用，保持“热”状态
+- 任务超过 timeout 未返回、调用方被取消或工作进程崩溃时，杀掉该进程并在后台补充新进程
+- 所有工作进程都在忙时新任务排队，metrics() 提供排队深度、耗时分位数与超时/重启次数
+- 长任务可在工作进程中调用 report_progress() 上报进度，由 run(on_progress=...) 在事件循环中接收
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+import multiprocessing
+import time
+from collections import deque
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# 计算耗时分位数时保留的最近任务数
+_DURATION_WINDOW = 512
+
+# 工作进程内与父进程通信的管道（仅在工作进程中设置）
+_progress_conn: Optional[Connection] = None
+
+
+def report_progress(data: Any) -> None:
+    """在工作进程中上报当前任务的进度（需可被 pickle）；不在工作进程中调用时忽略。"""
+    if _progress_conn is not None:
+        _progress_conn.send((None, data))
+
+
+def _worker_main(conn: Connection, func: Callable[..., Any], initializer: Optional[Callable[[], Any]]) -> None:
+    """工作进程主循环：逐个接收参数元组，返回 (是否成功, 结果或异常)；进度消息为 (None, 数据)。"""
+    global _progress_conn
+    _progress_conn = conn
+    if initializer is not None:
+        initializer()
+    while True:
+        try:
+            args = conn.recv()
+        except (EOFError, OSError):
+            return
+        if args is None:
+            return
+        try:
+            reply = (True, func(*args))
+        except Exception as e:
+            reply = (False, e)
+        try:
+            conn.send(reply)
+        except Exception:
+            # 结果或异常无法序列化时，退化为字符串描述
+            conn.send((False, RuntimeError(f"{type(reply[1]).__name__}: {reply[1]}")))
+
+
+class _Worker:
+    """工作进程及其父端管道。"""
+
+    def __init__(self, process: multiprocessing.process.BaseProcess, conn: Connection) -> None:
+        self.process = process
+        self.conn = conn
+
+    def kill(self, grace: float = 0.0) -> None:
+        """等待 grace 秒让进程自行退出，仍存活则杀掉，最后关闭管道。"""
+        if grace:
+            self.process.join(timeout=grace)
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class ProcessWorkerPool:
+    """可强制超时的常驻进程池。"""
+
+    def __init__(
+        self,
+        func: Callable[..., Any],
+        *,
+        workers: int = 2,
+        initializer: Optional[Callable[[], Any]] = None,
+        name: str = "worker-pool",
+    ) -> None:
+        """初始化（工作进程在 start() 或首次 run() 时启动）。
+
+        参数：
+            func: 在工作进程中执行的函数（需可被 pickle，即模块级函数）
+            workers: 工作进程数
+            initializer: 工作进程启动时执行一次的函数
+            name: 进程名前缀（用于日志与 ps）
+        """
+        self.func = func
+        self.workers = max(1, workers)
+        self.initializer = initializer
+        self.name = name
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: Optional[asyncio.Queue[_Worker]] = None
+        self._all: set[_Worker] = set()
+        self._respawns: set[asyncio.Task] = set()
+        self._closed = False
+        self._waiting = 0
+        self._busy = 0
+        self._completed = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._restarts = 0
+        self._durations: deque[float] = deque(maxlen=_DURATION_WINDOW)
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.func, self.initializer),
+            name=f"{self.name}-{len(self._all) + self._restarts}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        worker = _Worker(process, parent_conn)
+        self._all.add(worker)
+        return worker
+
+    async def start(self) -> None:
+        """启动全部工作进程（重复调用无副作用）。"""
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        for _ in range(self.workers):
+            self._idle.put_nowait(self._spawn())
+        logger.info(f"[POOL] {self.name} started {self.workers} worker processes")
+
+    def _replace(self, worker: _Worker) -> None:
+        """后台杀掉故障/超时的工作进程并补充一个新进程。"""
+        self._all.discard(worker)
+        self._restarts += 1
+
+        async def respawn() -> None:
+            await asyncio.to_thread(worker.kill)
+            if not self._closed and self._idle is not None:
+                self._idle.put_nowait(self._spawn())
+
+        task = asyncio.create_task(respawn())
+        self._respawns.add(task)
+        task.add_done_callback(self._respawns.discard)
+
+    async def run(
+        self,
+        *args: Any,
+        timeout: Optional[float] = None,
+        on_progress: Optional[Callable[[Any], Any]] = None,
+    ) -> Any:
+        """在空闲工作进程中执行 func(*args)。
+
+        参数：
+            args: 传给 func 的参数（需可被 pickle）
+            timeout: 单个任务的最长执行时间（秒，不含排队），超时即杀掉工作进程
+            on_progress: 接收 func 内 report_progress() 上报数据的回调（可为协程函数）
+
+        返回：
+            func 的返回值
+
+        异常：
+            asyncio.TimeoutError: 任务超时（工作进程已被终止）
+            RuntimeError: 工作进程异常退出或池已关闭
+            Exception: func 在工作进程中抛出的异常
+        """
+        if self._closed:
+            raise RuntimeError(f"{self.name} is closed")
+        await self.start()
+        assert self._idle is not None
+
+        self._waiting += 1
+        try:
+            worker = await self._idle.get()
+        finally:
+            self._waiting -= 1
+
+        self._busy += 1
+        start = time.perf_counter()
+        healthy = False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            worker.conn.send(args)
+            while True:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                ready = await asyncio.to_thread(worker.conn.poll, remaining)
+                if not ready:
+                    self._timeouts += 1
+                    raise asyncio.TimeoutError(f"{self.name} task exceeded {timeout}s")
+                try:
+                    ok, value = worker.conn.recv()
+                except (EOFError, OSError) as e:
+                    raise RuntimeError(
+                        f"{self.name} worker exited unexpectedly (exit code {worker.process.exitcode})"
+                    ) from e
+                if ok is not None:
+                    break
+                if on_progress is not None:
+                    try:
+                        outcome = on_progress(value)
+                        if inspect.isawaitable(outcome):
+                            await outcome
+                    except Exception as e:
+                        logger.warning(f"[POOL] {self.name} progress callback failed: {e}")
+            healthy = True
+            if not ok:
+                self._failed += 1
+                raise value
+            self._completed += 1
+            return value
+        finally:
+            self._busy -= 1
+            self._durations.append(time.perf_counter() - start)
+            if healthy:
+                self._idle.put_nowait(worker)
+            else:
+                # 超时、取消或崩溃：工作进程状态未知（可能仍在执行），直接替换
+                self._replace(worker)
+
+    def metrics(self) -> dict:
+        """返回池状态与任务耗时统计（毫秒）。"""
+        durations = sorted(self._durations)
+
+        def percentile(q: float) -> Optional[float]:
+            if not durations:
+                return None
+            return round(durations[min(len(durations) - 1, int(q * len(durations)))] * 1000, 1)
+
+        return {
+            "workers": self.workers,
+            "alive": sum(1 for w in self._all if w.process.is_alive()),
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "busy": self._busy,
+            "queue_depth": self._waiting,
+            "completed": self._completed,
+            "failed": self._failed,
+            "timeouts": self._timeouts,
+            "restarts": self._restarts,
+            "duration_ms": {
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": round(durations[-1] * 1000, 1) if durations else None,
+                "samples": len(durations),
+            },
+        }
+
+    async def shutdown(self) -> None:
+        """停止全部工作进程。"""
+        self._closed = True
+        # 等待后台替换任务杀掉旧进程（_closed 后不再补充新进程）
+        await asyncio.gather(*self._respawns, return_exceptions=True)
+        workers = list(self._all)
+        self._all.clear()
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        await asyncio.gather(*(asyncio.to_thread(w.kill, 1.0) for w in workers))
+        logger.info(f"[POOL] {self.name} stopped")
+
+
+__all__ = ["ProcessWorkerPool", "report_progress"]
@@ -1,12 +1,22 @@
 """使用 LangGraph Agentic RAG 模式定义代理的检索工具。"""
 
-from typing import Iterable, Optional
+import asyncio
+from typing import Any, Iterable, Optional, Sequence
 
 from langchain.tools import tool
 from langchain_core.documents import Document
 
-from agent.vectorstore import get_vector_store
+from agent.retrieval_cache import get_retrieval_cache
+from agent.vectorstore import (
+    abatch_similarity_search_by_vector,
+    aembed_queries,
+    aembed_query,
+    ahybrid_search_by_vector,
+    asimilarity_search_by_vector_with_score,
+    resolve_collection_name,
+)
 from config.settings import get_settings
+from utils.reranker import get_reranker
 
 
 def _serialize_documents(documents: Iterable, include_scores: bool = False) -> str:
@@ -30,10 +40,10 @@ def _serialize_documents(documents: Iterable, include_scores: bool = False) -> s
     return "\n\n".join(parts)
 
 
-def _rerank_documents(
+async def _rerank_documents(
     documents: list[Document], query: str, settings
 ) -> Optional[list[Document]]:
-    """使用 DashScope Rerank 重排文档。
+    """使用共享的异步 DashScope Rerank 客户端重排文档。
     
     参数：
         documents: 待重排的文档列表
@@ -41,57 +51,219 @@ def _rerank_documents(
         settings: 配置对象
         
     返回：
-        重排后的文档列表，如果 rerank 禁用则返回 None
+        重排后的文档列表，如果 rerank 禁用则返回 None；
+        超出 RERANK_TIMEOUT_MS 预算时按向量顺序返回前 top_n 个
     """
     if not settings.rerank_enabled or not documents:
         return None
     
-    try:
-        from langchain_community.document_compressors.dashscope_rerank import (
-            DashScopeRerank,
-        )
-        
-        reranker = DashScopeRerank(
-            model=settings.rerank_model,
-            dashscope_api_key=settings.dashscope_api_key,
-            top_n=settings.rerank_top_n,
-        )
-        
-        reranked_docs = reranker.compress_documents(documents, query)
-        return list(reranked_docs)
-    except ImportError:
-        raise ImportError(
-            "Could not import DashScopeRerank. "
-            "Please install it with `pip install dashscope`."
+    return await get_reranker().arerank(query, documents, top_n=settings.rerank_top_n)
+
+
+def _cache_params_key(settings, metadata_filter: Optional[dict] = None) -> str:
+    """影响检索结果的参数，参数不同的缓存条目互不命中。
+
+    包括嵌入模型与维度、检索模式与 top_k、hybrid 的候选数与 RRF k、
+    向量索引的查询参数（ef_search / probes / iterative_scan）、Rerank 配置与元数据过滤条件。
+    """
+    dimensions = (
+        settings.embeddings_dimensions if settings.embeddings_request_dimensions else "native"
+    )
+    mode = settings.retrieval_mode
+    if mode == "hybrid":
+        mode = f"hybrid:{settings.hybrid_candidates}:{settings.hybrid_rrf_k}"
+    index = (
+        f"{settings.hnsw_ef_search}:{settings.ivfflat_probes}:{settings.vector_iterative_scan}"
+    )
+    rerank = (
+        f"{settings.rerank_model}:{settings.rerank_top_n}:{settings.rerank_url}"
+        if settings.rerank_enabled
+        else "off"
+    )
+    filters = ",".join(f"{k}={v}" for k, v in sorted((metadata_filter or {}).items()))
+    return (
+        f"{settings.embeddings_model}:{dimensions}|mode={mode}"
+        f"|k={settings.retriever_top_k}|index={index}|rerank={rerank}|filter={filters}"
+    )
+
+
+def _build_metadata_filter(
+    source: Optional[str] = None, document_type: Optional[str] = None
+) -> Optional[dict]:
+    """将工具参数转换为向量存储的元数据过滤条件，没有条件时返回 None。"""
+    metadata_filter = {
+        key: value
+        for key, value in (("source", source), ("document_type", document_type))
+        if value
+    }
+    return metadata_filter or None
+
+
+async def _asearch(
+    query: str,
+    embedding: list[float],
+    settings,
+    collection_name: str,
+    metadata_filter: Optional[dict],
+) -> tuple[list[Document], bool]:
+    """按 RETRIEVAL_MODE 执行单个查询的检索，返回 (文档列表, 首个结果是否精确命中)。"""
+    if settings.retrieval_mode == "hybrid":
+        # 向量 + 二元组全文检索，单条 SQL 内 RRF 融合
+        hits = await ahybrid_search_by_vector(
+            query,
+            embedding,
+            k=settings.retriever_top_k,
+            collection_name=collection_name,
+            metadata_filter=metadata_filter,
         )
-    except Exception as e:
-        raise RuntimeError(f"Rerank failed: {str(e)}")
+        return [doc for doc, _, _ in hits], bool(hits) and hits[0][2]
+
+    results = await asimilarity_search_by_vector_with_score(
+        embedding,
+        k=settings.retriever_top_k,
+        collection_name=collection_name,
+        metadata_filter=metadata_filter,
+    )
+    return [doc for doc, _ in results], False
+
+
+async def _afinalize(
+    query: str, retrieved_docs: list[Document], exact_hit: bool, settings
+) -> tuple[str, list[Document]]:
+    """可选的 Rerank 重排后序列化为 content_and_artifact 元组。"""
+    # 首个结果精确命中查询（公司名、项目代码等）时无需再 rerank
+    if settings.rerank_enabled and retrieved_docs and not exact_hit:
+        reranked_docs = await _rerank_documents(retrieved_docs, query, settings)
+        if reranked_docs:
+            retrieved_docs = reranked_docs
+    return _serialize_documents(retrieved_docs, include_scores=True), retrieved_docs
 
 
 @tool(response_format="content_and_artifact")
-def retrieve_context(query: str):
+async def retrieve_context(
+    query: str,
+    source: Optional[str] = None,
+    document_type: Optional[str] = None,
+):
     """搜索 PDF/向量知识库以获取公司/项目/文档信息。
 
     当用户询问任何公司、项目、业务范围、融资、新闻、
     产品、合作方、政策/标书/招标文件等时，需要基于知识库给出证据和摘要时使用。
 
+    参数：
+        query: 检索问题
+        source: 可选，只在指定文档（元数据 source，如 "xx公司BP"）中检索
+        document_type: 可选，只检索指定类型的文档块（如 "mineru_markdown"）
+
     返回：
         content: str - 人类可读的来源 + LLM 的内容（包含相关性分数）
         artifact: list - 用于引用的原始 Document 对象
     """
     settings = get_settings()
-    vector_store = get_vector_store()
-    
-    # 第一步：向量检索
-    retrieved_docs = vector_store.similarity_search(query, k=settings.retriever_top_k)
+    collection_name = resolve_collection_name()
+    metadata_filter = _build_metadata_filter(source, document_type)
+    embedding = await aembed_query(query)
+
+    # 第零步：语义缓存（相近问题直接复用上一次的最终结果）
+    cache = get_retrieval_cache() if settings.retrieval_cache_enabled else None
+    if cache is not None:
+        params_key = _cache_params_key(settings, metadata_filter)
+        generation = await cache.current_generation(collection_name)
+        cached = await cache.aget(
+            collection_name, embedding, params_key, generation=generation
+        )
+        if cached is not None:
+            return cached
     
-    # 第二步：可选的 Rerank 重排
-    if settings.rerank_enabled and retrieved_docs:
-        reranked_docs = _rerank_documents(retrieved_docs, query, settings)
-        if reranked_docs:
-            retrieved_docs = reranked_docs
+    # 第一步：检索（异步查询，复用共享连接池）
+    retrieved_docs, exact_hit = await _asearch(
+        query, embedding, settings, collection_name, metadata_filter
+    )
     
+    # 第二步：可选的 Rerank 重排（长连接异步客户端，受时间预算约束）
     # 返回 content_and_artifact 格式（元组）
-    return _serialize_documents(retrieved_docs, include_scores=True), retrieved_docs
+    result = await _afinalize(query, retrieved_docs, exact_hit, settings)
+    if cache is not None:
+        await cache.aset(
+            collection_name, embedding, result, params_key, generation=generation
+        )
+    return result
+
+
+async def aretrieve_batch(calls: Sequence[dict[str, Any]]) -> list[tuple[str, list[Document]]]:
+    """批量执行多个 retrieve_context 调用。
+
+    所有查询的向量合并为一次嵌入请求；vector 模式下相同过滤条件的查询
+    合并为一条 LATERAL SQL（hybrid 模式下各查询在连接池上并发执行）。
+    语义缓存、Rerank 与单次调用的行为保持一致。
+
+    参数：
+        calls: retrieve_context 的参数字典列表（query / source / document_type）
+
+    返回：
+        与 calls 顺序一致的 (content, artifact) 元组列表
+    """
+    settings = get_settings()
+    collection_name = resolve_collection_name()
+    queries = [call["query"] for call in calls]
+    filters = [
+        _build_metadata_filter(call.get("source"), call.get("document_type")) for call in calls
+    ]
+    embeddings = await aembed_queries(queries)
+    results: list[Optional[tuple[str, list[Document]]]] = [None] * len(calls)
+
+    # 第零步：语义缓存
+    cache = get_retrieval_cache() if settings.retrieval_cache_enabled else None
+    if cache is not None:
+        generation = await cache.current_generation(collection_name)
+        for i, (embedding, metadata_filter) in enumerate(zip(embeddings, filters)):
+            results[i] = await cache.aget(
+                collection_name,
+                embedding,
+                _cache_params_key(settings, metadata_filter),
+                generation=generation,
+            )
+    pending = [i for i, result in enumerate(results) if result is None]
+
+    # 第一步：检索
+    searched: dict[int, tuple[list[Document], bool]] = {}
+    if settings.retrieval_mode == "hybrid":
+        hits = await asyncio.gather(
+            *(
+                _asearch(queries[i], embeddings[i], settings, collection_name, filters[i])
+                for i in pending
+            )
+        )
+        searched = dict(zip(pending, hits))
+    else:
+        groups: dict[str, list[int]] = {}
+        for i in pending:
+            groups.setdefault(_cache_params_key(settings, filters[i]), []).append(i)
+        for indices in groups.values():
+            batch = await abatch_similarity_search_by_vector(
+                [embeddings[i] for i in indices],
+                k=settings.retriever_top_k,
+                collection_name=collection_name,
+                metadata_filter=filters[indices[0]],
+            )
+            for i, rows in zip(indices, batch):
+                searched[i] = ([doc for doc, _ in rows], False)
+
+    # 第二步：可选的 Rerank 重排（各查询并发）
+    finalized = await asyncio.gather(
+        *(_afinalize(queries[i], *searched[i], settings) for i in pending)
+    )
+    for i, result in zip(pending, finalized):
+        results[i] = result
+        if cache is not None:
+            await cache.aset(
+                collection_name,
+                embeddings[i],
+                result,
+                _cache_params_key(settings, filters[i]),
+                generation=generation,
+            )
+    return results
+
 
-__all__ = ["retrieve_context"]
\ No newline at end of file
+__all__ = ["retrieve_context", "aretrieve_batch"]
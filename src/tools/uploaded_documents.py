@@ -0,0 +1,50 @@
+"""检索当前会话上传文档的工具（agent.thread_documents 中按 thread 隔离的索引）。"""
+
+from typing import Optional
+
+from langchain.tools import tool
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableConfig
+
+from agent.thread_documents import get_thread_document_index
+from agent.vectorstore import aembed_query
+from config.settings import get_settings
+from tools.retrieval import _serialize_documents
+
+
+def _thread_id_from_config(config: Optional[RunnableConfig]) -> Optional[str]:
+    """从 LangGraph 配置中读取 thread_id。"""
+    if not config:
+        return None
+    return (config.get("configurable") or {}).get("thread_id")
+
+
+@tool(response_format="content_and_artifact")
+async def search_uploaded_documents(query: str, config: RunnableConfig):
+    """搜索用户在本次对话中上传的文档，返回与问题最相关的片段。
+
+    当消息中的 <uploaded_documents> 提示文档内容已建立检索索引（没有附带全文）时，
+    回答与这些文档相关的问题前必须先调用此工具；可以用不同的关键词多次调用。
+
+    参数：
+        query: 检索问题
+
+    返回：
+        content: str - 人类可读的来源 + 片段内容（包含相关性分数）
+        artifact: list - 用于引用的原始 Document 对象
+    """
+    thread_id = _thread_id_from_config(config)
+    index = get_thread_document_index()
+    if not thread_id or not await index.ahas_documents(thread_id):
+        return "本次对话没有可检索的上传文档（索引可能已过期，请用户重新上传）。", []
+
+    embedding = await aembed_query(query)
+    hits = await index.asearch(thread_id, embedding, k=get_settings().thread_docs_top_k)
+    documents = [
+        Document(page_content=doc.page_content, metadata={**doc.metadata, "relevance_score": score})
+        for doc, score in hits
+    ]
+    return _serialize_documents(documents, include_scores=True), documents
+
+
+__all__ = ["search_uploaded_documents"]
@@ -0,0 +1,333 @@
+"""批量入库：发现目录树下全部 MinerU 输出，多进程解析分块，共享嵌入流水线写入向量库，可断点续跑。
+
+用法（在 src 目录下）：
+    python -m utils.bulk_ingest ../data/ocr --collection bp_pdf --workers 8
+    python -m utils.bulk_ingest ../data/ocr --collection bp_pdf --write-mode copy --defer-index --index-method hnsw
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import AsyncExitStack
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+from agent.vectorstore import resolve_collection_name
+from config.settings import get_settings
+from db.vector_index import INDEX_METHODS, deferred_index_build
+from utils.embedding_pipeline import get_embedding_pipeline
+from utils.mineru_processor import MineruProcessor
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".ingest_manifest.json"
+
+
+def discover_sources(root: Path) -> list[Path]:
+    """返回 root 下所有 MinerU 输出目录（包含 auto/*.md 的目录），按路径排序。"""
+    root = root.resolve()
+    sources = {
+        auto_dir.parent
+        for auto_dir in root.rglob("auto")
+        if auto_dir.is_dir() and any(auto_dir.glob("*.md"))
+    }
+    if (root / "auto").is_dir() and any((root / "auto").glob("*.md")):
+        sources.add(root)
+    return sorted(sources)
+
+
+def source_fingerprint(source_dir: Path) -> str:
+    """由 Markdown 与 content_list.json 的文件名、大小、修改时间计算指纹（不读取文件内容）。"""
+    digest = hashlib.sha256()
+    auto_dir = source_dir / "auto"
+    for path in sorted([*auto_dir.glob("*.md"), *auto_dir.glob("*_content_list.json")]):
+        stat = path.stat()
+        digest.update(f"{path.name}\x00{stat.st_size}\x00{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class IngestManifest:
+    """断点续跑清单：记录每个输出目录的指纹与入库结果，每处理完一个文档原子写回磁盘。"""
+
+    def __init__(self, path: Path, entries: Optional[dict[str, dict]] = None) -> None:
+        """绑定清单文件路径与已有记录。"""
+        self.path = path
+        self.entries: dict[str, dict] = entries or {}
+
+    @classmethod
+    def load(cls, path: Path) -> "IngestManifest":
+        """读取清单（不存在或损坏时返回空清单）。"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entries = json.load(f).get("sources", {})
+        except FileNotFoundError:
+            entries = {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {path}: {e}")
+            entries = {}
+        return cls(path, entries)
+
+    def is_done(self, source_dir: Path, fingerprint: str, collection: Optional[str]) -> bool:
+        """该目录是否已以相同指纹成功入库到同一集合。"""
+        entry = self.entries.get(str(source_dir))
+        return (
+            entry is not None
+            and entry.get("status") == "succeeded"
+            and entry.get("fingerprint") == fingerprint
+            and entry.get("collection") == collection
+        )
+
+    def record(self, source_dir: Path, **entry) -> None:
+        """记录一个目录的处理结果并写回磁盘。"""
+        self.entries[str(source_dir)] = {**entry, "updated_at": time.time()}
+        self.save()
+
+    def save(self) -> None:
+        """原子写入清单（先写临时文件再替换）。"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"sources": self.entries}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+@dataclass
+class BulkIngestReport:
+    """批量入库统计。"""
+
+    sources_found: int = 0
+    skipped: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    chunks: int = 0
+    chunks_embedded: int = 0
+    images_copied: int = 0
+    workers: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def documents_per_second(self) -> float:
+        """每秒处理的文档数（不含跳过的文档）。"""
+        return (self.succeeded + self.failed) / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        """每秒产出的文档块数。"""
+        return self.chunks / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def as_dict(self) -> dict:
+        """转换为字典（包含吞吐量）。"""
+        return {
+            **asdict(self),
+            "elapsed_seconds": round(self.elapsed_seconds, 2),
+            "documents_per_second": round(self.documents_per_second, 3),
+            "chunks_per_second": round(self.chunks_per_second, 2),
+        }
+
+
+def _prepare_source(
+    source_path: str, collection_name: Optional[str]
+) -> tuple[List[Document], int, str]:
+    """子进程入口：复制图片并分块（CPU 密集部分）。"""
+    return MineruProcessor().prepare(source_path, collection_name)
+
+
+async def run_bulk_ingest(
+    root: Path,
+    *,
+    collection_name: Optional[str] = None,
+    workers: Optional[int] = None,
+    max_inflight: Optional[int] = None,
+    embed: bool = True,
+    manifest_path: Optional[Path] = None,
+    force: bool = False,
+    write_mode: Optional[str] = None,
+    defer_index: bool = False,
+    index_method: Optional[str] = None,
+) -> BulkIngestReport:
+    """
+    批量入库 root 下全部 MinerU 输出。
+
+    - 解析、图片复制与分块在 workers 个子进程中并行执行
+    - 嵌入使用同一个 EmbeddingPipeline，所有文档共享 EMBEDDING_CONCURRENCY 并发上限
+    - 同时处于“已分块、未写入”状态的文档不超过 max_inflight 个，限制内存占用
+    - 指纹未变且已成功入库的目录直接跳过（force=True 时全部重跑）
+
+    参数：
+        root: MinerU 输出根目录
+        collection_name: 向量存储集合名称（默认使用 VECTOR_COLLECTION）
+        workers: 进程数（默认 CPU 核数）
+        max_inflight: 同时在处理中的文档数上限（默认 workers * 2）
+        embed: 是否嵌入写库；False 时只解析分块（用于测量解析吞吐）
+        manifest_path: 清单路径（默认 root/.ingest_manifest.json）
+        force: 忽略清单，全部重新处理
+        write_mode: 写库方式（orm / copy），默认使用 VECTOR_WRITE_MODE
+        defer_index: 导入期间删除集合的 ANN 索引，全部写入后再构建（适合首次大批量导入）
+        index_method: defer_index 时集合原本没有索引，则导入后新建该类型的索引
+
+    返回：
+        BulkIngestReport
+    """
+    settings = get_settings()
+    collection = (collection_name or settings.default_collection) if embed else None
+    workers = max(1, workers or os.cpu_count() or 1)
+    manifest = IngestManifest.load(manifest_path or root / MANIFEST_NAME)
+
+    report = BulkIngestReport(workers=workers)
+    sources = discover_sources(root)
+    report.sources_found = len(sources)
+    pending: list[tuple[Path, str]] = []
+    for source_dir in sources:
+        fingerprint = source_fingerprint(source_dir)
+        if not force and manifest.is_done(source_dir, fingerprint, collection):
+            report.skipped += 1
+        else:
+            pending.append((source_dir, fingerprint))
+    logger.info(
+        f"[BULK] Found {len(sources)} MinerU outputs under {root}: "
+        f"{len(pending)} to process, {report.skipped} unchanged"
+    )
+
+    processor = MineruProcessor(embedding_pipeline=get_embedding_pipeline() if embed else None)
+    if write_mode:
+        processor.write_mode = write_mode
+    inflight = asyncio.Semaphore(max(1, max_inflight or workers * 2))
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+
+    async def handle(executor: ProcessPoolExecutor, source_dir: Path, fingerprint: str) -> None:
+        async with inflight:
+            try:
+                documents, images_copied, source_name = await loop.run_in_executor(
+                    executor, _prepare_source, str(source_dir), collection
+                )
+                stats: dict = {}
+                if embed:
+                    stats = await processor.areconcile_source(documents, source_name, collection)
+            except Exception as e:
+                logger.error(f"[BULK] Failed {source_dir}: {e}")
+                report.failed += 1
+                manifest.record(
+                    source_dir,
+                    status="failed",
+                    fingerprint=fingerprint,
+                    collection=collection,
+                    error=f"{type(e).__name__}: {e}",
+                )
+                return
+
+        report.succeeded += 1
+        report.chunks += len(documents)
+        report.chunks_embedded += stats.get("chunks_embedded", 0)
+        report.images_copied += images_copied
+        report.elapsed_seconds = time.perf_counter() - start
+        manifest.record(
+            source_dir,
+            status="succeeded" if embed else "prepared",
+            fingerprint=fingerprint,
+            collection=collection,
+            source=source_name,
+            chunks=len(documents),
+            **stats,
+        )
+        logger.info(
+            f"[BULK] {report.succeeded + report.failed}/{len(pending)} {source_name}: "
+            f"{len(documents)} chunks ({report.documents_per_second:.2f} docs/s, "
+            f"{report.chunks_per_second:.1f} chunks/s)"
+        )
+
+    if pending:
+        async with AsyncExitStack() as stack:
+            if embed and defer_index:
+                await stack.enter_async_context(
+                    deferred_index_build(resolve_collection_name(collection), index_method)
+                )
+            # spawn：子进程不继承父进程的事件循环与数据库连接
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                await asyncio.gather(*(handle(executor, d, fp) for d, fp in pending))
+
+    report.elapsed_seconds = time.perf_counter() - start
+    logger.info(f"[BULK] Done: {report.as_dict()}")
+    return report
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Bulk-ingest a tree of MinerU outputs")
+    parser.add_argument("root", type=Path, help="directory containing <name>/auto/ outputs")
+    parser.add_argument("--collection", default=None)
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    parser.add_argument("--max-inflight", type=int, default=None)
+    parser.add_argument("--manifest", type=Path, default=None)
+    parser.add_argument("--no-embed", action="store_true", help="only parse and chunk")
+    parser.add_argument("--force", action="store_true", help="ignore the manifest and reprocess everything")
+    parser.add_argument("--write-mode", choices=("orm", "copy"), default=None)
+    parser.add_argument(
+        "--defer-index", action="store_true", help="drop ANN indexes during the load and build them afterwards"
+    )
+    parser.add_argument(
+        "--index-method", choices=INDEX_METHODS, default=None,
+        help="with --defer-index, build this index after the load if the collection had none",
+    )
+    return parser
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    from db.database import DatabaseManager
+
+    try:
+        report = await run_bulk_ingest(
+            args.root,
+            collection_name=args.collection,
+            workers=args.workers,
+            max_inflight=args.max_inflight,
+            embed=not args.no_embed,
+            manifest_path=args.manifest,
+            force=args.force,
+            write_mode=args.write_mode,
+            defer_index=args.defer_index,
+            index_method=args.index_method,
+        )
+        return report.as_dict()
+    finally:
+        await DatabaseManager.close()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """命令行入口。"""
+    logging.basicConfig(level=logging.INFO)
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    result = asyncio.run(_run(_build_parser().parse_args(argv)))
+    sys.stdout.write(json.dumps(result, ensure_ascii=False, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
+
+
+__all__ = [
+    "BulkIngestReport",
+    "IngestManifest",
+    "discover_sources",
+    "run_bulk_ingest",
+    "source_fingerprint",
+]
@@ -0,0 +1,236 @@
+"""基于 MinerU content_list.json 的结构感知分块：按 token 预算打包内容块，表格/图片与标题说明不拆分，记录页码。"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+logger = logging.getLogger(__name__)
+
+TokenCounter = Callable[[str], int]
+
+# MinerU 判定为页眉/页脚/页码等版面噪声的块
+SKIPPED_BLOCK_TYPES = ("discarded",)
+# 作为整体保留、不在内部切分的块
+ATOMIC_BLOCK_TYPES = ("table", "image", "equation")
+
+_CJK_RE = re.compile(r"[　-〿㐀-䶿一-鿿＀-￯]")
+_WORD_RE = re.compile(r"[A-Za-z0-9_]+|[^\sA-Za-z0-9_]")
+
+
+def _estimate_tokens(text: str) -> int:
+    """未安装 tiktoken 时的近似计数：中文每字约 1 token，其余按词/符号计。"""
+    cjk = len(_CJK_RE.findall(text))
+    rest = _CJK_RE.sub(" ", text)
+    return cjk + len(_WORD_RE.findall(rest))
+
+
+@lru_cache(maxsize=4)
+def get_token_counter(encoding_name: str = "cl100k_base") -> TokenCounter:
+    """返回 token 计数函数（优先使用 tiktoken，不可用时退化为近似估算）。"""
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable ({e}); using approximate token counts")
+        return _estimate_tokens
+
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+@dataclass
+class ContentChunk:
+    """分块结果。
+
+    字段说明：
+    - text: 块内容（Markdown）
+    - pages: 覆盖的页码（从 1 开始）
+    - section: 所属的最近一级标题
+    - block_types: 包含的内容块类型
+    - tokens: token 数
+    """
+
+    text: str
+    pages: list[int] = field(default_factory=list)
+    section: Optional[str] = None
+    block_types: list[str] = field(default_factory=list)
+    tokens: int = 0
+
+    def metadata(self) -> dict:
+        """转换为写入向量库的元数据。"""
+        return {
+            "page_start": self.pages[0] if self.pages else None,
+            "page_end": self.pages[-1] if self.pages else None,
+            "pages": self.pages,
+            "section": self.section,
+            "block_types": self.block_types,
+            "tokens": self.tokens,
+        }
+
+
+def load_content_list(path: Path) -> list[dict]:
+    """读取 MinerU 的 *_content_list.json。"""
+    with open(path, "r", encoding="utf-8") as f:
+        blocks = json.load(f)
+    if not isinstance(blocks, list):
+        raise ValueError(f"Unexpected content list format: {path}")
+    return blocks
+
+
+def find_content_list(auto_dir: Path) -> Optional[Path]:
+    """在 MinerU auto 目录中查找 content_list.json（不存在时返回 None）。"""
+    matches = sorted(auto_dir.glob("*_content_list.json"))
+    return matches[0] if matches else None
+
+
+class ContentListChunker:
+    """将 MinerU content_list 的内容块打包为不超过 token 预算的文档块。
+
+    - 标题块（text_level）在当前块已达到预算的 min_fill 比例时开启新块，并作为后续块的 section；
+      当前块偏小时标题并入当前块，避免幻灯片类文档产生大量只有一两句话的碎块
+    - 相邻的文本块依次打包，直到再加入下一块会超出 max_tokens
+    - 表格、图片、公式连同其标题与脚注作为整体，放不下时另起一块，单独超出预算也不拆分
+    - 超出预算的单个文本块按 token 数递归切分
+    - discarded（页眉、页脚、页码）被丢弃
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 512,
+        *,
+        image_prefix: str = "",
+        min_fill: float = 0.5,
+        token_counter: Optional[TokenCounter] = None,
+    ) -> None:
+        """初始化分块器。
+
+        参数：
+        - max_tokens: 每块的 token 预算
+        - image_prefix: 图片路径前缀（替换 content_list 中的 images/ 目录）
+        - min_fill: 遇到标题时，当前块至少达到 max_tokens * min_fill 才另起一块
+        - token_counter: token 计数函数，默认 get_token_counter()
+        """
+        self.max_tokens = max(1, max_tokens)
+        self.image_prefix = image_prefix.rstrip("/")
+        self.min_fill = min_fill
+        self.count_tokens = token_counter or get_token_counter()
+        self._text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.max_tokens,
+            chunk_overlap=self.max_tokens // 8,
+            length_function=self.count_tokens,
+            separators=["\n\n", "\n", "。", "；", "，", ". ", " ", ""],
+        )
+
+    def _image_path(self, img_path: str) -> str:
+        filename = Path(img_path).name
+        return f"{self.image_prefix}/{filename}" if self.image_prefix else img_path
+
+    def _render(self, block: dict) -> str:
+        """将内容块渲染为 Markdown。"""
+        block_type = block.get("type")
+        if block_type == "table":
+            parts = [*block.get("table_caption", []), block.get("table_body", "")]
+            if not block.get("table_body") and block.get("img_path"):
+                parts.append(f"![]({self._image_path(block['img_path'])})")
+            parts += block.get("table_footnote", [])
+        elif block_type == "image":
+            parts = [
+                f"![]({self._image_path(block['img_path'])})" if block.get("img_path") else "",
+                *block.get("image_caption", []),
+                *block.get("image_footnote", []),
+            ]
+        elif block.get("text_level"):
+            parts = ["#" * int(block["text_level"]) + " " + block.get("text", "").strip()]
+        else:
+            parts = [block.get("text", "")]
+        return "\n".join(part.strip() for part in parts if part and part.strip())
+
+    def split(self, blocks: Iterable[dict]) -> list[ContentChunk]:
+        """将内容块序列打包为文档块。"""
+        return list(self.iter_split(blocks))
+
+    def iter_split(self, blocks: Iterable[dict]) -> Iterator[ContentChunk]:
+        """逐块消费内容块并产出已完成的文档块（不保留已产出的块）。"""
+        chunks: list[ContentChunk] = []
+        current: Optional[ContentChunk] = None
+        section: Optional[str] = None
+
+        def flush() -> None:
+            nonlocal current
+            if current is not None and current.text:
+                chunks.append(current)
+            current = None
+
+        def append(text: str, tokens: int, page: Optional[int], block_type: str) -> None:
+            nonlocal current
+            if current is None:
+                current = ContentChunk(text="", section=section)
+            current.text = f"{current.text}\n\n{text}" if current.text else text
+            current.tokens += tokens
+            if page is not None and page not in current.pages:
+                current.pages.append(page)
+            if block_type not in current.block_types:
+                current.block_types.append(block_type)
+
+        def consume(block: dict) -> None:
+            nonlocal section
+            block_type = block.get("type", "text")
+            if block_type in SKIPPED_BLOCK_TYPES:
+                return
+            text = self._render(block)
+            if not text:
+                return
+            page = block["page_idx"] + 1 if isinstance(block.get("page_idx"), int) else None
+            tokens = self.count_tokens(text)
+
+            if block.get("text_level"):
+                # 标题处优先断块：当前块已足够大、或加入标题后会超出预算时另起一块
+                if current is not None and (
+                    current.tokens >= self.max_tokens * self.min_fill
+                    or current.tokens + tokens > self.max_tokens
+                ):
+                    flush()
+                section = block.get("text", "").strip() or section
+                append(text, tokens, page, "title")
+                return
+
+            # 当前块只有标题时不单独成块，标题总是与紧随的内容放在一起
+            title_only = current is not None and set(current.block_types) == {"title"}
+            if current is not None and not title_only and current.tokens + tokens > self.max_tokens:
+                flush()
+
+            if block_type in ATOMIC_BLOCK_TYPES or tokens <= self.max_tokens:
+                append(text, tokens, page, block_type)
+                return
+
+            # 超长文本块：按 token 数切分，每段单独成块（第一段与待输出的标题合并）
+            for piece in self._text_splitter.split_text(text):
+                append(piece, self.count_tokens(piece), page, block_type)
+                flush()
+
+        for block in blocks:
+            consume(block)
+            yield from chunks
+            chunks.clear()
+        flush()
+        yield from chunks
+
+
+__all__ = [
+    "ATOMIC_BLOCK_TYPES",
+    "ContentChunk",
+    "ContentListChunker",
+    "SKIPPED_BLOCK_TYPES",
+    "TokenCounter",
+    "find_content_list",
+    "get_token_counter",
+    "load_content_list",
+]
@@ -0,0 +1,192 @@
+"""文档转换结果缓存：本地磁盘按总大小淘汰的 LRU 一级缓存 + 可选的 Redis 共享二级缓存。
+
+缓存键 = 转换器版本 + 文件扩展名 + 文件内容的 SHA-256：同一份文件重复上传（文件名不同也可）
+直接返回上次的 Markdown；升级 MarkItDown 后版本变化，旧条目自然失效。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def content_digest(data: bytes) -> str:
+    """返回文件内容的 SHA-256。"""
+    return hashlib.sha256(data).hexdigest()
+
+
+@dataclass
+class ConversionCacheStats:
+    """转换缓存统计。
+
+    字段说明：
+    - disk_hits: 本地磁盘缓存命中次数
+    - redis_hits: Redis 缓存命中次数
+    - misses: 两级均未命中的次数
+    - evictions: 因超出容量被淘汰的磁盘条目数
+    - redis_errors: Redis 读写失败次数（失败时降级为仅使用磁盘缓存）
+    """
+
+    disk_hits: int = 0
+    redis_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    redis_errors: int = 0
+
+    def as_dict(self) -> dict:
+        """转换为便于日志/接口输出的字典。"""
+        lookups = self.disk_hits + self.redis_hits + self.misses
+        return {
+            "disk_hits": self.disk_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "redis_errors": self.redis_errors,
+            "hit_rate": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+        }
+
+
+class ConversionCache:
+    """按内容寻址的转换结果缓存。
+
+    磁盘条目以 <key 的 SHA-256>.md 存放；命中时刷新修改时间，写入后按修改时间从旧到新
+    淘汰，直到目录总大小不超过 max_bytes（近似 LRU）。
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        version: str,
+        *,
+        max_bytes: int = 1024 * 1024 * 1024,
+        redis_client: Any = None,
+        redis_prefix: str = "conversion_cache",
+        ttl_seconds: int = 7 * 86400,
+    ) -> None:
+        """初始化缓存。
+
+        参数：
+        - directory: 磁盘缓存目录（不存在时自动创建）
+        - version: 转换器版本标识，不同版本的结果互不混用
+        - max_bytes: 磁盘缓存总大小上限（字节）
+        - redis_client: 异步 Redis 客户端，为 None 时仅使用磁盘缓存
+        - redis_prefix: Redis key 前缀
+        - ttl_seconds: Redis 条目过期时间（秒），0 表示不过期
+        """
+        self.directory = Path(directory)
+        self.version = version
+        self.max_bytes = max_bytes
+        self._redis = redis_client
+        self._redis_prefix = redis_prefix
+        self._ttl_seconds = ttl_seconds
+        self.stats = ConversionCacheStats()
+
+    def cache_key(self, digest: str, filename: str) -> str:
+        """生成缓存键（扩展名决定 MarkItDown 选用的转换器，因此也参与缓存键）。"""
+        ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+        return f"{self.version}:{ext}:{digest}"
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.md"
+
+    def _read(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            text = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        # 刷新修改时间作为最近使用时间
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return text
+
+    def _write(self, key: str, markdown: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(markdown)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+        for path in self.directory.glob("*.md"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            path.unlink(missing_ok=True)
+            self.stats.evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self._redis_prefix}:{key}"
+
+    async def aget(self, digest: str, filename: str) -> Optional[str]:
+        """返回缓存的 Markdown（未命中返回 None）。Redis 命中时回填磁盘缓存。"""
+        key = self.cache_key(digest, filename)
+        markdown = await asyncio.to_thread(self._read, key)
+        if markdown is not None:
+            self.stats.disk_hits += 1
+            return markdown
+
+        if self._redis is not None:
+            try:
+                markdown = await self._redis.get(self._redis_key(key))
+            except Exception as e:
+                self.stats.redis_errors += 1
+                logger.warning(f"[CONVERSION_CACHE] Redis read failed: {e}")
+            if markdown is not None:
+                self.stats.redis_hits += 1
+                try:
+                    await asyncio.to_thread(self._write, key, markdown)
+                except OSError as e:
+                    logger.warning(f"[CONVERSION_CACHE] Disk backfill failed: {e}")
+                return markdown
+
+        self.stats.misses += 1
+        return None
+
+    async def aset(self, digest: str, filename: str, markdown: str) -> None:
+        """写入两级缓存（写入失败只记录日志，不影响转换结果）。"""
+        key = self.cache_key(digest, filename)
+        try:
+            await asyncio.to_thread(self._write, key, markdown)
+        except OSError as e:
+            logger.warning(f"[CONVERSION_CACHE] Disk write failed: {e}")
+
+        if self._redis is not None:
+            try:
+                await self._redis.set(
+                    self._redis_key(key),
+                    markdown,
+                    ex=self._ttl_seconds if self._ttl_seconds > 0 else None,
+                )
+            except Exception as e:
+                self.stats.redis_errors += 1
+                logger.warning(f"[CONVERSION_CACHE] Redis write failed: {e}")
+
+
+__all__ = ["ConversionCache", "ConversionCacheStats", "content_digest"]
@@ -0,0 +1,216 @@
+"""文档入库的嵌入流水线：按接口上限分批、有界并发、失败重试（指数退避）、进度回调。"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Awaitable, Callable, Optional, Sequence, Union
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EmbeddingProgress:
+    """嵌入进度。
+
+    字段说明：
+    - total_chunks: 文档块总数
+    - embedded_chunks: 已完成嵌入的文档块数
+    - total_batches: 批次总数
+    - completed_batches: 已完成的批次数
+    - retries: 累计重试次数
+    - started_at: 开始时间（time.monotonic）
+    """
+
+    total_chunks: int
+    total_batches: int
+    embedded_chunks: int = 0
+    completed_batches: int = 0
+    retries: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed_seconds(self) -> float:
+        """已耗时（秒）。"""
+        return time.monotonic() - self.started_at
+
+    def as_dict(self) -> dict:
+        """转换为便于日志/推送的字典。"""
+        return {
+            "total_chunks": self.total_chunks,
+            "embedded_chunks": self.embedded_chunks,
+            "total_batches": self.total_batches,
+            "completed_batches": self.completed_batches,
+            "retries": self.retries,
+            "elapsed_seconds": round(self.elapsed_seconds, 2),
+        }
+
+
+ProgressCallback = Callable[[EmbeddingProgress], Union[None, Awaitable[None]]]
+
+
+class EmbeddingBatchError(RuntimeError):
+    """某个批次在重试次数用尽后仍然失败。"""
+
+
+class EmbeddingPipeline:
+    """并发分批嵌入文本。
+
+    - 文本按 batch_size（嵌入接口单次上限）切分为批次
+    - 最多 concurrency 个批次同时请求
+    - 单个批次失败后按指数退避 + 随机抖动重试，最多 max_retries 次
+    - 每完成一个批次调用一次 on_progress
+    同一实例被多个文档并发使用时，并发上限在所有调用之间共享（get_embedding_pipeline
+    返回进程内共享的实例，EMBEDDING_CONCURRENCY 因此是整个进程的上限）。
+    任一批次最终失败时取消其余批次并抛出 EmbeddingBatchError，不产生部分结果。
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        *,
+        batch_size: int = 10,
+        concurrency: int = 4,
+        max_retries: int = 3,
+        backoff_seconds: float = 1.0,
+        max_backoff_seconds: float = 30.0,
+    ) -> None:
+        """初始化流水线。
+
+        参数：
+        - embeddings: 嵌入模型
+        - batch_size: 每批文本数（DashScope text-embedding-v3/v4 单次上限为 10）
+        - concurrency: 同时进行的批次数
+        - max_retries: 单个批次的最大重试次数
+        - backoff_seconds: 首次重试前的等待时间（秒），之后每次翻倍
+        - max_backoff_seconds: 单次等待时间上限（秒）
+        """
+        self.embeddings = embeddings
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max(0, max_retries)
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.max_backoff_seconds, self.backoff_seconds * (2**attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _embed_batch(
+        self, index: int, texts: list[str], progress: EmbeddingProgress
+    ) -> list[list[float]]:
+        attempt = 0
+        while True:
+            try:
+                vectors = await self.embeddings.aembed_documents(texts)
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise EmbeddingBatchError(
+                        f"Embedding batch {index} failed after {attempt + 1} attempts: {e}"
+                    ) from e
+                delay = self._backoff(attempt)
+                attempt += 1
+                progress.retries += 1
+                logger.warning(
+                    f"[EMBED] Batch {index} failed ({e}); retry {attempt}/{self.max_retries} "
+                    f"in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+            if len(vectors) != len(texts):
+                raise EmbeddingBatchError(
+                    f"Embedding batch {index} returned {len(vectors)} vectors for {len(texts)} texts"
+                )
+            return vectors
+
+    async def aembed_texts(
+        self,
+        texts: Sequence[str],
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> list[list[float]]:
+        """嵌入全部文本，返回与输入顺序一致的向量列表。"""
+        batches = [
+            list(texts[i : i + self.batch_size]) for i in range(0, len(texts), self.batch_size)
+        ]
+        progress = EmbeddingProgress(total_chunks=len(texts), total_batches=len(batches))
+        # 信号量绑定到事件循环；实例在新的事件循环中使用时（如多次 asyncio.run）重新创建
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._semaphore_loop = loop
+        semaphore = self._semaphore
+        results: list[Optional[list[list[float]]]] = [None] * len(batches)
+
+        async def run(index: int, batch: list[str]) -> None:
+            async with semaphore:
+                results[index] = await self._embed_batch(index, batch, progress)
+            progress.completed_batches += 1
+            progress.embedded_chunks += len(batch)
+            if on_progress is not None:
+                outcome = on_progress(progress)
+                if inspect.isawaitable(outcome):
+                    await outcome
+
+        tasks = [asyncio.create_task(run(i, batch)) for i, batch in enumerate(batches)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        logger.info(
+            f"[EMBED] Embedded {len(texts)} chunks in {len(batches)} batches "
+            f"({progress.elapsed_seconds:.1f}s, {progress.retries} retries)"
+        )
+        return [vector for batch in results for vector in batch or []]
+
+    async def aembed_documents(
+        self,
+        documents: Sequence[Document],
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> list[list[float]]:
+        """嵌入 Document 列表的 page_content。"""
+        return await self.aembed_texts([doc.page_content for doc in documents], on_progress)
+
+
+@lru_cache(maxsize=1)
+def get_embedding_pipeline() -> EmbeddingPipeline:
+    """返回进程内共享的嵌入流水线（所有入库任务、会话上传与批量入库共用同一并发上限）。
+
+    重试由流水线统一负责（指数退避 + 抖动）：嵌入客户端自身的重试关闭（max_retries=1，
+    即只尝试一次），否则两层重试次数相乘。
+    """
+    from agent.vectorstore import get_embeddings
+
+    settings = get_settings()
+    embeddings = get_embeddings().model_copy(update={"max_retries": 1})
+    return EmbeddingPipeline(
+        embeddings,
+        batch_size=settings.embedding_batch_size,
+        concurrency=settings.embedding_concurrency,
+        max_retries=settings.embedding_max_retries,
+        backoff_seconds=settings.embedding_retry_backoff_seconds,
+    )
+
+
+__all__ = [
+    "EmbeddingBatchError",
+    "EmbeddingPipeline",
+    "EmbeddingProgress",
+    "ProgressCallback",
+    "get_embedding_pipeline",
+]
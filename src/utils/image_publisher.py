@@ -0,0 +1,131 @@
+"""按内容寻址发布 MinerU 图片：已存在则跳过，同一文件系统上优先硬链接/reflink，其余复制在线程池中并行执行。"""
+
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Linux FICLONE ioctl：在 btrfs / XFS(reflink=1) 等文件系统上共享数据块的写时复制克隆
+_FICLONE = 0x40049409
+
+PUBLISH_METHODS = ("skipped", "hardlink", "reflink", "copy")
+
+
+@dataclass
+class PublishStats:
+    """图片发布统计。"""
+
+    skipped: int = 0
+    hardlink: int = 0
+    reflink: int = 0
+    copy: int = 0
+
+    @property
+    def published(self) -> int:
+        """本次新发布的图片数（不含已存在而跳过的图片）。"""
+        return self.hardlink + self.reflink + self.copy
+
+    @property
+    def total(self) -> int:
+        """处理的图片总数。"""
+        return self.published + self.skipped
+
+
+def _reflink(source: Path, target: Path) -> bool:
+    """尝试以 reflink 克隆文件，不支持时返回 False。"""
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+
+    try:
+        with open(source, "rb") as src, open(target, "xb") as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+                return True
+            except OSError:
+                pass
+        os.unlink(target)
+    except OSError:
+        return False
+    return False
+
+
+def publish_file(source: Path, target: Path, *, same_device: bool = True) -> str:
+    """
+    将单个图片发布到目标路径。
+
+    MinerU 图片以内容哈希命名，目标已存在且大小一致时视为同一内容直接跳过；
+    否则依次尝试硬链接、reflink（仅 same_device 时），最后回退到复制（先写临时文件再原子替换）。
+
+    参数：
+        source: 源图片路径
+        target: 目标路径
+        same_device: 源与目标是否在同一文件系统
+
+    返回：
+        使用的方式：skipped / hardlink / reflink / copy
+    """
+    try:
+        if target.stat().st_size == source.stat().st_size:
+            return "skipped"
+        target.unlink()
+    except FileNotFoundError:
+        pass
+
+    if same_device:
+        try:
+            os.link(source, target)
+            return "hardlink"
+        except FileExistsError:
+            return "skipped"
+        except OSError:
+            pass
+        if _reflink(source, target):
+            return "reflink"
+
+    tmp_path = target.with_name(f".{target.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        shutil.copy2(source, tmp_path)
+        os.replace(tmp_path, target)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return "copy"
+
+
+def publish_images(source_dir: Path, target_dir: Path, *, max_workers: int = 8) -> PublishStats:
+    """
+    将目录下的全部图片发布到目标目录。
+
+    参数：
+        source_dir: 源图片目录（MinerU auto/images）
+        target_dir: 目标目录（前端公共目录）
+        max_workers: 复制线程数
+
+    返回：
+        PublishStats
+    """
+    target_dir.mkdir(parents=True, exist_ok=True)
+    files = [path for path in source_dir.iterdir() if path.is_file()]
+    stats = PublishStats()
+    if not files:
+        return stats
+
+    same_device = source_dir.stat().st_dev == target_dir.stat().st_dev
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(files)))) as executor:
+        for method in executor.map(
+            lambda path: publish_file(path, target_dir / path.name, same_device=same_device),
+            files,
+        ):
+            setattr(stats, method, getattr(stats, method) + 1)
+    return stats
+
+
+__all__ = ["PUBLISH_METHODS", "PublishStats", "publish_file", "publish_images"]
@@ -1,24 +1,40 @@
-"""MarkItDown 文档转换器 - 支持多格式文件转换为 Markdown."""
+"""MarkItDown 文档转换器 - 支持多格式文件转换为 Markdown.
+
+转换在常驻进程池（infra.process_pool）中执行，不阻塞事件循环；
+单个文件超时会直接终止对应的工作进程，避免一个慢文件拖住整个 worker。
+转换结果按文件内容缓存（utils.conversion_cache），重复上传同一文件直接返回。
+PDF / PPTX 还支持逐页转换（utils.page_extractors），每页完成即可返回给调用方。
+"""
 
 from __future__ import annotations
 
-import io
+import asyncio
+import hashlib
 import logging
 import os
-import shutil
-import sys
-import tempfile
 import time
 import warnings
-from typing import Optional
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, AsyncIterator, Optional
 
 # 抑制 pydub ffmpeg 警告（因为我们禁用了音频处理插件）
 warnings.filterwarnings("ignore", message=".*ffmpeg.*", category=RuntimeWarning)
 
 from markitdown import MarkItDown
+from markitdown import __version__ as MARKITDOWN_VERSION
+
+from config.settings import get_settings
+from infra.process_pool import ProcessWorkerPool
+from utils.conversion_cache import ConversionCache
+from utils.page_extractors import extract_page, page_count, supports_pages
 
 logger = logging.getLogger(__name__)
 
+# 上传文件落盘时每次读取的字节数
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 # 全局 MarkItDown 转换器实例（单例）
 _converter: Optional[MarkItDown] = None
 
@@ -37,6 +53,67 @@ def get_converter() -> MarkItDown:
     return _converter
 
 
+def _convert_in_worker(file_path: str, page: Optional[int] = None) -> str:
+    """工作进程入口：转换单个文件（page 不为 None 时只转换该页，从 0 开始）并返回 Markdown 文本。"""
+    if page is not None:
+        return extract_page(file_path, page)
+    return get_converter().convert(file_path).text_content
+
+
+def _warm_up() -> None:
+    """工作进程启动时预先初始化转换器。"""
+    get_converter()
+
+
+@lru_cache(maxsize=1)
+def get_conversion_pool() -> ProcessWorkerPool:
+    """返回进程内共享的 MarkItDown 转换进程池（MARKITDOWN_WORKERS 个常驻工作进程）。"""
+    return ProcessWorkerPool(
+        _convert_in_worker,
+        workers=get_settings().markitdown_workers,
+        initializer=_warm_up,
+        name="markitdown",
+    )
+
+
+async def close_conversion_pool() -> None:
+    """停止共享转换进程池（如果已创建）。"""
+    if get_conversion_pool.cache_info().currsize:
+        await get_conversion_pool().shutdown()
+        get_conversion_pool.cache_clear()
+
+
+@lru_cache(maxsize=1)
+def get_conversion_cache() -> Optional[ConversionCache]:
+    """返回共享的转换结果缓存（MARKITDOWN_CACHE_ENABLED=false 时返回 None）。"""
+    settings = get_settings()
+    if not settings.markitdown_cache_enabled:
+        return None
+    redis_client = None
+    if settings.markitdown_cache_redis_enabled:
+        try:
+            from infra.redis_pubsub import get_redis_client
+
+            redis_client = get_redis_client()
+        except RuntimeError as e:
+            logger.warning(f"Conversion cache Redis tier disabled: {e}")
+    return ConversionCache(
+        settings.markitdown_cache_dir,
+        version=f"markitdown-{MARKITDOWN_VERSION}",
+        max_bytes=settings.markitdown_cache_max_mb * 1024 * 1024,
+        redis_client=redis_client,
+        ttl_seconds=settings.markitdown_cache_ttl_seconds,
+    )
+
+
+def _check_readable(file_path: str) -> None:
+    """确保文件存在且可读。"""
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"文件不存在: {file_path}")
+    if not os.access(file_path, os.R_OK):
+        raise PermissionError(f"文件无法读取: {file_path}")
+
+
 async def convert_file_to_markdown(
     file_path: str,
     filename: str,
@@ -48,101 +125,239 @@ async def convert_file_to_markdown(
     参数：
         file_path: 待转换文件的路径
         filename: 原始文件名（用于日志）
-        timeout: 转换超时时间（秒）
+        timeout: 转换超时时间（秒），超时后终止执行该任务的工作进程
 
     返回：
         (markdown_content, conversion_time_ms) 元组
 
     异常：
-        TimeoutError: 转换超时
+        asyncio.TimeoutError: 转换超时（工作进程已被终止）
         Exception: 转换失败
     """
     start_time = time.time()
-    converter = get_converter()
 
     try:
         logger.info(f"[MARKITDOWN] 开始转换: {filename}")
-        
-        # 确保文件存在且可读
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"文件不存在: {file_path}")
-        
-        if not os.access(file_path, os.R_OK):
-            raise PermissionError(f"文件无法读取: {file_path}")
-        
-        result = converter.convert(file_path)
+        _check_readable(file_path)
+
+        markdown_content = await get_conversion_pool().run(file_path, timeout=timeout)
         elapsed_ms = (time.time() - start_time) * 1000
 
         logger.info(f"[MARKITDOWN] 转换完成 {filename} 耗时 {elapsed_ms:.1f}ms")
-        return result.text_content, elapsed_ms
+        return markdown_content, elapsed_ms
 
     except Exception as e:
         logger.error(f"[MARKITDOWN] 转换失败 {filename}: {str(e)}")
         raise
 
 
-async def convert_upload_file(
-    file_bytes: bytes,
-    filename: str,
+class UploadTooLargeError(ValueError):
+    """上传文件超过大小限制。"""
+
+
+@dataclass
+class SpooledUpload:
+    """已落盘的上传文件。
+
+    字段说明：
+    - filename: 原始文件名
+    - path: 临时文件路径（文件名保留原始扩展名，供 MarkItDown 选择转换器）
+    - size_bytes: 文件大小
+    - digest: 文件内容的 SHA-256
+    """
+
+    filename: str
+    path: str
+    size_bytes: int
+    digest: str
+
+
+async def spool_upload(
+    upload: Any,
+    directory: str,
+    *,
+    max_bytes: Optional[int] = None,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> SpooledUpload:
+    """
+    把上传文件分块写入 directory 下的临时文件，同时计算 SHA-256 并检查大小.
+
+    内存中只保留一个分块，峰值内存与文件大小无关。
+
+    参数：
+        upload: 提供 async read(size) 与 filename 的上传对象（如 FastAPI UploadFile）
+        directory: 写入目录（由调用方负责清理）
+        max_bytes: 大小上限，超过时抛出 UploadTooLargeError
+        chunk_size: 每次读取的字节数
+
+    返回：
+        SpooledUpload
+    """
+    filename = upload.filename or "upload"
+    os.makedirs(directory, exist_ok=True)
+    # 只取文件名部分，避免上传文件名中的路径分隔符
+    path = os.path.join(directory, os.path.basename(filename) or "upload")
+    hasher = hashlib.sha256()
+    size = 0
+    with open(path, "wb") as f:
+
+        def consume(chunk: bytes) -> None:
+            hasher.update(chunk)
+            f.write(chunk)
+
+        while chunk := await upload.read(chunk_size):
+            size += len(chunk)
+            if max_bytes is not None and size > max_bytes:
+                raise UploadTooLargeError(f"{filename} exceeds {max_bytes} bytes")
+            # 哈希与写盘在线程中执行，不阻塞事件循环
+            await asyncio.to_thread(consume, chunk)
+    logger.debug(f"[MARKITDOWN] 上传文件已落盘: {path} ({size} 字节)")
+    return SpooledUpload(filename=filename, path=path, size_bytes=size, digest=hasher.hexdigest())
+
+
+async def convert_spooled_upload(
+    upload: SpooledUpload,
     timeout: int = 60,
-) -> tuple[str, float]:
+) -> tuple[str, float, bool]:
     """
-    将上传的文件字节转换为 Markdown.
+    转换已落盘的上传文件，内容相同（按 SHA-256）且转换器版本相同时直接返回缓存结果.
 
     参数：
-        file_bytes: 文件内容字节
-        filename: 原始文件名
-        timeout: 转换超时时间（秒）
+        upload: spool_upload 的返回值
+        timeout: 转换超时时间（秒），超时后终止执行该任务的工作进程
 
     返回：
-        (markdown_content, conversion_time_ms) 元组
+        (markdown_content, conversion_time_ms, cache_hit) 元组；命中缓存时耗时为查找缓存的时间
     """
-    # 创建临时目录以存储文件
-    tmp_dir = tempfile.mkdtemp()
-    tmp_path = os.path.join(tmp_dir, filename)
-    
-    try:
-        # 写入文件内容到磁盘
-        with open(tmp_path, 'wb') as f:
-            f.write(file_bytes)
-        
-        logger.debug(f"[MARKITDOWN] 临时文件已创建: {tmp_path} ({len(file_bytes)} 字节)")
-        
-        # 转换文件（按官方文档用法：传入文件路径字符串）
-        start_time = time.time()
-        converter = get_converter()
-        
-        logger.info(f"[MARKITDOWN] 开始转换: {filename}")
-        
-        # 确保文件存在且可读
-        if not os.path.exists(tmp_path):
-            raise FileNotFoundError(f"文件不存在: {tmp_path}")
-        
-        if not os.access(tmp_path, os.R_OK):
-            raise PermissionError(f"文件无法读取: {tmp_path}")
-        
-        # 调用 MarkItDown 转换（官方用法：converter.convert(file_path_string)）
-        result = converter.convert(tmp_path)
-        markdown_content = result.text_content
-        elapsed_ms = (time.time() - start_time) * 1000
-        
-        logger.info(f"[MARKITDOWN] 转换完成 {filename} 耗时 {elapsed_ms:.1f}ms")
-        
-        return markdown_content, elapsed_ms
-    
-    except Exception as e:
-        error_msg = f"{type(e).__name__}: {str(e)}"
-        logger.error(f"[MARKITDOWN] 转换失败 {filename}: {error_msg}")
-        raise
-    
-    finally:
-        # 清理临时目录及其所有内容
+    cache = get_conversion_cache()
+    start_time = time.time()
+    if cache is not None:
+        cached = await cache.aget(upload.digest, upload.filename)
+        if cached is not None:
+            elapsed_ms = (time.time() - start_time) * 1000
+            logger.info(f"[MARKITDOWN] 命中缓存 {upload.filename} ({upload.digest[:12]})")
+            return cached, elapsed_ms, True
+
+    markdown_content, elapsed_ms = await convert_file_to_markdown(
+        upload.path, upload.filename, timeout
+    )
+    if cache is not None:
+        await cache.aset(upload.digest, upload.filename, markdown_content)
+    return markdown_content, elapsed_ms, False
+
+
+@dataclass
+class ConvertedPage:
+    """逐页转换的单页结果.
+
+    字段说明：
+    - page: 页码（从 1 开始）；整份文档一次性返回时为 None
+    - total_pages: 总页数；整份文档一次性返回时为 None
+    - markdown: 该页的 Markdown（失败时为 None）
+    - conversion_time_ms: 该页转换耗时（毫秒）
+    - cache_hit: 是否直接返回了缓存的整份文档
+    - error: 失败原因（成功时为 None）
+    """
+
+    page: Optional[int]
+    total_pages: Optional[int]
+    markdown: Optional[str]
+    conversion_time_ms: float
+    cache_hit: bool = False
+    error: Optional[str] = None
+
+
+async def iter_converted_pages(
+    upload: SpooledUpload,
+    timeout: int = 60,
+) -> AsyncIterator[ConvertedPage]:
+    """
+    逐页转换已落盘的上传文件，按页码顺序产出每页结果.
+
+    PDF 按页、PPTX 按幻灯片拆分，每页作为一个独立任务提交到转换进程池：
+    同时最多有 MARKITDOWN_WORKERS 页在转换，先完成的页等前面的页完成后按顺序产出。
+    单页失败或超时只影响该页（产出带 error 的结果），不中断后续页。
+
+    其他格式、或转换缓存中已有整份文档时，产出一个 page 为 None 的整份结果。
+    逐页结果与 MarkItDown 整份转换的排版略有差异，因此不写入转换缓存。
+
+    参数：
+        upload: spool_upload 的返回值
+        timeout: 单页（整份转换时为整份文档）的超时时间（秒）
+
+    返回：
+        按页码顺序的 ConvertedPage 异步迭代器
+
+    异常：
+        asyncio.TimeoutError: 整份转换超时
+        Exception: 统计页数或整份转换失败
+    """
+    cache = get_conversion_cache()
+    start_time = time.time()
+    if cache is not None:
+        cached = await cache.aget(upload.digest, upload.filename)
+        if cached is not None:
+            elapsed_ms = (time.time() - start_time) * 1000
+            logger.info(f"[MARKITDOWN] 命中缓存 {upload.filename} ({upload.digest[:12]})")
+            yield ConvertedPage(None, None, cached, elapsed_ms, cache_hit=True)
+            return
+
+    if not supports_pages(upload.filename):
+        markdown_content, elapsed_ms = await convert_file_to_markdown(
+            upload.path, upload.filename, timeout
+        )
+        if cache is not None:
+            await cache.aset(upload.digest, upload.filename, markdown_content)
+        yield ConvertedPage(None, None, markdown_content, elapsed_ms)
+        return
+
+    _check_readable(upload.path)
+    total = await asyncio.to_thread(page_count, upload.path)
+    logger.info(f"[MARKITDOWN] 开始逐页转换: {upload.filename}（{total} 页）")
+    pool = get_conversion_pool()
+
+    async def convert_page(index: int) -> ConvertedPage:
+        page_start = time.time()
         try:
-            if os.path.exists(tmp_dir):
-                shutil.rmtree(tmp_dir)
-                logger.debug(f"[MARKITDOWN] 临时目录已清理: {tmp_dir}")
+            markdown = await pool.run(upload.path, index, timeout=timeout)
+            error = None
+        except asyncio.TimeoutError:
+            markdown, error = None, f"转换超时（>{timeout}秒）"
         except Exception as e:
-            logger.warning(f"[MARKITDOWN] 删除临时目录失败 {tmp_dir}: {str(e)}")
+            markdown, error = None, f"{type(e).__name__}: {str(e)}"
+        if error is not None:
+            logger.error(f"[MARKITDOWN] 第 {index + 1} 页转换失败 {upload.filename}: {error}")
+        elapsed_ms = (time.time() - page_start) * 1000
+        return ConvertedPage(index + 1, total, markdown, elapsed_ms, error=error)
+
+    # 预先提交与工作进程数相同的页，保持进程池忙碌，同时按页码顺序产出
+    pending: deque[asyncio.Task[ConvertedPage]] = deque()
+    next_index = 0
+    try:
+        while next_index < total or pending:
+            while next_index < total and len(pending) < pool.workers:
+                pending.append(asyncio.create_task(convert_page(next_index)))
+                next_index += 1
+            yield await pending.popleft()
+    finally:
+        # 调用方提前停止迭代（如客户端断开）时取消未完成的页
+        for task in pending:
+            task.cancel()
+
+    elapsed_ms = (time.time() - start_time) * 1000
+    logger.info(f"[MARKITDOWN] 逐页转换完成 {upload.filename}（{total} 页）耗时 {elapsed_ms:.1f}ms")
 
 
-__all__ = ["get_converter", "convert_file_to_markdown", "convert_upload_file"]
+__all__ = [
+    "ConvertedPage",
+    "SpooledUpload",
+    "UploadTooLargeError",
+    "close_conversion_pool",
+    "convert_file_to_markdown",
+    "convert_spooled_upload",
+    "get_conversion_cache",
+    "get_conversion_pool",
+    "get_converter",
+    "iter_converted_pages",
+    "spool_upload",
+]
@@ -1,20 +1,77 @@
 """MinerU 文档处理器，用于处理已解析的 PDF 输出。"""
 
+import asyncio
+import hashlib
 import logging
-import re
-import shutil
+import uuid
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
 
 from pydantic import BaseModel, Field
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from agent.vectorstore import get_vector_store
+from agent.retrieval_cache import get_retrieval_cache
+from agent.vectorstore import (
+    acopy_embeddings,
+    adelete_chunks,
+    afetch_source_chunks,
+    aupdate_chunk_metadata,
+    get_vector_store,
+    resolve_collection_name,
+)
 from config.settings import get_settings
+from infra.process_pool import ProcessWorkerPool, report_progress
+from utils.content_list_chunker import ContentListChunker, find_content_list
+from utils.embedding_pipeline import (
+    EmbeddingPipeline,
+    EmbeddingProgress,
+    ProgressCallback,
+    get_embedding_pipeline,
+)
+from utils.image_publisher import publish_images
+from utils.streaming import (
+    aiter_batches_in_thread,
+    iter_json_array,
+    iter_rewritten_lines,
+    iter_split_text,
+)
 
 logger = logging.getLogger(__name__)
 
+# 阶段进度回调：(阶段名称, 阶段数据)
+StageCallback = Callable[[str, dict], Awaitable[None]]
+
+# 文档块 ID 的 UUIDv5 命名空间（固定值，保证同一 source + 内容始终得到同一 ID）
+CHUNK_ID_NAMESPACE = uuid.UUID("6f1c3c2e-8a5b-5d8e-9f47-2b1f0e6a4c11")
+
+
+def content_hash(text: str) -> str:
+    """返回文档块内容的 SHA-256。"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def stable_chunk_id(collection: str, source: str, digest: str, occurrence: int = 0) -> str:
+    """由 (集合, source, 内容哈希) 生成确定性的文档块 ID。
+
+    langchain_pg_embedding.id 全局唯一（写入时 ON CONFLICT (id)），ID 中包含集合名称，
+    同一 source 入库到不同集合时才不会互相覆盖。同一 source 内内容完全相同的多个块
+    用 occurrence 区分。
+    """
+    name = f"{collection}\x00{source}\x00{digest}\x00{occurrence}"
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, name))
+
 
 # ============================================================================
 # 模式
@@ -43,9 +100,12 @@ class ProcessingResponse(BaseModel):
 
     status: str = Field(description="Processing status: success or error")
     message: str = Field(description="Status message")
-    images_copied: int = Field(default=0, description="Number of images copied")
+    images_copied: int = Field(default=0, description="Number of images newly published (existing ones are skipped)")
     chunks_created: int = Field(default=0, description="Number of document chunks")
     embedded: bool = Field(default=False, description="Whether embedding was performed")
+    chunks_embedded: int = Field(default=0, description="Number of new or changed chunks embedded")
+    chunks_unchanged: int = Field(default=0, description="Number of chunks already stored and reused")
+    chunks_deleted: int = Field(default=0, description="Number of stale chunks deleted")
     collection_name: Optional[str] = Field(default=None, description="Vector store collection name")
     error: Optional[str] = Field(default=None, description="Error message if failed")
 
@@ -58,29 +118,120 @@ class ProcessingResponse(BaseModel):
 class MineruProcessor:
     """处理 MinerU 解析的文档（Markdown + 图片）。"""
 
-    def __init__(self):
-        """使用设置初始化处理器。"""
+    def __init__(self, embedding_pipeline: Optional[EmbeddingPipeline] = None):
+        """使用设置初始化处理器。
+
+        参数：
+            embedding_pipeline: 指定的嵌入流水线，
+                为 None 时使用进程内共享的 get_embedding_pipeline()（同一进程的入库共用并发上限）
+        """
         self.settings = get_settings()
+        self.embedding_pipeline = embedding_pipeline
         self.chunk_size = self.settings.chunk_size
         self.chunk_overlap = self.settings.chunk_overlap
+        self.chunk_strategy = self.settings.chunk_strategy
+        self.chunk_max_tokens = self.settings.chunk_max_tokens
+        self.write_mode = self.settings.vector_write_mode
 
-    def process(
+    async def aprocess(
         self,
         source_path: str,
         embed: bool = False,
         collection_name: Optional[str] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        on_stage: Optional[StageCallback] = None,
     ) -> dict:
         """
         处理 MinerU 输出目录。
 
+        读取、改写图片路径、分块在线程中以生成器逐块进行，文档块按批次交给嵌入与写库，
+        最多只有少量批次驻留内存；第一批文档块产出后即开始嵌入，无需等待整个文件读完。
+
         参数：
             source_path: MinerU 输出目录的路径（包含 auto/ 子目录）
             embed: 是否执行向量嵌入
             collection_name: 向量存储集合名称（如果为 None 使用默认值）
+            on_progress: 嵌入进度回调，每完成一个批次调用一次
+            on_stage: 阶段进度回调（preparing / prepared / embedding / writing / cleanup）；
+                未提供 on_progress 时，嵌入进度也以 embedding 阶段上报
 
         返回：
             包含处理结果的字典
         """
+        if on_stage is not None and on_progress is None:
+            on_progress = lambda progress: on_stage("embedding", progress.as_dict())  # noqa: E731
+
+        await self._report(on_stage, "preparing", {"source_path": source_path})
+        auto_dir, md_file = await asyncio.to_thread(self._locate, source_path)
+        images_copied = await asyncio.to_thread(self._copy_images, auto_dir)
+        source_name = md_file.stem
+        await self._report(
+            on_stage, "prepared", {"source": source_name, "images_copied": images_copied}
+        )
+
+        if collection_name is None:
+            collection_name = self.settings.default_collection
+        id_collection = self._id_collection(collection_name)
+
+        def iter_documents() -> Iterator[Document]:
+            return self._iter_documents(auto_dir, md_file, id_collection)
+
+        # Step 5: Embed if requested（只嵌入新增/变化的文档块）
+        sync_stats = {"chunks_embedded": 0, "chunks_unchanged": 0, "chunks_deleted": 0}
+        if embed:
+            batches = aiter_batches_in_thread(
+                iter_documents,
+                self.settings.embedding_batch_size * self.settings.embedding_concurrency,
+            )
+            sync_stats = await self.areconcile_source(
+                batches, source_name, collection_name, on_progress, on_stage
+            )
+            chunks_created = sync_stats["chunks_embedded"] + sync_stats["chunks_unchanged"]
+            logger.info(f"Documents synced to collection: {collection_name} ({sync_stats})")
+        else:
+            chunks_created = await asyncio.to_thread(lambda: sum(1 for _ in iter_documents()))
+
+        return {
+            "images_copied": images_copied,
+            "chunks_created": chunks_created,
+            "embedded": embed,
+            "collection_name": collection_name if embed else None,
+            **sync_stats,
+        }
+
+    def prepare(
+        self, source_path: str, collection_name: Optional[str] = None
+    ) -> tuple[List[Document], int, str]:
+        """
+        复制图片并分块，一次性返回全部文档块。
+
+        只访问文件系统，不连接数据库、不嵌入，可在子进程中调用（批量入库即如此使用）；
+        返回的文档块已带确定性 ID，可直接交给 areconcile_source 写入。
+
+        参数：
+            source_path: MinerU 输出目录的路径（包含 auto/ 子目录）
+            collection_name: 目标集合名称（参与文档块 ID 生成，默认使用 VECTOR_COLLECTION）
+
+        返回：
+            (文档块列表, 复制的图片数量, source 名称)
+        """
+        auto_dir, md_file = self._locate(source_path)
+        images_copied = self._copy_images(auto_dir)
+        documents = list(
+            self._iter_documents(auto_dir, md_file, self._id_collection(collection_name))
+        )
+        return documents, images_copied, md_file.stem
+
+    def _locate(self, source_path: str) -> tuple[Path, Path]:
+        """
+        校验 MinerU 输出目录并定位 Markdown 文件。
+
+        参数：
+            source_path: MinerU 输出目录的路径（包含 auto/ 子目录）
+
+        返回：
+            (auto 目录, Markdown 文件)
+        """
         source_dir = Path(source_path)
 
         if not source_dir.exists():
@@ -97,99 +248,77 @@ class MineruProcessor:
 
         md_file = md_files[0]
         logger.info(f"Processing markdown file: {md_file.name}")
+        return auto_dir, md_file
 
-        # Step 1: Copy images
-        images_copied = self._copy_images(auto_dir)
-
-        # Step 2: Read and process markdown
-        with open(md_file, "r", encoding="utf-8") as f:
-            md_content = f.read()
-
-        # Step 3: Update image paths
-        updated_content = self._update_image_paths(md_content)
+    def _iter_documents(
+        self, auto_dir: Path, md_file: Path, collection_name: str
+    ) -> Iterator[Document]:
+        """
+        逐块产出文档块：优先按 content_list.json 结构分块，否则逐行读取 Markdown 做字符分块。
 
-        # Step 4: Split content into chunks
-        documents = self._split_content(updated_content, md_file.stem)
+        参数：
+            auto_dir: MinerU auto 目录的路径
+            md_file: Markdown 文件
+            collection_name: 目标集合名称（已解析，参与文档块 ID 生成）
 
-        # Step 5: Embed if requested
-        if embed:
-            if collection_name is None:
-                collection_name = self.settings.default_collection
-            self._embed_documents(documents, collection_name)
-            logger.info(f"Documents embedded to collection: {collection_name}")
+        返回：
+            Document 生成器
+        """
+        source_name = md_file.stem
+        content_list = find_content_list(auto_dir) if self.chunk_strategy == "content_list" else None
+        if content_list is not None:
+            logger.info(f"Chunking by content list: {content_list.name}")
+            chunker = ContentListChunker(
+                self.chunk_max_tokens, image_prefix=self.settings.frontend_image_prefix
+            )
+            chunks = chunker.iter_split(iter_json_array(content_list))
+            yield from self._build_documents(
+                ((chunk.text, chunk.metadata()) for chunk in chunks),
+                source_name,
+                "mineru_markdown",
+                collection_name,
+            )
+            return
 
-        return {
-            "images_copied": images_copied,
-            "chunks_created": len(documents),
-            "embedded": embed,
-            "collection_name": collection_name if embed else None,
-        }
+        rewritten = [0]
+        lines = iter_rewritten_lines(md_file, self.settings.frontend_image_prefix, rewritten)
+        texts = iter_split_text(lines, self._markdown_splitter(), self.chunk_size * 8)
+        yield from self._build_documents(
+            ((text, {}) for text in texts), source_name, "mineru_markdown", collection_name
+        )
+        logger.info(f"Updated {rewritten[0]} image path references")
 
     def _copy_images(self, auto_dir: Path) -> int:
         """
-        从 MinerU 输出复制图片到前端公共目录。
+        从 MinerU 输出发布图片到前端公共目录（已存在的跳过，优先硬链接/reflink）。
 
         参数：
             auto_dir: MinerU auto 目录的路径
 
         返回：
-            复制的图片数量
+            新发布的图片数量
         """
         images_src = auto_dir / "images"
         if not images_src.exists():
             logger.warning(f"Images directory not found: {images_src}")
             return 0
 
-        # 在前端创建目标目录
         # 转换为绝对路径以避免相对路径的问题
         images_target = Path(self.settings.frontend_images_dir).resolve()
-        images_target.mkdir(parents=True, exist_ok=True)
-
-        copied_count = 0
-        for image_file in images_src.glob("*"):
-            if image_file.is_file():
-                target_file = images_target / image_file.name
-                shutil.copy2(image_file, target_file)
-                copied_count += 1
-
-        logger.info(f"Copied {copied_count} images to {images_target}")
-        return copied_count
-
-    def _update_image_paths(self, content: str) -> str:
-        """
-        更新 markdown 中的图片路径，从本地路径更新为前端可访问的路径。
-
-        参数：
-            content: 原始 markdown 内容
-
-        返回：
-            更新后的 markdown 内容
-        """
-        # 匹配模式：![](images/filename.ext)
-        pattern = r"!\[\]\(images/([^)]+)\)"
-
-        def replace_path(match):
-            filename = match.group(1)
-            return f"![]({self.settings.frontend_image_prefix}/{filename})"
-
-        updated = re.sub(pattern, replace_path, content)
-        replaced_count = len(re.findall(pattern, content))
-        logger.info(f"Updated {replaced_count} image path references")
-
-        return updated
-
-    def _split_content(self, content: str, source_name: str) -> List[Document]:
-        """
-        将 markdown 内容分割成块。
+        stats = publish_images(
+            images_src, images_target, max_workers=self.settings.image_publish_workers
+        )
 
-        参数：
-            content: Markdown 内容
-            source_name: 元数据的源文档名称
+        logger.info(
+            f"Published {stats.published} images to {images_target} "
+            f"({stats.hardlink} hardlinked, {stats.reflink} reflinked, {stats.copy} copied, "
+            f"{stats.skipped} already present)"
+        )
+        return stats.published
 
-        返回：
-            Document 对象列表
-        """
-        splitter = RecursiveCharacterTextSplitter(
+    def _markdown_splitter(self) -> RecursiveCharacterTextSplitter:
+        """Markdown 字符分块器。"""
+        return RecursiveCharacterTextSplitter(
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap,
             separators=[
@@ -201,38 +330,217 @@ class MineruProcessor:
                 " ",
                 "",
             ],
-            add_start_index=True,
         )
 
-        texts = splitter.split_text(content)
-        documents = []
-
-        for i, text in enumerate(texts):
-            doc = Document(
+    def _id_collection(self, collection_name: Optional[str]) -> str:
+        """参与文档块 ID 生成的集合名称（与写入时解析的集合一致）。"""
+        return resolve_collection_name(collection_name or self.settings.default_collection)
+
+    @staticmethod
+    def _build_documents(
+        chunks: Iterable[tuple[str, dict]],
+        source_name: str,
+        document_type: str,
+        collection_name: str,
+    ) -> Iterator[Document]:
+        """为文档块生成确定性 ID（按集合区分）与公共元数据（逐块产出）。"""
+        occurrences: dict[str, int] = {}
+
+        for i, (text, extra_metadata) in enumerate(chunks):
+            digest = content_hash(text)
+            occurrence = occurrences.get(digest, 0)
+            occurrences[digest] = occurrence + 1
+            yield Document(
+                id=stable_chunk_id(collection_name, source_name, digest, occurrence),
                 page_content=text,
                 metadata={
                     "source": source_name,
                     "chunk_id": i,
-                    "document_type": "mineru_markdown",
-                    "total_chunks": len(texts),
+                    "document_type": document_type,
+                    "content_hash": digest,
+                    **extra_metadata,
                 },
             )
-            documents.append(doc)
 
-        logger.info(f"Split content into {len(documents)} chunks")
-        return documents
+    @staticmethod
+    async def _report(on_stage: Optional[StageCallback], stage: str, data: dict) -> None:
+        if on_stage is not None:
+            await on_stage(stage, data)
+
+    @staticmethod
+    def _log_progress(progress: EmbeddingProgress) -> None:
+        """默认进度回调：记录嵌入进度日志。"""
+        logger.info(
+            f"[EMBED] {progress.embedded_chunks}/{progress.total_chunks} chunks "
+            f"({progress.completed_batches}/{progress.total_batches} batches, "
+            f"{progress.elapsed_seconds:.1f}s)"
+        )
 
-    def _embed_documents(self, documents: List[Document], collection_name: str) -> None:
+    async def areconcile_source(
+        self,
+        documents: Union[Sequence[Document], AsyncIterator[List[Document]]],
+        source_name: str,
+        collection_name: str,
+        on_progress: Optional[ProgressCallback] = None,
+        on_stage: Optional[StageCallback] = None,
+    ) -> dict:
         """
-        嵌入文档并存储到向量数据库。
+        将某个 source 的文档块与向量库中已存储的版本做差异同步。
+
+        - ID 已存在的块：内容未变，不重新嵌入；仅在 chunk_id 等元数据变化时更新 cmetadata
+        - 新 ID 的块：通过 EmbeddingPipeline 嵌入后写入（逐批嵌入、逐批写入）；
+          VECTOR_WRITE_MODE=copy 时以 COPY 写入，否则走 PGVector.add_embeddings
+        - 该 source 下不再出现的旧块：全部批次写入后删除
+
+        中途失败时已写入的批次保留；由于 ID 确定，重跑会跳过这些批次并完成剩余部分。
+        有变化时使该集合的检索缓存失效（RETRIEVAL_CACHE_ENABLED 开启时）。
 
         参数：
-            documents: 要嵌入的 Document 对象列表
+            documents: 当前版本的文档块（带确定性 ID，如 prepare 的返回值），可以是列表或异步批次流
+            source_name: 文档来源名称（metadata.source）
             collection_name: 向量存储集合名称
+            on_progress: 嵌入进度回调
+            on_stage: 阶段进度回调
+
+        返回：
+            {"chunks_embedded", "chunks_unchanged", "chunks_deleted"}
         """
-        vector_store = get_vector_store(collection_name)
-        vector_store.add_documents(documents)
-        logger.info(f"Embedded {len(documents)} documents to {collection_name}")
+        existing = await afetch_source_chunks(source_name, collection_name)
+        batches = documents if hasattr(documents, "__aiter__") else _single_batch(documents)
+        pipeline = self.embedding_pipeline or get_embedding_pipeline()
+        report_progress = on_progress or self._log_progress
+        # 跨批次累计的嵌入进度：每个批次单独调用流水线，进度需在此累加后再上报；
+        # 流式读取时总数未知，total_chunks 为截至当前已确定需要嵌入的块数
+        running = EmbeddingProgress(total_chunks=0, total_batches=0)
+        vector_store = None
+        current_ids: set[str] = set()
+        embedded = unchanged = updated = 0
+
+        async for batch in batches:
+            current_ids.update(doc.id for doc in batch)
+            new_documents = [doc for doc in batch if doc.id not in existing]
+            metadata_updates = {
+                doc.id: doc.metadata
+                for doc in batch
+                if doc.id in existing and existing[doc.id] != doc.metadata
+            }
+            unchanged += len(batch) - len(new_documents)
+
+            if new_documents:
+                running.total_chunks += len(new_documents)
+                base = (running.embedded_chunks, running.completed_batches, running.retries)
+                base_batches = running.total_batches
+
+                def accumulate(progress: EmbeddingProgress, base=base, base_batches=base_batches):
+                    running.embedded_chunks = base[0] + progress.embedded_chunks
+                    running.completed_batches = base[1] + progress.completed_batches
+                    running.retries = base[2] + progress.retries
+                    running.total_batches = base_batches + progress.total_batches
+                    return report_progress(running)
+
+                vectors = await pipeline.aembed_documents(new_documents, accumulate)
+                if self.write_mode == "copy":
+                    await acopy_embeddings(
+                        [doc.page_content for doc in new_documents],
+                        vectors,
+                        [doc.metadata for doc in new_documents],
+                        [doc.id for doc in new_documents],
+                        collection_name,
+                    )
+                else:
+                    if vector_store is None:
+                        vector_store = await asyncio.to_thread(get_vector_store, collection_name)
+                    await asyncio.to_thread(
+                        vector_store.add_embeddings,
+                        [doc.page_content for doc in new_documents],
+                        vectors,
+                        metadatas=[doc.metadata for doc in new_documents],
+                        ids=[doc.id for doc in new_documents],
+                    )
+                embedded += len(new_documents)
+            updated += await aupdate_chunk_metadata(metadata_updates, collection_name)
+            await self._report(
+                on_stage, "writing", {"chunks_embedded": embedded, "chunks_unchanged": unchanged}
+            )
+
+        stale_ids = [row_id for row_id in existing if row_id not in current_ids]
+        await self._report(on_stage, "cleanup", {"stale": len(stale_ids)})
+        deleted = await adelete_chunks(stale_ids, collection_name)
+
+        logger.info(
+            f"Synced {source_name} to {collection_name}: {embedded} embedded, "
+            f"{unchanged} unchanged, {deleted} deleted"
+        )
+
+        # 集合内容已变化：递增集合代数，使该集合的检索语义缓存失效
+        if self.settings.retrieval_cache_enabled and (embedded or updated or deleted):
+            await get_retrieval_cache().ainvalidate_collection(
+                resolve_collection_name(collection_name)
+            )
+
+        return {
+            "chunks_embedded": embedded,
+            "chunks_unchanged": unchanged,
+            "chunks_deleted": deleted,
+        }
+
+
+async def _single_batch(documents: Sequence[Document]) -> AsyncIterator[List[Document]]:
+    """把文档块列表包装为只有一个批次的异步流。"""
+    if documents:
+        yield list(documents)
+
+
+# ============================================================================
+# 后台入库任务的工作进程
+# ============================================================================
+
+# 工作进程内常驻的事件循环：连接池、异步客户端与信号量绑定在同一个循环上，跨任务复用
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _ingest_in_worker(source_path: str, embed: bool, collection_name: Optional[str]) -> dict:
+    """入库工作进程入口：执行 aprocess，阶段进度以 (阶段, 数据) 经 report_progress 回传父进程。"""
+    global _worker_loop
+    if _worker_loop is None:
+        _worker_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+
+    async def on_stage(stage: str, data: dict) -> None:
+        report_progress((stage, data))
+
+    return _worker_loop.run_until_complete(
+        MineruProcessor().aprocess(source_path, embed, collection_name, on_stage=on_stage)
+    )
+
+
+@lru_cache(maxsize=1)
+def get_ingestion_pool() -> ProcessWorkerPool:
+    """返回后台入库任务的进程池（INGESTION_MAX_CONCURRENT_JOBS 个常驻工作进程）。
+
+    解析、分块、对账等 CPU 密集步骤在工作进程中执行，不与 API 进程中的聊天请求争用事件循环。
+    """
+    return ProcessWorkerPool(
+        _ingest_in_worker,
+        workers=get_settings().ingestion_max_concurrent_jobs,
+        name="ingestion",
+    )
+
+
+async def close_ingestion_pool() -> None:
+    """停止入库进程池（如果已创建）。"""
+    if get_ingestion_pool.cache_info().currsize:
+        await get_ingestion_pool().shutdown()
+        get_ingestion_pool.cache_clear()
 
 
-__all__ = ["MineruProcessor", "ProcessingRequest", "ProcessingResponse"]
+__all__ = [
+    "MineruProcessor",
+    "ProcessingRequest",
+    "ProcessingResponse",
+    "StageCallback",
+    "close_ingestion_pool",
+    "content_hash",
+    "get_ingestion_pool",
+    "stable_chunk_id",
+]
@@ -0,0 +1,211 @@
+"""按页（幻灯片）提取 Markdown：供长 PDF / PPTX 的逐页流式转换使用.
+
+MarkItDown.convert 只能整份文档一次性转换；这里把 PDF 按页、PPTX 按幻灯片拆开，
+每次只处理一页，调用方可以边转换边把结果推送给客户端。
+
+- PDF：pypdf 统计页数（只读页树，不做版面分析），pdfminer 提取单页文本
+  （与 MarkItDown 处理普通文本 PDF 的方式相同）
+- PPTX：python-pptx 读取单张幻灯片，输出格式与 MarkItDown 一致
+  （每张以 ``<!-- Slide number: N -->`` 开头，标题为一级标题，备注在 ``### Notes:`` 下）
+
+逐页任务分散在各工作进程中执行，每个进程按 (路径, 修改时间, 大小) 缓存最近解析过的文档，
+同一文档的后续页直接复用，不再每页重新打开、解析整个文件。
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+import os
+import re
+from collections import OrderedDict
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# 支持逐页转换的文件格式（扩展名，小写）
+PAGED_FORMATS = frozenset({"pdf", "pptx"})
+
+# 每个工作进程最多缓存的已解析文档数
+_DOCUMENT_CACHE_SIZE = 4
+
+_documents: OrderedDict[tuple[str, int, int], Any] = OrderedDict()
+
+
+def _file_format(filename: str) -> str:
+    return filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+
+
+def supports_pages(filename: str) -> bool:
+    """文件是否支持逐页转换."""
+    return _file_format(filename) in PAGED_FORMATS
+
+
+def page_count(file_path: str) -> int:
+    """
+    返回文档的页数（PDF）或幻灯片数（PPTX）.
+
+    参数：
+        file_path: 文件路径（按扩展名判断格式）
+
+    返回：
+        页数
+
+    异常：
+        ValueError: 不支持逐页转换的格式
+    """
+    fmt = _file_format(file_path)
+    if fmt == "pdf":
+        from pypdf import PdfReader
+
+        return len(PdfReader(file_path).pages)
+    if fmt == "pptx":
+        import pptx
+
+        return len(pptx.Presentation(file_path).slides)
+    raise ValueError(f"不支持逐页转换的格式: {fmt}")
+
+
+def _load_document(file_path: str, fmt: str) -> Any:
+    """解析文档：PDF 返回页对象列表，PPTX 返回幻灯片集合."""
+    if fmt == "pdf":
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdfpage import PDFPage
+        from pdfminer.pdfparser import PDFParser
+
+        # 读入内存后立即关闭文件：pdfminer 按需读取对象，缓存期间不占用文件句柄
+        # （Windows 上打开的文件无法被调用方删除）
+        with open(file_path, "rb") as f:
+            data = io.BytesIO(f.read())
+        return list(PDFPage.create_pages(PDFDocument(PDFParser(data))))
+    import pptx
+
+    return pptx.Presentation(file_path).slides
+
+
+def _open_document(file_path: str, fmt: str) -> Any:
+    """返回当前进程缓存的已解析文档（文件被替换或修改后重新解析）."""
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+    document = _documents.get(key)
+    if document is None:
+        document = _load_document(file_path, fmt)
+        _documents[key] = document
+        while len(_documents) > _DOCUMENT_CACHE_SIZE:
+            _documents.popitem(last=False)
+    else:
+        _documents.move_to_end(key)
+    return document
+
+
+def _pdf_page_text(page: Any) -> str:
+    """提取单个 PDF 页的文本（与 pdfminer.high_level.extract_text 的默认参数一致）."""
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+
+    output = io.StringIO()
+    resources = PDFResourceManager(caching=True)
+    device = TextConverter(resources, output, laparams=LAParams())
+    try:
+        PDFPageInterpreter(resources, device).process_page(page)
+    finally:
+        device.close()
+    return output.getvalue()
+
+
+def extract_page(file_path: str, index: int) -> str:
+    """
+    提取单页（从 0 开始）的 Markdown.
+
+    参数：
+        file_path: 文件路径（按扩展名判断格式）
+        index: 页码（从 0 开始）
+
+    返回：
+        该页的 Markdown 文本（空白页返回空字符串）
+    """
+    fmt = _file_format(file_path)
+    if fmt not in PAGED_FORMATS:
+        raise ValueError(f"不支持逐页转换的格式: {fmt}")
+    pages = _open_document(file_path, fmt)
+    if not 0 <= index < len(pages):
+        raise IndexError(f"第 {index + 1} 页不存在（共 {len(pages)} 页）")
+    if fmt == "pdf":
+        return _pdf_page_text(pages[index]).strip()
+    return _slide_markdown(pages[index], index + 1)
+
+
+def _sorted_shapes(shapes: Any) -> list:
+    """按从上到下、从左到右排序（与 MarkItDown 一致）."""
+    return sorted(
+        shapes,
+        key=lambda s: (
+            float("-inf") if s.top is None else s.top,
+            float("-inf") if s.left is None else s.left,
+        ),
+    )
+
+
+def _table_markdown(table: Any) -> str:
+    rows = [
+        [(cell.text or "").replace("\n", " ").replace("|", "\\|").strip() for cell in row.cells]
+        for row in table.rows
+    ]
+    if not rows:
+        return ""
+    lines = ["| " + " | ".join(rows[0]) + " |", "|" + " --- |" * len(rows[0])]
+    lines.extend("| " + " | ".join(row) + " |" for row in rows[1:])
+    return "\n".join(lines) + "\n"
+
+
+def _picture_markdown(shape: Any) -> str:
+    try:
+        alt_text = shape._element._nvXxPr.cNvPr.attrib.get("descr", "")
+    except Exception:
+        alt_text = ""
+    alt_text = re.sub(r"\s+", " ", re.sub(r"[\r\n\[\]]", " ", alt_text or shape.name)).strip()
+    filename = re.sub(r"\W", "", shape.name) + ".jpg"
+    return f"\n![{alt_text}]({filename})\n"
+
+
+def _slide_markdown(slide: Any, number: int) -> str:
+    """把一张幻灯片转换为 Markdown."""
+    from pptx.enum.shapes import MSO_SHAPE_TYPE
+
+    title = slide.shapes.title
+    parts: list[str] = [f"<!-- Slide number: {number} -->\n"]
+
+    def add_shape(shape: Any) -> None:
+        if shape.shape_type == MSO_SHAPE_TYPE.PICTURE:
+            parts.append(_picture_markdown(shape))
+        if getattr(shape, "has_table", False) and shape.has_table:
+            parts.append(_table_markdown(shape.table))
+        if getattr(shape, "has_chart", False) and shape.has_chart:
+            chart = shape.chart
+            chart_title = chart.chart_title.text_frame.text if chart.has_title else ""
+            parts.append(f"\n\n### Chart{': ' + chart_title if chart_title else ''}\n")
+        elif shape.has_text_frame:
+            text = shape.text or ""
+            if shape == title:
+                if text.strip():
+                    parts.append("# " + text.lstrip() + "\n")
+            else:
+                parts.append(text + "\n")
+        if shape.shape_type == MSO_SHAPE_TYPE.GROUP:
+            for subshape in _sorted_shapes(shape.shapes):
+                add_shape(subshape)
+
+    for shape in _sorted_shapes(slide.shapes):
+        add_shape(shape)
+
+    markdown = "".join(parts).strip()
+    if slide.has_notes_slide:
+        notes_frame = slide.notes_slide.notes_text_frame
+        notes_text = (notes_frame.text or "") if notes_frame is not None else ""
+        if notes_text.strip():
+            markdown += "\n\n### Notes:\n" + notes_text
+    return markdown.strip()
+
+
+__all__ = ["PAGED_FORMATS", "extract_page", "page_count", "supports_pages"]
@@ -0,0 +1,197 @@
+"""DashScope Rerank 异步客户端：长连接复用、单次调用时间预算、分数缓存。"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+import httpx
+from langchain_core.documents import Document
+
+from agent.embedding_cache import normalize_query
+from config.settings import get_settings
+from infra.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+DASHSCOPE_RERANK_URL = (
+    "https://dashscope.aliyuncs.com/api/v1/services/rerank/text-rerank/text-rerank"
+)
+
+
+@dataclass
+class RerankStats:
+    """Rerank 调用统计。
+
+    字段说明：
+    - calls: 发起的 API 请求次数
+    - cached_scores: 直接使用缓存分数的文档数
+    - timeouts: 超出时间预算、回退到向量顺序的次数
+    - errors: 请求失败、回退到向量顺序的次数
+    - last_latency_ms: 最近一次 API 请求耗时（毫秒）
+    """
+
+    calls: int = 0
+    cached_scores: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    last_latency_ms: Optional[float] = None
+
+
+def _chunk_key(document: Document) -> str:
+    """文档块的稳定标识：优先使用向量库行 ID，否则使用内容哈希。"""
+    if document.id:
+        return document.id
+    return hashlib.sha256(document.page_content.encode("utf-8")).hexdigest()
+
+
+class AsyncReranker:
+    """长生命周期的异步 Rerank 客户端。
+
+    - 复用同一个 httpx.AsyncClient（连接池 + keep-alive）
+    - 每次调用受 timeout_seconds 预算约束，超时回退为向量检索顺序
+    - 按 (模型, 查询哈希, 文档块 ID) 缓存相关性分数，只为未缓存的文档块请求 API
+      （切换 RERANK_MODEL 后不会复用旧模型的分数）
+    """
+
+    def __init__(
+        self,
+        *,
+        model: str,
+        api_key: Optional[str],
+        top_n: int,
+        timeout_seconds: float = 1.5,
+        url: str = DASHSCOPE_RERANK_URL,
+        cache_size: int = 4096,
+        cache_ttl_seconds: int = 3600,
+        client: Optional[httpx.AsyncClient] = None,
+    ) -> None:
+        """初始化客户端。
+
+        参数：
+        - model: Rerank 模型名称
+        - api_key: DashScope API Key
+        - top_n: 返回的文档数量
+        - timeout_seconds: 单次调用的时间预算（秒）
+        - url: Rerank 接口地址
+        - cache_size: 分数缓存最大条目数
+        - cache_ttl_seconds: 分数缓存过期时间（秒）
+        - client: 自定义 httpx 客户端（测试时注入）
+        """
+        self.model = model
+        self.top_n = top_n
+        self.timeout_seconds = timeout_seconds
+        self.url = url
+        self.stats = RerankStats()
+        self._scores: TTLCache[tuple[str, str, str], float] = TTLCache(
+            cache_size, cache_ttl_seconds
+        )
+        self._client = client or httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {api_key}"},
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            timeout=httpx.Timeout(timeout_seconds + 5),
+        )
+
+    async def _request_scores(self, query: str, texts: list[str]) -> list[float]:
+        """调用 Rerank 接口，按输入顺序返回每个文本的相关性分数。"""
+        payload = {
+            "model": self.model,
+            "input": {"query": query, "documents": texts},
+            "parameters": {"return_documents": False, "top_n": len(texts)},
+        }
+        start = time.perf_counter()
+        self.stats.calls += 1
+        response = await self._client.post(self.url, json=payload)
+        response.raise_for_status()
+        self.stats.last_latency_ms = (time.perf_counter() - start) * 1000
+
+        scores = [0.0] * len(texts)
+        for item in response.json()["output"]["results"]:
+            scores[item["index"]] = float(item["relevance_score"])
+        return scores
+
+    async def arerank(
+        self,
+        query: str,
+        documents: list[Document],
+        top_n: Optional[int] = None,
+    ) -> list[Document]:
+        """重排文档并返回前 top_n 个（metadata 中带 relevance_score）。
+
+        超出时间预算或请求失败时，按原有向量检索顺序返回前 top_n 个（不带分数）。
+        """
+        top_n = top_n or self.top_n
+        if not documents:
+            return []
+
+        query_hash = hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+        keys = [(self.model, query_hash, _chunk_key(doc)) for doc in documents]
+        scores: list[Optional[float]] = [self._scores.get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        self.stats.cached_scores += len(documents) - len(missing)
+
+        if missing:
+            try:
+                fresh = await asyncio.wait_for(
+                    self._request_scores(query, [documents[i].page_content for i in missing]),
+                    timeout=self.timeout_seconds,
+                )
+            except asyncio.TimeoutError:
+                self.stats.timeouts += 1
+                logger.warning(
+                    f"[RERANK] Budget of {self.timeout_seconds * 1000:.0f}ms exceeded, "
+                    f"falling back to vector order"
+                )
+                return documents[:top_n]
+            except Exception as e:
+                self.stats.errors += 1
+                logger.warning(f"[RERANK] Request failed, falling back to vector order: {e}")
+                return documents[:top_n]
+
+            for i, score in zip(missing, fresh):
+                scores[i] = score
+                self._scores.set(keys[i], score)
+
+        ranked = sorted(zip(documents, scores), key=lambda pair: pair[1], reverse=True)
+        return [
+            Document(
+                id=doc.id,
+                page_content=doc.page_content,
+                metadata={**doc.metadata, "relevance_score": score},
+            )
+            for doc, score in ranked[:top_n]
+        ]
+
+    async def aclose(self) -> None:
+        """关闭底层 HTTP 连接池。"""
+        await self._client.aclose()
+
+
+@lru_cache(maxsize=1)
+def get_reranker() -> AsyncReranker:
+    """返回进程内共享的 Rerank 客户端。"""
+    settings = get_settings()
+    return AsyncReranker(
+        model=settings.rerank_model,
+        api_key=settings.dashscope_api_key,
+        top_n=settings.rerank_top_n,
+        timeout_seconds=settings.rerank_timeout_ms / 1000,
+        url=settings.rerank_url or DASHSCOPE_RERANK_URL,
+        cache_size=settings.rerank_cache_size,
+        cache_ttl_seconds=settings.rerank_cache_ttl_seconds,
+    )
+
+
+async def close_reranker() -> None:
+    """关闭共享 Rerank 客户端（如果已创建）。"""
+    if get_reranker.cache_info().currsize:
+        await get_reranker().aclose()
+        get_reranker.cache_clear()
+
+
+__all__ = ["AsyncReranker", "RerankStats", "get_reranker", "close_reranker"]
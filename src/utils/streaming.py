@@ -0,0 +1,172 @@
+"""流式处理工具：逐行读取并切分 Markdown、增量解析 JSON 数组、把同步生成器桥接为有界的异步批次流。"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import threading
+from contextlib import suppress
+from itertools import islice
+from pathlib import Path
+from typing import AsyncIterator, Callable, Iterable, Iterator, TypeVar
+
+from langchain_text_splitters import TextSplitter
+
+T = TypeVar("T")
+
+# 匹配模式：![](images/filename.ext)
+IMAGE_REF_PATTERN = re.compile(r"!\[\]\(images/([^)]+)\)")
+
+_READ_SIZE = 1 << 16
+_DONE = object()
+
+
+def iter_rewritten_lines(path: Path, image_prefix: str, counter: list[int] | None = None) -> Iterator[str]:
+    """
+    逐行读取 Markdown，并把图片引用改写为前端可访问的路径。
+
+    参数：
+        path: Markdown 文件路径
+        image_prefix: 前端图片路径前缀
+        counter: 可选的单元素列表，累加改写的图片引用数
+    """
+    replacement = image_prefix.rstrip("/") + r"/\1"
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line, count = IMAGE_REF_PATTERN.subn(f"![]({replacement})", line)
+            if counter is not None:
+                counter[0] += count
+            yield line
+
+
+def iter_split_text(lines: Iterable[str], splitter: TextSplitter, window: int) -> Iterator[str]:
+    """
+    对逐行输入做滑动窗口切分，只在内存中保留约 window 个字符。
+
+    缓冲区超过 window 时切分，输出除最后一块之外的全部块；最后一块连同其后的内容
+    留在缓冲区与后续文本一起再切分，因此块边界与重叠和整篇切分基本一致。
+    """
+    buffer = ""
+    for line in lines:
+        buffer += line
+        if len(buffer) < window:
+            continue
+        chunks = splitter.split_text(buffer)
+        if len(chunks) < 2:
+            continue
+        yield from chunks[:-1]
+        start = buffer.rfind(chunks[-1])
+        buffer = buffer[start:] if start >= 0 else chunks[-1]
+    if buffer.strip():
+        yield from splitter.split_text(buffer)
+
+
+def iter_json_array(path: Path, read_size: int = _READ_SIZE) -> Iterator[object]:
+    """增量解析顶层为数组的 JSON 文件，逐个产出元素（内存只保留当前读缓冲区）。"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    with open(path, "r", encoding="utf-8") as f:
+        eof = False
+        while True:
+            buffer = buffer.lstrip()
+            if not started:
+                if not buffer and not eof:
+                    chunk = f.read(read_size)
+                    eof = not chunk
+                    buffer += chunk
+                    continue
+                if not buffer.startswith("["):
+                    raise ValueError(f"Expected a JSON array in {path}")
+                buffer = buffer[1:]
+                started = True
+                continue
+            if buffer.startswith(","):
+                buffer = buffer[1:]
+                continue
+            if buffer.startswith("]"):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError(f"Truncated JSON array in {path}")
+                chunk = f.read(read_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield item
+            buffer = buffer[end:]
+
+
+def batched(iterable: Iterable[T], size: int) -> Iterator[list[T]]:
+    """按 size 个元素分批。"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, max(1, size))):
+        yield batch
+
+
+async def aiter_batches_in_thread(
+    factory: Callable[[], Iterable[T]],
+    batch_size: int,
+    *,
+    max_pending: int = 2,
+) -> AsyncIterator[list[T]]:
+    """
+    在线程中运行同步生成器，按批次异步产出。
+
+    最多 max_pending 个批次在队列中等待消费，生成器在队列满时阻塞（背压），
+    因此内存占用与输入规模无关；消费方提前退出时生成器随之停止。
+
+    参数：
+        factory: 返回同步可迭代对象的函数（在线程中调用）
+        batch_size: 每批元素数
+        max_pending: 等待消费的最大批次数
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_pending))
+    stop = threading.Event()
+
+    def put(item: object) -> None:
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def produce() -> None:
+        try:
+            for batch in batched(factory(), batch_size):
+                if stop.is_set():
+                    return
+                put(batch)
+        except BaseException as e:
+            put(e)
+        else:
+            put(_DONE)
+
+    producer = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # 清空队列，使阻塞在 put 上的生产线程得以退出
+        while not producer.done():
+            with suppress(asyncio.QueueEmpty):
+                queue.get_nowait()
+            await asyncio.sleep(0.01)
+        with suppress(BaseException):
+            await producer
+
+
+__all__ = [
+    "IMAGE_REF_PATTERN",
+    "aiter_batches_in_thread",
+    "batched",
+    "iter_json_array",
+    "iter_rewritten_lines",
+    "iter_split_text",
+]
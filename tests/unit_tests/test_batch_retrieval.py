@@ -0,0 +1,64 @@
+"""Unit tests for batched multi-query retrieval."""
+
+from __future__ import annotations
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from langchain_core.documents import Document
+
+from tools.retrieval import aretrieve_batch
+
+
+def _settings(**overrides) -> MagicMock:
+    values = {
+        "retrieval_mode": "vector",
+        "retriever_top_k": 2,
+        "rerank_enabled": False,
+        "retrieval_cache_enabled": False,
+    }
+    values.update(overrides)
+    return MagicMock(**values)
+
+
+class TestBatchRetrieval:
+    """测试同一轮多个 retrieve_context 调用的批量检索。"""
+
+    @pytest.mark.asyncio
+    async def test_one_embedding_request_and_one_query(self):
+        embed = AsyncMock(return_value=[[0.1], [0.2]])
+        search = AsyncMock(
+            return_value=[
+                [(Document(id="a", page_content="甲"), 0.1)],
+                [(Document(id="b", page_content="乙"), 0.2)],
+            ]
+        )
+        with (
+            patch("tools.retrieval.get_settings", return_value=_settings()),
+            patch("tools.retrieval.resolve_collection_name", return_value="c"),
+            patch("tools.retrieval.aembed_queries", embed),
+            patch("tools.retrieval.abatch_similarity_search_by_vector", search),
+        ):
+            results = await aretrieve_batch([{"query": "甲公司"}, {"query": "乙公司"}])
+
+        embed.assert_awaited_once_with(["甲公司", "乙公司"])
+        search.assert_awaited_once()
+        assert [docs[0].id for _, docs in results] == ["a", "b"]
+        assert "甲" in results[0][0]
+
+    @pytest.mark.asyncio
+    async def test_different_filters_are_grouped(self):
+        search = AsyncMock(side_effect=lambda embeddings, **_: [[] for _ in embeddings])
+        with (
+            patch("tools.retrieval.get_settings", return_value=_settings()),
+            patch("tools.retrieval.resolve_collection_name", return_value="c"),
+            patch("tools.retrieval.aembed_queries", AsyncMock(return_value=[[0.1]] * 3)),
+            patch("tools.retrieval.abatch_similarity_search_by_vector", search),
+        ):
+            await aretrieve_batch(
+                [{"query": "a"}, {"query": "b", "source": "x.pdf"}, {"query": "c"}]
+            )
+
+        assert search.await_count == 2
+        filters = [call.kwargs["metadata_filter"] for call in search.await_args_list]
+        assert filters == [None, {"source": "x.pdf"}]
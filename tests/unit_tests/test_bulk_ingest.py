@@ -0,0 +1,102 @@
+"""Unit tests for the bulk MinerU ingestion command."""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from langchain_core.documents import Document
+
+from utils.bulk_ingest import IngestManifest, discover_sources, run_bulk_ingest, source_fingerprint
+
+
+def _make_output(root, name: str) -> None:
+    auto = root / name / "auto"
+    auto.mkdir(parents=True)
+    (auto / f"{name}.md").write_text(f"# {name}", encoding="utf-8")
+
+
+def _prepare(source_path: str, collection_name):
+    name = source_path.rsplit("/", 1)[-1]
+    return [Document(page_content=name), Document(page_content=name + "2")], 1, name
+
+
+class TestDiscovery:
+    """测试输出目录发现与指纹。"""
+
+    def test_discovers_outputs_with_markdown(self, tmp_path):
+        _make_output(tmp_path, "a")
+        _make_output(tmp_path / "nested", "b")
+        (tmp_path / "empty" / "auto").mkdir(parents=True)
+
+        sources = discover_sources(tmp_path)
+
+        assert [s.name for s in sources] == ["a", "b"]
+
+    def test_fingerprint_changes_with_markdown(self, tmp_path):
+        _make_output(tmp_path, "a")
+        before = source_fingerprint(tmp_path / "a")
+        (tmp_path / "a" / "auto" / "a.md").write_text("# a changed", encoding="utf-8")
+
+        assert source_fingerprint(tmp_path / "a") != before
+
+
+class TestRunBulkIngest:
+    """测试并行处理、清单续跑与吞吐统计。"""
+
+    @pytest.mark.asyncio
+    async def test_second_run_skips_unchanged_sources(self, tmp_path):
+        _make_output(tmp_path, "a")
+        _make_output(tmp_path, "b")
+        reconcile = AsyncMock(return_value={"chunks_embedded": 2})
+        settings = MagicMock(default_collection="docs")
+
+        with (
+            patch("utils.bulk_ingest.get_settings", return_value=settings),
+            patch("utils.mineru_processor.get_settings", return_value=settings),
+            patch("utils.bulk_ingest.get_embedding_pipeline", return_value=MagicMock()),
+            patch(
+                "utils.bulk_ingest.ProcessPoolExecutor",
+                lambda max_workers, mp_context: ThreadPoolExecutor(max_workers),
+            ),
+            patch("utils.bulk_ingest._prepare_source", _prepare),
+            patch("utils.bulk_ingest.MineruProcessor.areconcile_source", reconcile),
+        ):
+            first = await run_bulk_ingest(tmp_path, workers=2)
+            second = await run_bulk_ingest(tmp_path, workers=2)
+
+        assert (first.succeeded, first.chunks, first.chunks_embedded) == (2, 4, 4)
+        assert first.chunks_per_second > 0
+        assert (second.succeeded, second.skipped) == (0, 2)
+        assert reconcile.await_count == 2
+        manifest = IngestManifest.load(tmp_path / ".ingest_manifest.json")
+        assert {e["status"] for e in manifest.entries.values()} == {"succeeded"}
+
+    @pytest.mark.asyncio
+    async def test_failures_are_recorded_and_retried(self, tmp_path):
+        _make_output(tmp_path, "a")
+        settings = MagicMock(default_collection="docs")
+
+        def failing(source_path: str, collection_name):
+            raise ValueError("broken output")
+
+        with (
+            patch("utils.bulk_ingest.get_settings", return_value=settings),
+            patch("utils.mineru_processor.get_settings", return_value=settings),
+            patch("utils.bulk_ingest.get_embedding_pipeline", return_value=MagicMock()),
+            patch(
+                "utils.bulk_ingest.ProcessPoolExecutor",
+                lambda max_workers, mp_context: ThreadPoolExecutor(max_workers),
+            ),
+            patch("utils.bulk_ingest._prepare_source", failing),
+        ):
+            first = await run_bulk_ingest(tmp_path, workers=1)
+            second = await run_bulk_ingest(tmp_path, workers=1)
+
+        assert first.failed == 1
+        assert second.failed == 1
+        entry = IngestManifest.load(tmp_path / ".ingest_manifest.json").entries[
+            str((tmp_path / "a").resolve())
+        ]
+        assert entry["error"] == "ValueError: broken output"
@@ -0,0 +1,165 @@
+"""Unit tests for the COPY-based vector writer and deferred index builds."""
+
+from __future__ import annotations
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from langchain_core.documents import Document
+
+from agent.vectorstore import acopy_embeddings
+from db.vector_index import IndexReport, deferred_index_build
+from utils.mineru_processor import MineruProcessor
+
+
+def _fake_copy_pool():
+    copy = MagicMock()
+    copy.write_row = AsyncMock()
+    cur = MagicMock()
+    cur.execute = AsyncMock()
+    cur.rowcount = 2
+    cur.copy.return_value.__aenter__ = AsyncMock(return_value=copy)
+    cur.copy.return_value.__aexit__ = AsyncMock(return_value=False)
+    conn = MagicMock()
+    conn.transaction.return_value.__aenter__ = AsyncMock()
+    conn.transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+    conn.cursor.return_value.__aenter__ = AsyncMock(return_value=cur)
+    conn.cursor.return_value.__aexit__ = AsyncMock(return_value=False)
+    pool = MagicMock()
+    pool.connection.return_value.__aenter__ = AsyncMock(return_value=conn)
+    pool.connection.return_value.__aexit__ = AsyncMock(return_value=False)
+    return pool, conn, cur, copy
+
+
+def _report(method: str, params: dict) -> IndexReport:
+    return IndexReport(
+        index_name=f"ix_{method}",
+        collection_name="c",
+        method=method,
+        params=params,
+        dimensions=256,
+        size_bytes=1024,
+        build_seconds=1.0,
+        row_count=10,
+        built_at=None,
+        valid=True,
+    )
+
+
+class TestCopyWriter:
+    """测试 COPY 写入：暂存表 + 一次 upsert。"""
+
+    @pytest.mark.asyncio
+    async def test_streams_rows_and_merges(self):
+        pool, conn, cur, copy = _fake_copy_pool()
+        with (
+            patch("agent.vectorstore.aget_collection_id", AsyncMock(return_value="cid")),
+            patch("agent.vectorstore.DatabaseManager.get_pool", AsyncMock(return_value=pool)),
+        ):
+            written = await acopy_embeddings(
+                ["a", "b"], [[0.5, 1.0], [0.0, -1.0]], [{"source": "s"}, {}], ["id1", "id2"], "c"
+            )
+
+        assert written == 2
+        conn.transaction.assert_called_once()
+        assert "COPY rag_embedding_stage" in cur.copy.call_args.args[0]
+        rows = [call.args[0] for call in copy.write_row.await_args_list]
+        assert [(r[0], r[1], r[2]) for r in rows] == [("id1", "[0.5,1.0]", "a"), ("id2", "[0.0,-1.0]", "b")]
+        merge_sql, params = cur.execute.await_args_list[-1].args
+        assert "ON CONFLICT (id) DO UPDATE" in merge_sql
+        assert params == ("cid",)
+
+    @pytest.mark.asyncio
+    async def test_empty_batch_skips_database(self):
+        with patch("agent.vectorstore.DatabaseManager.get_pool", AsyncMock()) as get_pool:
+            assert await acopy_embeddings([], [], [], [], "c") == 0
+        get_pool.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_processor_uses_copy_writer(self):
+        settings = MagicMock(vector_write_mode="copy", retrieval_cache_enabled=False)
+        with patch("utils.mineru_processor.get_settings", return_value=settings):
+            processor = MineruProcessor()
+        pipeline = MagicMock()
+        pipeline.aembed_documents = AsyncMock(return_value=[[0.1], [0.2]])
+        documents = [Document(id=f"id{i}", page_content=f"t{i}", metadata={"i": i}) for i in range(2)]
+
+        with (
+            patch("utils.mineru_processor.afetch_source_chunks", AsyncMock(return_value={})),
+            patch("utils.mineru_processor.acopy_embeddings", AsyncMock(return_value=2)) as copy,
+            patch("utils.mineru_processor.get_vector_store") as get_store,
+            patch("utils.mineru_processor.aupdate_chunk_metadata", AsyncMock(return_value=0)),
+            patch("utils.mineru_processor.adelete_chunks", AsyncMock(return_value=0)),
+        ):
+            processor.embedding_pipeline = pipeline
+            stats = await processor.areconcile_source(documents, "s", "c")
+
+        assert stats["chunks_embedded"] == 2
+        texts, vectors, metadatas, ids, collection = copy.await_args.args
+        assert (texts, ids, collection) == (["t0", "t1"], ["id0", "id1"], "c")
+        get_store.assert_not_called()
+
+
+class TestDeferredIndexBuild:
+    """测试导入期间删除索引、导入后重建。"""
+
+    @pytest.mark.asyncio
+    async def test_rebuilds_existing_indexes_with_same_params(self):
+        existing = [_report("hnsw", {"m": 32, "ef_construction": 128, "storage": "halfvec"})]
+        with (
+            patch("db.vector_index.index_report", AsyncMock(return_value=existing)),
+            patch("db.vector_index.drop_collection_index", AsyncMock()) as drop,
+            patch("db.vector_index.create_collection_index", AsyncMock()) as create,
+        ):
+            async with deferred_index_build("c") as deferred:
+                assert deferred == existing
+                drop.assert_awaited_once_with("c", "hnsw")
+                create.assert_not_awaited()
+
+        create.assert_awaited_once()
+        kwargs = create.await_args.kwargs
+        assert create.await_args.args == ("c", "hnsw")
+        assert (kwargs["m"], kwargs["ef_construction"], kwargs["storage"]) == (32, 128, "halfvec")
+
+    @pytest.mark.asyncio
+    async def test_restores_indexes_when_load_fails(self):
+        existing = [_report("ivfflat", {"lists": 10, "storage": "vector"})]
+        with (
+            patch("db.vector_index.index_report", AsyncMock(return_value=existing)),
+            patch("db.vector_index.drop_collection_index", AsyncMock()),
+            patch("db.vector_index.create_collection_index", AsyncMock()) as create,
+        ):
+            with pytest.raises(RuntimeError):
+                async with deferred_index_build("c", "hnsw"):
+                    raise RuntimeError("load failed")
+
+        assert create.await_args.args == ("c", "ivfflat")
+        assert "lists" not in create.await_args.kwargs
+
+    @pytest.mark.asyncio
+    async def test_restore_failure_does_not_mask_load_error(self):
+        existing = [_report("hnsw", {"m": 16, "ef_construction": 64, "storage": "vector"})]
+        with (
+            patch("db.vector_index.index_report", AsyncMock(return_value=existing)),
+            patch("db.vector_index.drop_collection_index", AsyncMock()),
+            patch(
+                "db.vector_index.create_collection_index",
+                AsyncMock(side_effect=ValueError("index build failed")),
+            ),
+        ):
+            with pytest.raises(RuntimeError, match="load failed"):
+                async with deferred_index_build("c"):
+                    raise RuntimeError("load failed")
+
+    @pytest.mark.asyncio
+    async def test_creates_requested_index_after_initial_load(self):
+        with (
+            patch("db.vector_index.index_report", AsyncMock(return_value=[])),
+            patch("db.vector_index.drop_collection_index", AsyncMock()) as drop,
+            patch("db.vector_index.create_collection_index", AsyncMock()) as create,
+        ):
+            async with deferred_index_build("c", "hnsw", m=24):
+                pass
+
+        drop.assert_not_awaited()
+        create.assert_awaited_once_with("c", "hnsw", m=24)
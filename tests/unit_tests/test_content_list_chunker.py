@@ -0,0 +1,102 @@
+"""Unit tests for the MinerU content_list chunker."""
+
+from __future__ import annotations
+
+import json
+from unittest.mock import MagicMock, patch
+
+from utils.content_list_chunker import ContentListChunker, _estimate_tokens
+from utils.mineru_processor import MineruProcessor
+
+
+def _chunker(max_tokens: int = 20) -> ContentListChunker:
+    return ContentListChunker(max_tokens, image_prefix="/images", token_counter=len)
+
+
+class TestContentListChunker:
+    """测试按 token 预算打包、原子块与页码。"""
+
+    def test_packs_text_blocks_up_to_budget(self):
+        blocks = [{"type": "text", "text": "一二三四五", "page_idx": i} for i in range(6)]
+
+        chunks = _chunker(12).split(blocks)
+
+        assert [c.pages for c in chunks] == [[1, 2], [3, 4], [5, 6]]
+        assert all(c.tokens <= 12 for c in chunks)
+
+    def test_discarded_blocks_are_dropped(self):
+        blocks = [
+            {"type": "discarded", "text": "页脚", "page_idx": 0},
+            {"type": "text", "text": "正文", "page_idx": 0},
+        ]
+
+        chunks = _chunker().split(blocks)
+
+        assert [c.text for c in chunks] == ["正文"]
+
+    def test_table_with_caption_is_atomic(self):
+        table = {
+            "type": "table",
+            "table_caption": ["表1 客户"],
+            "table_body": "<table><tr><td>" + "数" * 40 + "</td></tr></table>",
+            "table_footnote": ["数据截至2025年"],
+            "page_idx": 2,
+        }
+        blocks = [{"type": "text", "text": "前文", "page_idx": 2}, table]
+
+        chunks = _chunker(20).split(blocks)
+
+        assert chunks[0].text == "前文"
+        assert chunks[1].text.startswith("表1 客户\n<table>")
+        assert chunks[1].text.endswith("数据截至2025年")
+        assert chunks[1].block_types == ["table"]
+
+    def test_title_stays_with_following_content(self):
+        blocks = [
+            {"type": "text", "text": "上一节" * 4, "page_idx": 0},
+            {"type": "text", "text": "市场", "text_level": 1, "page_idx": 1},
+            {"type": "image", "img_path": "images/a.jpg", "image_caption": ["图1"], "page_idx": 1},
+        ]
+
+        chunks = _chunker(20).split(blocks)
+
+        assert len(chunks) == 2
+        assert chunks[1].text == "# 市场\n\n![](/images/a.jpg)\n图1"
+        assert chunks[1].section == "市场"
+        assert chunks[1].metadata()["page_start"] == 2
+
+    def test_oversized_text_is_split(self):
+        blocks = [{"type": "text", "text": "。".join(["句子内容"] * 10), "page_idx": 0}]
+
+        chunks = _chunker(12).split(blocks)
+
+        assert len(chunks) > 1
+        assert all(c.tokens <= 12 for c in chunks)
+
+    def test_estimate_counts_cjk_characters(self):
+        assert _estimate_tokens("中文abc def") == 4
+
+
+class TestProcessorChunkStrategy:
+    """测试处理器优先使用 content_list 分块。"""
+
+    def test_prepare_uses_content_list(self, tmp_path):
+        auto = tmp_path / "auto"
+        auto.mkdir()
+        (auto / "deck.md").write_text("# 忽略的 Markdown", encoding="utf-8")
+        (auto / "deck_content_list.json").write_text(
+            json.dumps([{"type": "text", "text": "正文", "page_idx": 0}]), encoding="utf-8"
+        )
+        settings = MagicMock(
+            chunk_strategy="content_list", chunk_max_tokens=64, frontend_image_prefix="/images"
+        )
+        with patch("utils.mineru_processor.get_settings", return_value=settings):
+            processor = MineruProcessor()
+
+        documents, images_copied, source = processor.prepare(str(tmp_path))
+
+        assert source == "deck"
+        assert images_copied == 0
+        assert [d.page_content for d in documents] == ["正文"]
+        assert documents[0].metadata["pages"] == [1]
+        assert documents[0].metadata["source"] == "deck"
@@ -0,0 +1,120 @@
+"""Unit tests for the content-addressed conversion cache and upload spooling."""
+
+from __future__ import annotations
+
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from utils.conversion_cache import ConversionCache, content_digest
+from utils.markitdown_converter import UploadTooLargeError, convert_spooled_upload, spool_upload
+
+
+class TestConversionCache:
+    """测试磁盘 LRU 与 Redis 二级缓存。"""
+
+    @pytest.mark.asyncio
+    async def test_roundtrip_and_version_isolation(self, tmp_path):
+        cache = ConversionCache(tmp_path, "v1")
+        digest = content_digest(b"pdf bytes")
+
+        assert await cache.aget(digest, "a.pdf") is None
+        await cache.aset(digest, "a.pdf", "# 内容")
+
+        assert await cache.aget(digest, "renamed.PDF") == "# 内容"
+        assert await cache.aget(digest, "a.docx") is None
+        assert await ConversionCache(tmp_path, "v2").aget(digest, "a.pdf") is None
+        assert cache.stats.as_dict()["disk_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_evicts_least_recently_used(self, tmp_path):
+        cache = ConversionCache(tmp_path, "v1", max_bytes=250)
+        for i, name in enumerate(("a", "b")):
+            await cache.aset(name, "x.pdf", name * 100)
+            os.utime(cache._path(cache.cache_key(name, "x.pdf")), (1000 + i, 1000 + i))
+
+        # 读取 a 刷新其使用时间，写入 c 超出容量后淘汰最久未用的 b
+        assert await cache.aget("a", "x.pdf") is not None
+        await cache.aset("c", "x.pdf", "c" * 100)
+
+        assert await cache.aget("a", "x.pdf") is not None
+        assert await cache.aget("b", "x.pdf") is None
+        assert cache.stats.evictions == 1
+
+    @pytest.mark.asyncio
+    async def test_redis_hit_backfills_disk(self, tmp_path):
+        redis = MagicMock()
+        redis.get = AsyncMock(return_value="# 共享")
+        redis.set = AsyncMock()
+        cache = ConversionCache(tmp_path, "v1", redis_client=redis, ttl_seconds=60)
+
+        assert await cache.aget("d", "a.pdf") == "# 共享"
+        redis.get.reset_mock()
+        assert await cache.aget("d", "a.pdf") == "# 共享"
+        redis.get.assert_not_awaited()
+
+        await cache.aset("e", "a.pdf", "# 新")
+        assert redis.set.await_args.kwargs["ex"] == 60
+
+    @pytest.mark.asyncio
+    async def test_redis_hit_survives_disk_backfill_failure(self, tmp_path):
+        redis = MagicMock()
+        redis.get = AsyncMock(return_value="# 共享")
+        cache = ConversionCache(tmp_path, "v1", redis_client=redis)
+
+        with patch.object(cache, "_write", side_effect=OSError("disk full")):
+            assert await cache.aget("d", "a.pdf") == "# 共享"
+        assert cache.stats.redis_hits == 1
+
+    @pytest.mark.asyncio
+    async def test_redis_errors_fall_back_to_miss(self, tmp_path):
+        redis = MagicMock()
+        redis.get = AsyncMock(side_effect=ConnectionError("down"))
+        cache = ConversionCache(tmp_path, "v1", redis_client=redis)
+
+        assert await cache.aget("d", "a.pdf") is None
+        assert (cache.stats.redis_errors, cache.stats.misses) == (1, 1)
+
+
+class _Upload:
+    def __init__(self, filename: str, content: bytes) -> None:
+        self.filename = filename
+        self._chunks = [content[i : i + 3] for i in range(0, len(content), 3)]
+
+    async def read(self, size: int) -> bytes:
+        return self._chunks.pop(0) if self._chunks else b""
+
+
+class TestSpooledConversion:
+    """测试上传文件分块落盘与按内容命中缓存。"""
+
+    @pytest.mark.asyncio
+    async def test_spool_hashes_and_sanitizes_filename(self, tmp_path):
+        upload = await spool_upload(_Upload("../../etc/bp.pdf", b"hello world"), str(tmp_path), chunk_size=3)
+
+        assert upload.path == str(tmp_path / "bp.pdf")
+        assert (upload.size_bytes, upload.digest) == (11, content_digest(b"hello world"))
+        assert (tmp_path / "bp.pdf").read_bytes() == b"hello world"
+
+    @pytest.mark.asyncio
+    async def test_spool_enforces_size_limit(self, tmp_path):
+        with pytest.raises(UploadTooLargeError):
+            await spool_upload(_Upload("a.pdf", b"0123456789"), str(tmp_path), max_bytes=5)
+
+    @pytest.mark.asyncio
+    async def test_second_upload_hits_cache(self, tmp_path):
+        cache = ConversionCache(tmp_path / "cache", "v1")
+        convert = AsyncMock(return_value=("# BP", 1200.0))
+        first_upload = await spool_upload(_Upload("bp.pdf", b"same"), str(tmp_path / "1"))
+        second_upload = await spool_upload(_Upload("bp_copy.pdf", b"same"), str(tmp_path / "2"))
+        with (
+            patch("utils.markitdown_converter.get_conversion_cache", return_value=cache),
+            patch("utils.markitdown_converter.convert_file_to_markdown", convert),
+        ):
+            first = await convert_spooled_upload(first_upload)
+            second = await convert_spooled_upload(second_upload)
+
+        assert (first[0], first[2]) == ("# BP", False)
+        assert (second[0], second[2]) == ("# BP", True)
+        convert.assert_awaited_once_with(first_upload.path, "bp.pdf", 60)
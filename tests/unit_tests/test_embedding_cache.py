@@ -0,0 +1,145 @@
+"""Unit tests for the query embedding cache."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+
+from agent.embedding_cache import EmbeddingCache, normalize_query
+from infra.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestTTLCache:
+    """测试进程内 LRU+TTL 缓存。"""
+
+    def test_hit_and_miss_counters(self):
+        cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl_seconds=10)
+        assert cache.get("a") is None
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        assert cache.stats.hits == 1
+        assert cache.stats.misses == 1
+
+    def test_ttl_expiry(self):
+        clock = FakeClock()
+        cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl_seconds=10, clock=clock)
+        cache.set("a", 1)
+        clock.now = 11
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_lru_eviction(self):
+        cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl_seconds=10)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.stats.evictions == 1
+
+
+class TestEmbeddingCache:
+    """测试两级查询向量缓存。"""
+
+    def test_normalize_query(self):
+        assert normalize_query("  象量科技　 融资  ") == "象量科技 融资"
+        assert normalize_query("ＡＢＣ") == "ABC"
+
+    @pytest.mark.asyncio
+    async def test_local_hit_after_first_call(self):
+        embeddings = AsyncMock()
+        embeddings.aembed_query.return_value = [0.1, 0.2]
+        cache = EmbeddingCache(embeddings, model_key="m")
+
+        assert await cache.aembed_query("融资情况") == [0.1, 0.2]
+        assert await cache.aembed_query(" 融资情况 ") == [0.1, 0.2]
+
+        embeddings.aembed_query.assert_awaited_once()
+        assert cache.stats.misses == 1
+        assert cache.stats.local_hits == 1
+
+    def test_model_key_isolation(self):
+        embeddings = AsyncMock()
+        a = EmbeddingCache(embeddings, model_key="model-a")
+        b = EmbeddingCache(embeddings, model_key="model-b")
+        assert a.cache_key("q") != b.cache_key("q")
+
+    @pytest.mark.asyncio
+    async def test_redis_tier_hit(self):
+        embeddings = AsyncMock()
+        redis = AsyncMock()
+        redis.get.return_value = json.dumps([0.3, 0.4])
+        cache = EmbeddingCache(embeddings, model_key="m", redis_client=redis)
+
+        assert await cache.aembed_query("q") == [0.3, 0.4]
+        embeddings.aembed_query.assert_not_awaited()
+        assert cache.stats.redis_hits == 1
+
+    @pytest.mark.asyncio
+    async def test_redis_miss_writes_back_with_ttl(self):
+        embeddings = AsyncMock()
+        embeddings.aembed_query.return_value = [0.5]
+        redis = AsyncMock()
+        redis.get.return_value = None
+        cache = EmbeddingCache(embeddings, model_key="m", ttl_seconds=60, redis_client=redis)
+
+        await cache.aembed_query("q")
+        redis.set.assert_awaited_once()
+        assert redis.set.call_args[1]["ex"] == 60
+
+    @pytest.mark.asyncio
+    async def test_redis_errors_degrade_to_embedding_call(self):
+        embeddings = AsyncMock()
+        embeddings.aembed_query.return_value = [0.5]
+        redis = AsyncMock()
+        redis.get.side_effect = ConnectionError("down")
+        redis.set.side_effect = ConnectionError("down")
+        cache = EmbeddingCache(embeddings, model_key="m", redis_client=redis)
+
+        assert await cache.aembed_query("q") == [0.5]
+        assert cache.stats.redis_errors == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_queries_are_coalesced(self):
+        release = asyncio.Event()
+
+        async def slow_embed(text):
+            await release.wait()
+            return [1.0]
+
+        embeddings = AsyncMock()
+        embeddings.aembed_query.side_effect = slow_embed
+        cache = EmbeddingCache(embeddings, model_key="m")
+
+        tasks = [asyncio.create_task(cache.aembed_query("q")) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        assert await asyncio.gather(*tasks) == [[1.0]] * 3
+        embeddings.aembed_query.assert_awaited_once()
+        assert cache.stats.coalesced == 2
+
+    @pytest.mark.asyncio
+    async def test_batch_embeds_only_misses_in_one_request(self):
+        embeddings = AsyncMock()
+        embeddings.aembed_query.return_value = [1.0]
+        embeddings.aembed_documents.return_value = [[2.0], [3.0]]
+        cache = EmbeddingCache(embeddings, model_key="m")
+        await cache.aembed_query("a")
+
+        vectors = await cache.aembed_queries(["a", "b", " b ", "c"])
+
+        assert vectors == [[1.0], [2.0], [2.0], [3.0]]
+        embeddings.aembed_documents.assert_awaited_once_with(["b", "c"])
+        assert cache.stats.misses == 3
@@ -0,0 +1,103 @@
+"""Unit tests for the ingestion embedding pipeline."""
+
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from utils.embedding_pipeline import EmbeddingBatchError, EmbeddingPipeline, get_embedding_pipeline
+
+
+class TestEmbeddingPipeline:
+    """测试分批、并发、重试与进度回调。"""
+
+    @pytest.mark.asyncio
+    async def test_batches_preserve_order(self):
+        embeddings = AsyncMock()
+        embeddings.aembed_documents.side_effect = lambda texts: [[float(t)] for t in texts]
+        pipeline = EmbeddingPipeline(embeddings, batch_size=3, concurrency=2)
+
+        vectors = await pipeline.aembed_texts([str(i) for i in range(7)])
+
+        assert vectors == [[float(i)] for i in range(7)]
+        assert embeddings.aembed_documents.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self):
+        active = 0
+        peak = 0
+
+        async def embed(texts):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return [[0.0] for _ in texts]
+
+        embeddings = AsyncMock()
+        embeddings.aembed_documents.side_effect = embed
+        pipeline = EmbeddingPipeline(embeddings, batch_size=1, concurrency=2)
+
+        await pipeline.aembed_texts(["a"] * 6)
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_transient_failure_is_retried(self):
+        embeddings = AsyncMock()
+        embeddings.aembed_documents.side_effect = [RuntimeError("502"), [[1.0]]]
+        pipeline = EmbeddingPipeline(embeddings, batch_size=1, backoff_seconds=0)
+        progress = []
+
+        vectors = await pipeline.aembed_texts(["a"], on_progress=lambda p: progress.append(p.as_dict()))
+
+        assert vectors == [[1.0]]
+        assert progress[-1]["retries"] == 1
+        assert progress[-1]["embedded_chunks"] == 1
+
+    @pytest.mark.asyncio
+    async def test_exhausted_retries_raise(self):
+        embeddings = AsyncMock()
+        embeddings.aembed_documents.side_effect = RuntimeError("503")
+        pipeline = EmbeddingPipeline(embeddings, batch_size=1, max_retries=2, backoff_seconds=0)
+
+        with pytest.raises(EmbeddingBatchError):
+            await pipeline.aembed_texts(["a", "b"])
+        assert embeddings.aembed_documents.await_count >= 3
+
+
+class TestSharedPipeline:
+    """测试进程内共享的流水线。"""
+
+    def test_pipeline_is_shared_and_client_retries_are_disabled(self):
+        embeddings = MagicMock()
+        settings = MagicMock(
+            embedding_batch_size=10,
+            embedding_concurrency=4,
+            embedding_max_retries=3,
+            embedding_retry_backoff_seconds=1.0,
+        )
+        get_embedding_pipeline.cache_clear()
+        try:
+            with (
+                patch("agent.vectorstore.get_embeddings", return_value=embeddings),
+                patch("utils.embedding_pipeline.get_settings", return_value=settings),
+            ):
+                pipeline = get_embedding_pipeline()
+                assert get_embedding_pipeline() is pipeline
+        finally:
+            get_embedding_pipeline.cache_clear()
+
+        embeddings.model_copy.assert_called_once_with(update={"max_retries": 1})
+        assert pipeline.embeddings is embeddings.model_copy.return_value
+        assert pipeline.concurrency == 4
+
+    def test_usable_from_successive_event_loops(self):
+        embeddings = AsyncMock()
+        embeddings.aembed_documents.side_effect = lambda texts: [[1.0] for _ in texts]
+        pipeline = EmbeddingPipeline(embeddings, batch_size=1, concurrency=1)
+
+        for _ in range(2):
+            assert asyncio.run(pipeline.aembed_texts(["a", "b", "c"])) == [[1.0]] * 3
@@ -0,0 +1,49 @@
+"""Unit tests for hybrid (bigram full-text + vector) search helpers."""
+
+from __future__ import annotations
+
+from agent.vectorstore import MAX_QUERY_BIGRAMS, _bigram_tsquery, query_bigrams
+from db.hybrid_search import HYBRID_SEARCH_SCHEMA_SQL
+
+
+class TestQueryBigrams:
+    """测试查询文本的二元组切分（需与 rag_bigram_tsvector 保持一致）。"""
+
+    def test_chinese_bigrams(self):
+        assert query_bigrams("象量科技") == ["象量", "量科", "科技"]
+
+    def test_strips_whitespace_and_punctuation(self):
+        assert query_bigrams("象量 科技！") == ["象量", "量科", "科技"]
+
+    def test_lowercases_project_codes(self):
+        assert query_bigrams("BP-2025") == ["bp", "p2", "20", "02", "25"]
+
+    def test_matches_sql_normalization(self):
+        # 只去除 BIGRAM_SEPARATORS 中显式列出的字符；组合附加符号不在其中，SQL 侧同样保留
+        assert query_bigrams("C++ 编程") == ["c编", "编程"]
+        assert query_bigrams("e\u0301t") == ["e\u0301", "\u0301t"]
+
+    def test_deduplicates_and_caps(self):
+        assert query_bigrams("哈哈哈") == ["哈哈"]
+        long_query = "".join(chr(0x4E00 + i) for i in range(200))
+        assert len(query_bigrams(long_query)) == MAX_QUERY_BIGRAMS
+
+    def test_strips_full_width_and_cjk_punctuation(self):
+        assert query_bigrams("象量（科技）：“融资”，《BP》！") == [
+            "象量", "量科", "科技", "技融", "融资", "资b", "bp",
+        ]
+        assert query_bigrams("ａ＋ｂ　测试…——【注】") == ["ａｂ", "ｂ测", "测试", "试注"]
+
+    def test_separators_are_escaped_into_sql(self):
+        sql = HYBRID_SEARCH_SCHEMA_SQL[0]
+        assert "[:punct:]" not in sql
+        assert all(f"\\u{ord(ch):04x}" in sql for ch in "，。！？（）【】《》“”")
+
+    def test_short_query_has_no_bigrams(self):
+        assert query_bigrams("象") == []
+        assert _bigram_tsquery([], "|") is None
+
+    def test_tsquery_operators(self):
+        bigrams = query_bigrams("象量科")
+        assert _bigram_tsquery(bigrams, "|") == "'象量' | '量科'"
+        assert _bigram_tsquery(bigrams, "&") == "'象量' & '量科'"
@@ -0,0 +1,69 @@
+"""Unit tests for content-addressed image publishing."""
+
+from __future__ import annotations
+
+import os
+from unittest.mock import patch
+
+from utils.image_publisher import publish_file, publish_images
+
+
+def _images(tmp_path, count: int = 3):
+    source = tmp_path / "images"
+    source.mkdir()
+    for i in range(count):
+        (source / f"{i:064x}.jpg").write_bytes(b"img" * (i + 1))
+    return source
+
+
+class TestPublishImages:
+    """测试跳过已存在图片、硬链接与复制回退。"""
+
+    def test_hardlinks_on_same_filesystem(self, tmp_path):
+        source = _images(tmp_path)
+        target = tmp_path / "public"
+
+        stats = publish_images(source, target)
+
+        assert (stats.hardlink + stats.reflink + stats.copy, stats.skipped) == (3, 0)
+        if stats.hardlink:
+            name = next(source.iterdir()).name
+            assert os.path.samefile(source / name, target / name)
+
+    def test_second_run_skips_existing(self, tmp_path):
+        source = _images(tmp_path)
+        target = tmp_path / "public"
+        publish_images(source, target)
+
+        stats = publish_images(source, target)
+
+        assert (stats.published, stats.skipped) == (0, 3)
+
+    def test_falls_back_to_copy_when_link_fails(self, tmp_path):
+        source = _images(tmp_path, 1)
+        target = tmp_path / "public"
+        target.mkdir()
+        image = next(source.iterdir())
+
+        with (
+            patch("utils.image_publisher.os.link", side_effect=OSError("EXDEV")),
+            patch("utils.image_publisher._reflink", return_value=False),
+        ):
+            method = publish_file(image, target / image.name)
+
+        assert method == "copy"
+        assert (target / image.name).read_bytes() == image.read_bytes()
+        assert not os.path.samefile(image, target / image.name)
+        assert [p.name for p in target.iterdir()] == [image.name]
+
+    def test_size_mismatch_is_replaced(self, tmp_path):
+        source = _images(tmp_path, 1)
+        target = tmp_path / "public"
+        target.mkdir()
+        image = next(source.iterdir())
+        (target / image.name).write_bytes(b"truncated")
+
+        method = publish_file(image, target / image.name, same_device=False)
+
+        assert method == "copy"
+        assert (target / image.name).read_bytes() == image.read_bytes()
@@ -0,0 +1,182 @@
+"""Unit tests for content-hash incremental re-ingestion."""
+
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from utils.embedding_pipeline import EmbeddingPipeline
+from utils.mineru_processor import MineruProcessor, stable_chunk_id
+
+
+def _processor() -> MineruProcessor:
+    settings = MagicMock(chunk_size=6, chunk_overlap=0, retrieval_cache_enabled=False)
+    with patch("utils.mineru_processor.get_settings", return_value=settings):
+        return MineruProcessor()
+
+
+def _documents(texts: list[str], collection: str = "c") -> list:
+    chunks = ((text, {}) for text in texts)
+    return list(MineruProcessor._build_documents(chunks, "deck", "mineru_markdown", collection))
+
+
+async def _batches(*batches: list):
+    for batch in batches:
+        yield batch
+
+
+class TestChunkIds:
+    """测试确定性文档块 ID。"""
+
+    def test_ids_are_deterministic(self):
+        first = _documents(["第一段内容", "第二段内容"])
+        second = _documents(["第一段内容", "第二段内容"])
+        assert [d.id for d in first] == [d.id for d in second]
+
+    def test_ids_depend_on_collection_source_and_content(self):
+        assert stable_chunk_id("c", "a", "h") != stable_chunk_id("c", "b", "h")
+        assert stable_chunk_id("c", "a", "h") != stable_chunk_id("c", "a", "h2")
+        assert stable_chunk_id("c1", "a", "h") != stable_chunk_id("c2", "a", "h")
+
+    def test_duplicate_content_gets_distinct_ids(self):
+        docs = _documents(["重复段落", "重复段落"])
+        assert len({d.id for d in docs}) == len(docs)
+
+
+class TestReconcile:
+    """测试按 source 的差异同步。"""
+
+    @pytest.mark.asyncio
+    async def test_only_new_chunks_are_embedded_and_stale_deleted(self):
+        processor = _processor()
+        docs = _documents(["保留的段落", "新增的段落"])
+        kept, added = docs
+        existing = {kept.id: dict(kept.metadata), "stale-id": {"source": "deck"}}
+
+        pipeline = MagicMock()
+        pipeline.aembed_documents = AsyncMock(return_value=[[0.1]])
+        store = MagicMock()
+        delete = AsyncMock(return_value=1)
+        update = AsyncMock(return_value=0)
+
+        with (
+            patch("utils.mineru_processor.afetch_source_chunks", AsyncMock(return_value=existing)),
+            patch("utils.mineru_processor.get_embedding_pipeline", return_value=pipeline),
+            patch("utils.mineru_processor.get_vector_store", return_value=store),
+            patch("utils.mineru_processor.aupdate_chunk_metadata", update),
+            patch("utils.mineru_processor.adelete_chunks", delete),
+        ):
+            stats = await processor.areconcile_source(docs, "deck", "c")
+
+        assert stats == {"chunks_embedded": 1, "chunks_unchanged": 1, "chunks_deleted": 1}
+        assert pipeline.aembed_documents.await_args.args[0] == [added]
+        assert store.add_embeddings.call_args.kwargs["ids"] == [added.id]
+        update.assert_awaited_once_with({}, "c")
+        delete.assert_awaited_once_with(["stale-id"], "c")
+
+    @pytest.mark.asyncio
+    async def test_unchanged_source_costs_nothing(self):
+        processor = _processor()
+        docs = _documents(["保留的段落"])
+        existing = {d.id: dict(d.metadata) for d in docs}
+        pipeline = MagicMock()
+
+        with (
+            patch("utils.mineru_processor.afetch_source_chunks", AsyncMock(return_value=existing)),
+            patch("utils.mineru_processor.get_embedding_pipeline", return_value=pipeline),
+            patch("utils.mineru_processor.aupdate_chunk_metadata", AsyncMock(return_value=0)),
+            patch("utils.mineru_processor.adelete_chunks", AsyncMock(return_value=0)),
+        ):
+            stats = await processor.areconcile_source(docs, "deck", "c")
+
+        assert stats["chunks_embedded"] == 0
+        pipeline.aembed_documents.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_same_source_in_two_collections_does_not_collide(self):
+        processor = _processor()
+        # langchain_pg_embedding 的 id 全局唯一：id → (集合, 元数据)
+        table: dict[str, tuple[str, dict]] = {}
+
+        def store_for(collection: str) -> MagicMock:
+            def add_embeddings(texts, vectors, metadatas, ids):
+                for row_id, metadata in zip(ids, metadatas):
+                    table[row_id] = (collection, metadata)
+
+            return MagicMock(add_embeddings=MagicMock(side_effect=add_embeddings))
+
+        async def fetch(source: str, collection: str) -> dict:
+            return {i: m for i, (c, m) in table.items() if c == collection and m["source"] == source}
+
+        pipeline = MagicMock()
+        pipeline.aembed_documents = AsyncMock(side_effect=lambda docs, *_: [[0.1]] * len(docs))
+        with (
+            patch("utils.mineru_processor.afetch_source_chunks", fetch),
+            patch("utils.mineru_processor.get_embedding_pipeline", return_value=pipeline),
+            patch("utils.mineru_processor.get_vector_store", side_effect=store_for),
+            patch("utils.mineru_processor.aupdate_chunk_metadata", AsyncMock(return_value=0)),
+            patch("utils.mineru_processor.adelete_chunks", AsyncMock(return_value=0)),
+        ):
+            for collection in ("c1", "c2", "c1"):
+                docs = _documents(["保留的段落", "新增的段落"], collection)
+                stats = await processor.areconcile_source(docs, "deck", collection)
+
+        assert len(table) == 4
+        assert sorted(c for c, _ in table.values()) == ["c1", "c1", "c2", "c2"]
+        assert stats == {"chunks_embedded": 0, "chunks_unchanged": 2, "chunks_deleted": 0}
+
+    @pytest.mark.asyncio
+    async def test_embedding_progress_accumulates_across_batches(self):
+        processor = _processor()
+        pipeline = EmbeddingPipeline(MagicMock(), batch_size=1)
+        pipeline.embeddings.aembed_documents = AsyncMock(side_effect=lambda texts: [[0.1]] * len(texts))
+        reported: list[tuple[int, int, int]] = []
+
+        def on_progress(progress):
+            reported.append((progress.embedded_chunks, progress.total_chunks, progress.completed_batches))
+
+        docs = _documents(["第一段", "第二段", "第三段"])
+        with (
+            patch("utils.mineru_processor.afetch_source_chunks", AsyncMock(return_value={})),
+            patch("utils.mineru_processor.get_vector_store", return_value=MagicMock()),
+            patch("utils.mineru_processor.aupdate_chunk_metadata", AsyncMock(return_value=0)),
+            patch("utils.mineru_processor.adelete_chunks", AsyncMock(return_value=0)),
+        ):
+            processor.embedding_pipeline = pipeline
+            await processor.areconcile_source(
+                _batches(docs[:2], docs[2:]), "deck", "c", on_progress=on_progress
+            )
+
+        assert reported == [(1, 2, 1), (2, 2, 2), (3, 3, 3)]
+
+
+class TestIngestionWorker:
+    """测试入库工作进程入口。"""
+
+    def test_jobs_share_one_worker_loop_and_forward_stages(self):
+        from utils import mineru_processor
+
+        loops, reported = [], []
+
+        async def aprocess(self, source_path, embed, collection_name, on_stage=None):
+            loops.append(asyncio.get_running_loop())
+            await on_stage("prepared", {"chunks": 1})
+            return {"source_path": source_path, "embedded": embed}
+
+        with (
+            patch.object(MineruProcessor, "__init__", return_value=None),
+            patch.object(MineruProcessor, "aprocess", aprocess),
+            patch.object(mineru_processor, "report_progress", reported.append),
+            patch.object(mineru_processor, "_worker_loop", None),
+        ):
+            first = mineru_processor._ingest_in_worker("a", True, None)
+            second = mineru_processor._ingest_in_worker("b", False, "c")
+
+        assert first == {"source_path": "a", "embedded": True}
+        assert second == {"source_path": "b", "embedded": False}
+        assert loops[0] is loops[1]
+        assert not loops[0].is_closed()
+        loops[0].close()
+        assert reported == [("prepared", {"chunks": 1})] * 2
@@ -0,0 +1,125 @@
+"""Unit tests for the background ingestion job manager."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+
+from infra.jobs import JobManager
+
+
+async def _wait(manager: JobManager, job_id: str) -> None:
+    for _ in range(100):
+        record = await manager.get(job_id)
+        if record.status not in ("queued", "running"):
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+class TestJobManager:
+    """测试任务提交、状态流转、并发上限与 Redis 镜像。"""
+
+    @pytest.mark.asyncio
+    async def test_submit_returns_immediately_and_succeeds(self):
+        release = asyncio.Event()
+
+        async def func(reporter):
+            await reporter.stage("embedding", {"completed_batches": 1})
+            await release.wait()
+            return {"chunks_created": 3}
+
+        manager = JobManager()
+        record = await manager.submit("mineru_ingestion", func, {"source_path": "x"})
+        assert record.status == "queued"
+
+        await asyncio.sleep(0.01)
+        running = await manager.get(record.job_id)
+        assert running.status == "running"
+        assert running.stage == "embedding"
+        assert running.progress == {"completed_batches": 1}
+
+        release.set()
+        await _wait(manager, record.job_id)
+        done = await manager.get(record.job_id)
+        assert done.status == "succeeded"
+        assert done.result == {"chunks_created": 3}
+
+    @pytest.mark.asyncio
+    async def test_failure_is_recorded(self):
+        async def func(reporter):
+            raise ValueError("bad path")
+
+        manager = JobManager()
+        record = await manager.submit("mineru_ingestion", func)
+        await _wait(manager, record.job_id)
+
+        failed = await manager.get(record.job_id)
+        assert failed.status == "failed"
+        assert failed.error == "bad path"
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self):
+        active = 0
+        peak = 0
+
+        async def func(reporter):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.02)
+            active -= 1
+            return {}
+
+        manager = JobManager(max_concurrent=2)
+        records = [await manager.submit("mineru_ingestion", func) for _ in range(5)]
+        for record in records:
+            await _wait(manager, record.job_id)
+
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_events_are_published_and_mirrored(self):
+        publisher = AsyncMock()
+        redis_client = AsyncMock()
+
+        async def func(reporter):
+            await reporter.stage("writing", {"chunks": 2})
+            return {"ok": True}
+
+        manager = JobManager(publisher=publisher, redis_client=redis_client)
+        record = await manager.submit("mineru_ingestion", func)
+        await _wait(manager, record.job_id)
+
+        message_types = [call.kwargs["message_type"] for call in publisher.publish_node_output.await_args_list]
+        assert message_types == ["start", "output", "output", "complete"]
+        key, payload = redis_client.set.await_args.args
+        assert key == f"job:{record.job_id}"
+        assert json.loads(payload)["status"] == "succeeded"
+
+    @pytest.mark.asyncio
+    async def test_get_falls_back_to_redis(self):
+        redis_client = AsyncMock()
+        redis_client.get.return_value = json.dumps(
+            {
+                "job_id": "abc",
+                "kind": "mineru_ingestion",
+                "status": "succeeded",
+                "stage": "completed",
+                "progress": {},
+                "result": {"chunks_created": 1},
+                "error": None,
+                "params": {},
+                "created_at": 1.0,
+                "updated_at": 2.0,
+            }
+        )
+
+        manager = JobManager(redis_client=redis_client)
+        record = await manager.get("abc")
+
+        assert record.status == "succeeded"
+        redis_client.get.assert_awaited_once_with("job:abc")
@@ -0,0 +1,76 @@
+"""Unit tests for metadata pre-filtered retrieval."""
+
+from __future__ import annotations
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from agent.vectorstore import _metadata_filter_sql, ensure_metadata_indexes
+from tools.retrieval import _build_metadata_filter, _cache_params_key
+
+
+class TestMetadataFilterSql:
+    """测试元数据过滤条件到 SQL 的转换。"""
+
+    def test_empty_filter(self):
+        clause, params = _metadata_filter_sql(None)
+        assert clause.as_string(None) == ""
+        assert params == {}
+
+    def test_indexed_keys_use_expression_predicates(self):
+        clause, params = _metadata_filter_sql({"source": "象量科技BP", "document_type": None})
+        assert clause.as_string(None) == "AND e.cmetadata->>'source' = ANY(%(filter_source)s)"
+        assert params == {"filter_source": ["象量科技BP"]}
+
+    def test_list_values(self):
+        _, params = _metadata_filter_sql({"source": ["a", "b"]})
+        assert params["filter_source"] == ["a", "b"]
+
+    def test_other_keys_use_containment(self):
+        clause, params = _metadata_filter_sql({"chunk_id": 3})
+        assert "e.cmetadata @> %(filter_contains)s::jsonb" in clause.as_string(None)
+        assert params["filter_contains"].obj == {"chunk_id": 3}
+
+
+class TestEnsureMetadataIndexes:
+    """测试元数据索引在事务外并发创建。"""
+
+    @pytest.mark.asyncio
+    async def test_indexes_are_built_concurrently_and_invalid_ones_rebuilt(self):
+        cur = AsyncMock()
+        # 表存在；source 索引为无效索引，document_type 索引不存在
+        cur.fetchone.side_effect = [("langchain_pg_embedding",), (True,), None]
+        conn = MagicMock()
+        conn.cursor.return_value.__aenter__ = AsyncMock(return_value=cur)
+        conn.cursor.return_value.__aexit__ = AsyncMock(return_value=False)
+        pool = MagicMock()
+        pool.connection.return_value.__aenter__ = AsyncMock(return_value=conn)
+        pool.connection.return_value.__aexit__ = AsyncMock(return_value=False)
+
+        with patch("agent.vectorstore.DatabaseManager.get_pool", AsyncMock(return_value=pool)):
+            await ensure_metadata_indexes()
+
+        statements = [
+            c.args[0] if isinstance(c.args[0], str) else c.args[0].as_string(None)
+            for c in cur.execute.await_args_list
+        ]
+        creates = [s for s in statements if "CREATE INDEX" in s]
+        assert len(creates) == 2
+        assert all("CREATE INDEX CONCURRENTLY IF NOT EXISTS" in s for s in creates)
+        assert 'DROP INDEX CONCURRENTLY IF EXISTS "ix_langchain_pg_embedding_meta_source"' in statements
+        conn.transaction.assert_not_called()
+
+
+class TestToolFilter:
+    """测试检索工具的过滤参数。"""
+
+    def test_no_arguments_means_no_filter(self):
+        assert _build_metadata_filter() is None
+        assert _build_metadata_filter(source="") is None
+
+    def test_filter_is_part_of_cache_key(self):
+        settings = MagicMock(rerank_enabled=False)
+        unfiltered = _cache_params_key(settings)
+        filtered = _cache_params_key(settings, _build_metadata_filter(source="a.pdf"))
+        assert unfiltered != filtered
@@ -0,0 +1,200 @@
+"""Unit tests for page-incremental PDF/PPTX conversion and its SSE endpoint."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pptx
+import pytest
+
+from api.routes.documents import process_markitdown, process_markitdown_pages
+from utils.markitdown_converter import ConvertedPage, SpooledUpload, iter_converted_pages
+import utils.page_extractors as page_extractors
+from utils.page_extractors import extract_page, page_count, supports_pages
+
+
+def _make_pdf(texts: list[str]) -> bytes:
+    """生成每页一行文本的最小 PDF."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", "", "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in texts:
+        stream = f"BT /F1 24 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {len(objects)} 0 R "
+            "/Resources << /Font << /F1 3 0 R >> >> >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(texts)} >>"
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+def _spooled(path, filename: str) -> SpooledUpload:
+    return SpooledUpload(filename=filename, path=str(path), size_bytes=1, digest="d" * 64)
+
+
+class TestPageExtractors:
+    """测试 PDF 按页、PPTX 按幻灯片提取。"""
+
+    def test_pdf_pages(self, tmp_path):
+        path = tmp_path / "long.pdf"
+        path.write_bytes(_make_pdf(["Page one", "Page two", "Page three"]))
+
+        assert page_count(str(path)) == 3
+        assert [extract_page(str(path), i) for i in range(3)] == ["Page one", "Page two", "Page three"]
+
+    def test_document_is_parsed_once_per_process(self, tmp_path):
+        path = tmp_path / "long.pdf"
+        path.write_bytes(_make_pdf(["Page one", "Page two"]))
+        load = MagicMock(wraps=page_extractors._load_document)
+        with patch("utils.page_extractors._load_document", load):
+            assert [extract_page(str(path), i) for i in range(2)] == ["Page one", "Page two"]
+            assert load.call_count == 1
+
+            path.write_bytes(_make_pdf(["Changed page", "Page two", "Page three"]))
+            assert extract_page(str(path), 0) == "Changed page"
+            assert load.call_count == 2
+        with pytest.raises(IndexError):
+            extract_page(str(path), 3)
+
+    def test_pptx_slides_match_markitdown_layout(self, tmp_path):
+        presentation = pptx.Presentation()
+        for i in range(2):
+            slide = presentation.slides.add_slide(presentation.slide_layouts[1])
+            slide.shapes.title.text = f"Title {i}"
+            slide.placeholders[1].text = f"Body {i}"
+        presentation.slides[1].notes_slide.notes_text_frame.text = "remember"
+        path = tmp_path / "deck.pptx"
+        presentation.save(path)
+
+        assert page_count(str(path)) == 2
+        assert extract_page(str(path), 0) == "<!-- Slide number: 1 -->\n# Title 0\nBody 0"
+        assert extract_page(str(path), 1).endswith("Body 1\n\n### Notes:\nremember")
+
+    def test_only_pdf_and_pptx_are_paged(self):
+        assert supports_pages("A.PDF") and supports_pages("deck.pptx")
+        assert not supports_pages("notes.docx")
+        with pytest.raises(ValueError):
+            page_count("notes.docx")
+
+
+class TestIterConvertedPages:
+    """测试逐页任务并发提交、按页码顺序产出。"""
+
+    @pytest.mark.asyncio
+    async def test_pages_yield_in_order_and_failures_do_not_stop(self, tmp_path):
+        delays = {0: 0.2, 1: 0.0, 2: 0.0}
+
+        async def run(path, index, timeout):
+            await asyncio.sleep(delays[index])
+            if index == 1:
+                raise asyncio.TimeoutError()
+            return f"page {index}"
+
+        pool = MagicMock(workers=2)
+        pool.run = AsyncMock(side_effect=run)
+        path = tmp_path / "doc.pdf"
+        path.write_bytes(b"%PDF")
+        with (
+            patch("utils.markitdown_converter.get_conversion_cache", return_value=None),
+            patch("utils.markitdown_converter.get_conversion_pool", return_value=pool),
+            patch("utils.markitdown_converter.page_count", return_value=3),
+        ):
+            pages = [p async for p in iter_converted_pages(_spooled(path, "doc.pdf"), timeout=5)]
+
+        assert [(p.page, p.total_pages, p.markdown) for p in pages] == [
+            (1, 3, "page 0"),
+            (2, 3, None),
+            (3, 3, "page 2"),
+        ]
+        assert "转换超时" in pages[1].error
+        assert pool.run.await_args_list[0].kwargs == {"timeout": 5}
+
+    @pytest.mark.asyncio
+    async def test_other_formats_convert_whole_file(self, tmp_path):
+        convert = AsyncMock(return_value=("# whole", 3.0))
+        with (
+            patch("utils.markitdown_converter.get_conversion_cache", return_value=None),
+            patch("utils.markitdown_converter.convert_file_to_markdown", convert),
+        ):
+            pages = [p async for p in iter_converted_pages(_spooled(tmp_path / "a.docx", "a.docx"))]
+
+        assert pages == [ConvertedPage(None, None, "# whole", 3.0)]
+
+
+class TestProcessMarkitdownPagesRoute:
+    """测试逐页 SSE 事件与最终汇总事件。"""
+
+    @pytest.mark.asyncio
+    async def test_emits_page_events_then_summary(self):
+        async def pages(upload, timeout):
+            yield ConvertedPage(1, 2, "# one", 1.0)
+            yield ConvertedPage(2, 2, None, 2.0, error="boom")
+
+        upload = MagicMock(filename="long.pdf", size=3)
+        upload.read = AsyncMock(side_effect=[b"pdf", b""])
+        upload.close = AsyncMock()
+        with (
+            patch("api.routes.documents.get_settings", return_value=MagicMock(markitdown_max_files=2)),
+            patch("api.routes.documents.iter_converted_pages", pages),
+        ):
+            response = await process_markitdown_pages([upload])
+            events = [json.loads(chunk[len("data: "):]) async for chunk in response.body_iterator]
+
+        assert [(e["type"], e["page"], e["markdown"]) for e in events[:2]] == [
+            ("page", 1, "# one"),
+            ("page", 2, None),
+        ]
+        summary = events[-1]
+        assert (summary["type"], summary["status"], summary["pages"]) == ("summary", "partial", 2)
+        assert (summary["failed_pages"], summary["size_bytes"]) == ([2], len("# one"))
+
+
+class TestProcessMarkitdownRoute:
+    """测试客户端断开时的转换任务清理。"""
+
+    @pytest.mark.asyncio
+    async def test_disconnect_waits_for_cancelled_conversions_before_cleanup(self):
+        spool_existed_on_cancel = []
+
+        async def convert(upload, timeout):
+            if upload.filename == "fast.txt":
+                return "fast", 1.0, False
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                # 模拟进程池终止工作进程所需的时间
+                await asyncio.sleep(0.05)
+                spool_existed_on_cancel.append(os.path.exists(upload.path))
+                raise
+
+        uploads = []
+        for filename in ("fast.txt", "slow.txt"):
+            upload = MagicMock(filename=filename, size=3)
+            upload.read = AsyncMock(side_effect=[b"abc", b""])
+            upload.close = AsyncMock()
+            uploads.append(upload)
+        with (
+            patch("api.routes.documents.get_settings", return_value=MagicMock(markitdown_max_files=2)),
+            patch("api.routes.documents.convert_spooled_upload", convert),
+        ):
+            response = await process_markitdown(uploads)
+            body = response.body_iterator
+            first = json.loads((await body.__anext__())[len("data: "):])
+            await body.aclose()
+
+        assert first["filename"] == "fast.txt"
+        assert spool_existed_on_cancel == [True]
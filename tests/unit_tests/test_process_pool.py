@@ -0,0 +1,164 @@
+"""Unit tests for the killable process worker pool and concurrent MarkItDown conversion."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import operator
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+from api.routes.documents import _validate_files, process_markitdown
+from infra.process_pool import ProcessWorkerPool, report_progress
+
+
+@asynccontextmanager
+async def _pool():
+    # operator.call 让每个任务自带要执行的函数：run(fn, *args)
+    pool = ProcessWorkerPool(operator.call, workers=1, name="test-pool")
+    try:
+        yield pool
+    finally:
+        await pool.shutdown()
+
+
+class TestProcessWorkerPool:
+    """测试任务分派、异常传递与超时终止。"""
+
+    @pytest.mark.asyncio
+    async def test_runs_tasks_and_reuses_worker(self):
+        async with _pool() as pool:
+            assert await pool.run(operator.add, 2, 3, timeout=30) == 5
+            first = next(iter(pool._all)).process.pid
+            assert await pool.run(os.getpid, timeout=30) == first
+
+            metrics = pool.metrics()
+            assert (metrics["completed"], metrics["restarts"], metrics["queue_depth"]) == (2, 0, 0)
+            assert metrics["duration_ms"]["samples"] == 2
+
+    @pytest.mark.asyncio
+    async def test_exceptions_propagate_without_restart(self):
+        async with _pool() as pool:
+            with pytest.raises(ValueError):
+                await pool.run(int, "not a number", timeout=30)
+            assert await pool.run(operator.mul, 4, 5, timeout=30) == 20
+            assert pool.metrics()["failed"] == 1
+            assert pool.metrics()["restarts"] == 0
+
+    @pytest.mark.asyncio
+    async def test_timeout_kills_worker_and_pool_recovers(self):
+        async with _pool() as pool:
+            await pool.run(operator.add, 0, 0, timeout=30)
+            with pytest.raises(asyncio.TimeoutError):
+                await pool.run(time.sleep, 30, timeout=0.5)
+
+            assert await pool.run(operator.add, 1, 1, timeout=30) == 2
+            metrics = pool.metrics()
+            assert (metrics["timeouts"], metrics["restarts"], metrics["alive"]) == (1, 1, 1)
+
+    @pytest.mark.asyncio
+    async def test_crashed_worker_is_replaced(self):
+        async with _pool() as pool:
+            with pytest.raises(RuntimeError, match="exited unexpectedly"):
+                await pool.run(os._exit, 3, timeout=30)
+            assert await pool.run(operator.add, 2, 2, timeout=30) == 4
+
+    @pytest.mark.asyncio
+    async def test_progress_messages_reach_callback(self):
+        seen = []
+
+        async def on_progress(data):
+            seen.append(data)
+
+        async with _pool() as pool:
+            # list(map(report_progress, ...)) 在工作进程中依次上报每个元素
+            result = await pool.run(list, map(report_progress, ["a", "b"]), timeout=30, on_progress=on_progress)
+            assert result == [None, None]
+            assert seen == ["a", "b"]
+            assert await pool.run(operator.add, 1, 1, timeout=30) == 2
+
+    @pytest.mark.asyncio
+    async def test_busy_pool_queues_tasks(self):
+        async with _pool() as pool:
+            await pool.run(operator.add, 0, 0, timeout=30)
+            first = asyncio.create_task(pool.run(time.sleep, 0.5, timeout=30))
+            await asyncio.sleep(0.1)
+            second = asyncio.create_task(pool.run(operator.add, 1, 2, timeout=30))
+            await asyncio.sleep(0.1)
+
+            assert pool.metrics()["queue_depth"] == 1
+            await first
+            assert await second == 3
+
+
+def _upload(name: str, content: bytes, size: Optional[int] = None) -> MagicMock:
+    upload = MagicMock(filename=name, size=len(content) if size is None else size)
+    chunks = [content[i : i + 4] for i in range(0, len(content), 4)]
+    upload.read = AsyncMock(side_effect=chunks + [b""])
+    upload.close = AsyncMock()
+    return upload
+
+
+class TestProcessMarkitdownRoute:
+    """测试多文件并发转换并按完成顺序推送。"""
+
+    @pytest.mark.asyncio
+    async def test_results_stream_as_completed_with_original_index(self):
+        delays = {"slow.txt": 0.3, "fast.txt": 0.0, "bad.txt": 0.1}
+
+        async def convert(upload, timeout):
+            filename = upload.filename
+            with open(upload.path, "rb") as f:
+                assert f.read() == b"x"
+            await asyncio.sleep(delays[filename])
+            if filename == "bad.txt":
+                raise ValueError("broken")
+            return f"# {filename}", 1.0, filename == "fast.txt"
+
+        settings = MagicMock(markitdown_max_files=3)
+        files = [_upload(name, b"x") for name in ("slow.txt", "fast.txt", "bad.txt")]
+        with (
+            patch("api.routes.documents.get_settings", return_value=settings),
+            patch("api.routes.documents.convert_spooled_upload", side_effect=convert),
+        ):
+            response = await process_markitdown(files)
+            events = [json.loads(chunk[len("data: "):]) async for chunk in response.body_iterator]
+
+        assert [(e["index"], e["filename"], e["status"]) for e in events] == [
+            (1, "fast.txt", "success"),
+            (2, "bad.txt", "error"),
+            (0, "slow.txt", "success"),
+        ]
+        assert [e["cache_hit"] for e in events] == [True, False, False]
+
+    @pytest.mark.asyncio
+    async def test_oversized_upload_is_rejected_while_spooling(self, tmp_path):
+        # content-length 未知（size=0）时，在落盘过程中按实际字节数检查
+        spool_dir = tmp_path / "spool"
+        spool_dir.mkdir()
+        settings = MagicMock(markitdown_max_files=2)
+        files = [_upload("big.txt", b"0123456789", size=0)]
+        with (
+            patch("api.routes.documents.get_settings", return_value=settings),
+            patch("api.routes.documents.MAX_FILE_SIZE", 8),
+            patch("api.routes.documents.tempfile.mkdtemp", return_value=str(spool_dir)),
+        ):
+            with pytest.raises(HTTPException) as exc:
+                await process_markitdown(files)
+
+        assert exc.value.status_code == 413
+        assert not spool_dir.exists()
+        files[0].close.assert_awaited_once()
+
+    def test_file_count_limit_is_configurable(self):
+        settings = MagicMock(markitdown_max_files=1)
+        with patch("api.routes.documents.get_settings", return_value=settings):
+            with pytest.raises(HTTPException) as exc:
+                _validate_files([_upload("a.txt", b"1"), _upload("b.txt", b"2")])
+        assert exc.value.status_code == 400
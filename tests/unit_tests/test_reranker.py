@@ -0,0 +1,104 @@
+"""Unit tests for the async DashScope reranker."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from langchain_core.documents import Document
+
+from utils.reranker import AsyncReranker
+
+
+def _docs() -> list[Document]:
+    return [
+        Document(id="a", page_content="alpha", metadata={"source": "bp"}),
+        Document(id="b", page_content="beta", metadata={"source": "bp"}),
+        Document(id="c", page_content="gamma", metadata={"source": "bp"}),
+    ]
+
+
+def _reranker(handler, **kwargs) -> AsyncReranker:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return AsyncReranker(model="qwen3-rerank", api_key="k", top_n=2, client=client, **kwargs)
+
+
+class TestAsyncReranker:
+    """测试 Rerank 客户端的排序、分数缓存与超时回退。"""
+
+    @pytest.mark.asyncio
+    async def test_orders_by_relevance_score(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            body = json.loads(request.content)
+            assert body["input"]["documents"] == ["alpha", "beta", "gamma"]
+            results = [
+                {"index": 0, "relevance_score": 0.1},
+                {"index": 1, "relevance_score": 0.9},
+                {"index": 2, "relevance_score": 0.5},
+            ]
+            return httpx.Response(200, json={"output": {"results": results}})
+
+        reranker = _reranker(handler)
+        ranked = await reranker.arerank("q", _docs())
+
+        assert [d.id for d in ranked] == ["b", "c"]
+        assert ranked[0].metadata["relevance_score"] == 0.9
+        assert "relevance_score" not in _docs()[1].metadata
+
+    @pytest.mark.asyncio
+    async def test_scores_are_cached_per_query_and_chunk(self):
+        requested: list[list[str]] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            documents = json.loads(request.content)["input"]["documents"]
+            requested.append(documents)
+            results = [{"index": i, "relevance_score": 0.5} for i in range(len(documents))]
+            return httpx.Response(200, json={"output": {"results": results}})
+
+        reranker = _reranker(handler)
+        await reranker.arerank("q", _docs()[:2])
+        await reranker.arerank("q", _docs())
+
+        assert requested == [["alpha", "beta"], ["gamma"]]
+        assert reranker.stats.cached_scores == 2
+
+    @pytest.mark.asyncio
+    async def test_cached_scores_are_not_shared_across_models(self):
+        requested: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            body = json.loads(request.content)
+            requested.append(body["model"])
+            documents = body["input"]["documents"]
+            results = [{"index": i, "relevance_score": 0.5} for i in range(len(documents))]
+            return httpx.Response(200, json={"output": {"results": results}})
+
+        reranker = _reranker(handler)
+        await reranker.arerank("q", _docs())
+        reranker.model = "gte-rerank-v2"
+        await reranker.arerank("q", _docs())
+
+        assert requested == ["qwen3-rerank", "gte-rerank-v2"]
+        assert reranker.stats.cached_scores == 0
+
+    @pytest.mark.asyncio
+    async def test_timeout_falls_back_to_vector_order(self):
+        async def handler(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(1)
+            return httpx.Response(200, json={"output": {"results": []}})
+
+        reranker = _reranker(handler, timeout_seconds=0.01)
+        ranked = await reranker.arerank("q", _docs())
+
+        assert [d.id for d in ranked] == ["a", "b"]
+        assert reranker.stats.timeouts == 1
+
+    @pytest.mark.asyncio
+    async def test_http_error_falls_back_to_vector_order(self):
+        reranker = _reranker(lambda request: httpx.Response(503))
+        ranked = await reranker.arerank("q", _docs())
+
+        assert [d.id for d in ranked] == ["a", "b"]
+        assert reranker.stats.errors == 1
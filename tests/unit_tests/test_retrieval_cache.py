@@ -0,0 +1,137 @@
+"""Unit tests for the semantic retrieval result cache."""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from agent.retrieval_cache import SemanticResultCache
+from tools.retrieval import _cache_params_key
+
+
+class TestSemanticResultCache:
+    """测试按余弦距离命中、按集合代数失效的语义缓存。"""
+
+    @pytest.mark.asyncio
+    async def test_hit_within_distance(self):
+        cache = SemanticResultCache(max_distance=0.05)
+        await cache.aset("bp", [1.0, 0.0], ("content", []), "k=4")
+
+        assert await cache.aget("bp", [0.99, 0.05], "k=4") == ("content", [])
+        assert cache.stats.hits == 1
+        assert cache.stats.last_hit_distance < 0.05
+
+    @pytest.mark.asyncio
+    async def test_miss_outside_distance(self):
+        cache = SemanticResultCache(max_distance=0.05)
+        await cache.aset("bp", [1.0, 0.0], "result", "k=4")
+
+        assert await cache.aget("bp", [0.0, 1.0], "k=4") is None
+        assert cache.stats.misses == 1
+
+    @pytest.mark.asyncio
+    async def test_collection_and_params_isolation(self):
+        cache = SemanticResultCache(max_distance=0.05)
+        await cache.aset("bp", [1.0, 0.0], "result", "k=4")
+
+        assert await cache.aget("other", [1.0, 0.0], "k=4") is None
+        assert await cache.aget("bp", [1.0, 0.0], "k=8") is None
+
+    @pytest.mark.asyncio
+    async def test_invalidate_collection_drops_entries(self):
+        cache = SemanticResultCache(max_distance=0.05)
+        await cache.aset("bp", [1.0, 0.0], "bp-result")
+        await cache.aset("other", [1.0, 0.0], "other-result")
+
+        cache.invalidate_collection("bp")
+
+        assert await cache.aget("bp", [1.0, 0.0]) is None
+        assert await cache.aget("other", [1.0, 0.0]) == "other-result"
+        assert await cache.current_generation("bp") == 1
+
+    @pytest.mark.asyncio
+    async def test_write_during_search_is_not_cached_as_fresh(self):
+        cache = SemanticResultCache(max_distance=0.05)
+        generation = await cache.current_generation("bp")
+
+        # 检索进行中发生写入
+        await cache.ainvalidate_collection("bp")
+        await cache.aset("bp", [1.0, 0.0], "stale", generation=generation)
+
+        assert await cache.aget("bp", [1.0, 0.0]) is None
+
+    @pytest.mark.asyncio
+    async def test_redis_generation_is_shared(self):
+        redis = AsyncMock()
+        redis.get.return_value = "3"
+        cache = SemanticResultCache(redis_client=redis)
+
+        assert await cache.current_generation("bp") == 3
+        await cache.ainvalidate_collection("bp")
+        redis.incr.assert_awaited_once_with("retrieval_cache:generation:bp")
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self):
+        cache = SemanticResultCache(max_distance=0.05, maxsize=1)
+        await cache.aset("bp", [1.0, 0.0], "first")
+        await cache.aset("bp", [0.0, 1.0], "second")
+
+        assert len(cache) == 1
+        assert await cache.aget("bp", [1.0, 0.0]) is None
+        assert cache.stats.evictions == 1
+
+
+def _retrieval_settings(**overrides) -> SimpleNamespace:
+    values = dict(
+        embeddings_model="text-embedding-v4",
+        embeddings_dimensions=1024,
+        embeddings_request_dimensions=True,
+        retrieval_mode="hybrid",
+        retriever_top_k=4,
+        hybrid_candidates=20,
+        hybrid_rrf_k=60,
+        hnsw_ef_search=0,
+        ivfflat_probes=0,
+        vector_iterative_scan="",
+        rerank_enabled=True,
+        rerank_model="gte-rerank",
+        rerank_top_n=3,
+        rerank_url=None,
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+class TestCacheParamsKey:
+    """测试影响检索结果的配置都参与缓存键。"""
+
+    @pytest.mark.parametrize(
+        "overrides",
+        [
+            {"embeddings_model": "text-embedding-v3"},
+            {"embeddings_dimensions": 512},
+            {"embeddings_request_dimensions": False},
+            {"retrieval_mode": "vector"},
+            {"retriever_top_k": 8},
+            {"hybrid_candidates": 40},
+            {"hybrid_rrf_k": 10},
+            {"hnsw_ef_search": 200},
+            {"ivfflat_probes": 10},
+            {"vector_iterative_scan": "relaxed_order"},
+            {"rerank_enabled": False},
+            {"rerank_model": "gte-rerank-v2"},
+            {"rerank_top_n": 5},
+            {"rerank_url": "http://rerank.local"},
+        ],
+    )
+    def test_setting_changes_key(self, overrides):
+        assert _cache_params_key(_retrieval_settings()) != _cache_params_key(
+            _retrieval_settings(**overrides)
+        )
+
+    def test_hybrid_parameters_ignored_in_vector_mode(self):
+        base = _retrieval_settings(retrieval_mode="vector")
+        changed = _retrieval_settings(retrieval_mode="vector", hybrid_rrf_k=10)
+        assert _cache_params_key(base) == _cache_params_key(changed)
@@ -0,0 +1,144 @@
+"""Unit tests for the streaming ingestion helpers."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from utils.mineru_processor import MineruProcessor
+from utils.streaming import (
+    aiter_batches_in_thread,
+    iter_json_array,
+    iter_rewritten_lines,
+    iter_split_text,
+)
+
+
+class TestMarkdownStreaming:
+    """测试逐行改写图片路径与滑动窗口切分。"""
+
+    def test_rewrites_image_paths_per_line(self, tmp_path):
+        path = tmp_path / "doc.md"
+        path.write_text("![](images/a.jpg) 文本\n无图片\n![](images/b.png)\n", encoding="utf-8")
+        counter = [0]
+
+        lines = list(iter_rewritten_lines(path, "/documents/images/", counter))
+
+        assert lines[0] == "![](/documents/images/a.jpg) 文本\n"
+        assert lines[2] == "![](/documents/images/b.png)\n"
+        assert counter == [2]
+
+    def test_windowed_split_covers_all_content(self):
+        lines = [f"第{i}段内容\n\n" for i in range(200)]
+        splitter = RecursiveCharacterTextSplitter(chunk_size=40, chunk_overlap=0)
+
+        chunks = list(iter_split_text(lines, splitter, window=120))
+
+        assert all(len(chunk) <= 40 for chunk in chunks)
+        joined = "".join(chunks)
+        assert all(f"第{i}段内容" in joined for i in range(200))
+        assert chunks == splitter.split_text("".join(lines))
+
+
+class TestJsonArrayStreaming:
+    """测试增量解析 content_list.json。"""
+
+    def test_matches_json_load_with_small_reads(self, tmp_path):
+        blocks = [{"type": "text", "text": f"块 {i} ,]", "page_idx": i} for i in range(50)]
+        path = tmp_path / "x_content_list.json"
+        path.write_text(json.dumps(blocks, ensure_ascii=False, indent=1), encoding="utf-8")
+
+        assert list(iter_json_array(path, read_size=7)) == blocks
+
+    def test_truncated_file_raises(self, tmp_path):
+        path = tmp_path / "x_content_list.json"
+        path.write_text('[{"type": "text"}, {"type": ', encoding="utf-8")
+
+        with pytest.raises(ValueError):
+            list(iter_json_array(path))
+
+
+class TestAsyncBatches:
+    """测试线程生成器到异步批次流的桥接。"""
+
+    @pytest.mark.asyncio
+    async def test_batches_in_order(self):
+        batches = [b async for b in aiter_batches_in_thread(lambda: range(7), 3)]
+        assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+    @pytest.mark.asyncio
+    async def test_producer_errors_propagate(self):
+        def produce():
+            yield 1
+            raise RuntimeError("bad block")
+
+        with pytest.raises(RuntimeError, match="bad block"):
+            async for _ in aiter_batches_in_thread(produce, 1):
+                pass
+
+    @pytest.mark.asyncio
+    async def test_producer_is_bounded_and_stops_early(self):
+        produced = []
+
+        def produce():
+            for i in range(1000):
+                produced.append(i)
+                yield i
+
+        async for _ in aiter_batches_in_thread(produce, 1, max_pending=2):
+            await asyncio.sleep(0.01)
+            break
+
+        assert len(produced) < 10
+
+
+class TestStreamingProcess:
+    """测试 aprocess 按批次嵌入写入。"""
+
+    @pytest.mark.asyncio
+    async def test_embeds_in_batches(self, tmp_path):
+        auto = tmp_path / "auto"
+        auto.mkdir()
+        (auto / "deck.md").write_text(
+            "".join(f"段落{i}\n\n" for i in range(10)), encoding="utf-8"
+        )
+        settings = MagicMock(
+            chunk_size=4,
+            chunk_overlap=0,
+            chunk_strategy="markdown",
+            frontend_image_prefix="/images",
+            embedding_batch_size=2,
+            embedding_concurrency=2,
+            retrieval_cache_enabled=False,
+        )
+        with patch("utils.mineru_processor.get_settings", return_value=settings):
+            processor = MineruProcessor()
+        pipeline = MagicMock()
+        pipeline.aembed_documents = AsyncMock(side_effect=lambda docs, _: [[0.0]] * len(docs))
+        store = MagicMock()
+        stages = []
+
+        async def on_stage(stage, data):
+            stages.append(stage)
+
+        with (
+            patch("utils.mineru_processor.afetch_source_chunks", AsyncMock(return_value={})),
+            patch("utils.mineru_processor.get_embedding_pipeline", return_value=pipeline),
+            patch("utils.mineru_processor.get_vector_store", return_value=store),
+            patch("utils.mineru_processor.aupdate_chunk_metadata", AsyncMock(return_value=0)),
+            patch("utils.mineru_processor.adelete_chunks", AsyncMock(return_value=0)),
+        ):
+            result = await processor.aprocess(
+                str(tmp_path), embed=True, collection_name="c", on_stage=on_stage
+            )
+
+        assert result["chunks_created"] == 10
+        assert result["chunks_embedded"] == 10
+        assert [len(call.args[0]) for call in pipeline.aembed_documents.await_args_list] == [4, 4, 2]
+        assert store.add_embeddings.call_count == 3
+        assert stages.count("writing") == 3
+        assert stages[-1] == "cleanup"
@@ -0,0 +1,262 @@
+"""Unit tests for the per-thread uploaded document index and its retrieval tool."""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from agent.thread_documents import (
+    INDEXED_UPLOADS_KWARG,
+    PGVectorThreadStore,
+    ThreadDocumentIndex,
+    has_indexed_uploads,
+)
+from api.routes.chat import _build_document_section, _stream_workflow_to_redis
+from api.schemas import DocumentMetadata
+from tools.uploaded_documents import search_uploaded_documents
+
+_TOPICS = ("revenue", "team", "patent")
+
+
+def _vector(text: str) -> list[float]:
+    """按关键词出现次数生成的可预测向量。"""
+    return [float(text.count(topic)) + 0.01 for topic in _TOPICS]
+
+
+def _index(**kwargs) -> tuple[ThreadDocumentIndex, AsyncMock]:
+    embed = AsyncMock(side_effect=lambda chunks: [_vector(c.page_content) for c in chunks])
+    return ThreadDocumentIndex(embed, chunk_size=40, chunk_overlap=0, **kwargs), embed
+
+
+def _doc(filename: str, content: str) -> SimpleNamespace:
+    return SimpleNamespace(filename=filename, format="pdf", markdown_content=content)
+
+
+class TestThreadDocumentIndex:
+    """测试分块嵌入、按会话隔离检索与淘汰。"""
+
+    @pytest.mark.asyncio
+    async def test_search_returns_relevant_chunks_per_thread(self):
+        index, _ = _index()
+        content = "revenue revenue grew fast.\n\nteam has ten people.\n\npatent patent filed."
+        assert await index.aadd_documents("t1", [_doc("bp.pdf", content)]) == 3
+
+        hits = index.search("t1", _vector("patent"), k=2)
+        assert "patent" in hits[0][0].page_content
+        assert hits[0][0].metadata["source"] == "bp.pdf"
+        assert hits[0][1] >= hits[1][1]
+        assert index.search("t2", _vector("patent")) == []
+        assert index.filenames("t1") == ["bp.pdf"]
+
+    @pytest.mark.asyncio
+    async def test_same_document_is_embedded_once(self):
+        index, embed = _index()
+        doc = _doc("bp.pdf", "revenue grew fast.")
+        await index.aadd_documents("t1", [doc, doc])
+        assert await index.aadd_documents("t1", [_doc("copy.pdf", doc.markdown_content)]) == 0
+
+        embed.assert_awaited_once()
+        assert len(index.search("t1", _vector("revenue"), k=10)) == 1
+
+    @pytest.mark.asyncio
+    async def test_least_recently_used_thread_is_evicted(self):
+        index, _ = _index(max_threads=2)
+        for thread_id in ("a", "b"):
+            await index.aadd_documents(thread_id, [_doc(f"{thread_id}.pdf", f"team {thread_id}")])
+        assert index.has_documents("a")  # 访问 a，使 b 成为最久未使用
+        await index.aadd_documents("c", [_doc("c.pdf", "team c")])
+
+        assert (index.has_documents("a"), index.has_documents("b"), index.has_documents("c")) == (
+            True,
+            False,
+            True,
+        )
+
+    @pytest.mark.asyncio
+    async def test_idle_threads_expire(self):
+        index, _ = _index(ttl_seconds=10)
+        with patch("agent.thread_documents.time.monotonic", return_value=100.0):
+            await index.aadd_documents("t1", [_doc("bp.pdf", "team")])
+        with patch("agent.thread_documents.time.monotonic", return_value=111.0):
+            assert not index.has_documents("t1")
+        assert len(index) == 0
+
+
+class _MemoryStore:
+    """以字典模拟会话集合的持久化存储。"""
+
+    def __init__(self) -> None:
+        self.rows: dict[str, list] = {}
+
+    async def aadd(self, thread_id, chunks, vectors):
+        self.rows.setdefault(thread_id, []).extend(zip(chunks, vectors))
+        return len(chunks)
+
+    async def aload(self, thread_id):
+        return [(doc.model_copy(deep=True), list(vector)) for doc, vector in self.rows.get(thread_id, [])]
+
+    async def aexists(self, thread_id):
+        return thread_id in self.rows
+
+    async def adrop(self, thread_id):
+        self.rows.pop(thread_id, None)
+
+
+class TestPersistentStore:
+    """测试内存索引失效后从会话的 PGVector 集合加载。"""
+
+    @pytest.mark.asyncio
+    async def test_restart_then_upload_keeps_earlier_documents(self):
+        store = _MemoryStore()
+        index, _ = _index(store=store)
+        await index.aadd_documents("t1", [_doc("first.pdf", "patent patent filed.")])
+
+        restarted, embed = _index(store=store)  # 重启 / 淘汰 / 其他 worker：内存为空
+        await restarted.aadd_documents("t1", [_doc("second.pdf", "team of ten.")])
+        assert await restarted.aadd_documents("t1", [_doc("again.pdf", "patent patent filed.")]) == 0
+
+        hits = await restarted.asearch("t1", _vector("patent"), k=2)
+        assert hits[0][0].metadata["source"] == "first.pdf"
+        assert restarted.filenames("t1") == ["first.pdf", "second.pdf"]
+        # 已持久化的文档不会重新嵌入
+        assert [c.page_content for c in embed.await_args.args[0]] == ["team of ten."]
+        assert len(store.rows["t1"]) == 2
+
+    @pytest.mark.asyncio
+    async def test_search_and_drop_use_store_after_eviction(self):
+        store = _MemoryStore()
+        index, _ = _index(store=store)
+        await index.aadd_documents("t1", [_doc("bp.pdf", "team")])
+        index.drop("t1")
+
+        assert await index.ahas_documents("t1")
+        assert (await index.asearch("t1", _vector("team")))[0][0].page_content == "team"
+        await index.adrop("t1")
+        assert not await index.ahas_documents("t1") and store.rows == {}
+
+    @pytest.mark.asyncio
+    async def test_persist_failure_keeps_memory_index(self):
+        store = MagicMock(aadd=AsyncMock(side_effect=RuntimeError("db down")))
+        index, _ = _index(store=store)
+        assert await index.aadd_documents("t1", [_doc("bp.pdf", "team")]) == 1
+        assert index.has_documents("t1")
+
+    @pytest.mark.asyncio
+    async def test_store_writes_stable_ids_to_thread_collection(self):
+        index, _ = _index()
+        await index.aadd_documents("t1", [_doc("bp.pdf", "revenue.\n\nteam of ten people.")])
+        chunks = index._threads["t1"].chunks
+        copy = AsyncMock(return_value=len(chunks))
+        with patch("agent.thread_documents.acopy_embeddings", copy):
+            await PGVectorThreadStore().aadd("t1", chunks, [[1.0]] * len(chunks))
+            await PGVectorThreadStore().aadd("t1", chunks, [[1.0]] * len(chunks))
+
+        first, second = copy.await_args_list
+        assert first.kwargs["collection_name"] == "thread_docs_t1"
+        assert first.args[3] == second.args[3] and len(set(first.args[3])) == len(chunks)
+
+
+class TestSearchUploadedDocumentsTool:
+    """测试工具从配置中读取 thread_id。"""
+
+    @pytest.mark.asyncio
+    async def test_searches_index_of_configured_thread(self):
+        index, _ = _index()
+        content = "revenue grew very fast this year.\n\nteam of ten engineers here."
+        await index.aadd_documents("t1", [_doc("bp.pdf", content)])
+        settings = MagicMock(thread_docs_top_k=1)
+        with (
+            patch("tools.uploaded_documents.get_thread_document_index", return_value=index),
+            patch("tools.uploaded_documents.aembed_query", AsyncMock(return_value=_vector("team"))),
+            patch("tools.uploaded_documents.get_settings", return_value=settings),
+        ):
+            output, artifact = await search_uploaded_documents.coroutine(
+                "who is on the team", {"configurable": {"thread_id": "t1"}}
+            )
+            empty, none = await search_uploaded_documents.coroutine(
+                "who is on the team", {"configurable": {"thread_id": "other"}}
+            )
+
+        assert [doc.page_content for doc in artifact] == ["team of ten engineers here."]
+        assert "Relevance Score" in output
+        assert none == [] and "没有可检索的上传文档" in empty
+
+
+class TestBuildDocumentSection:
+    """测试大文档不再整篇拼进用户消息。"""
+
+    def test_large_documents_are_replaced_by_marker(self):
+        settings = MagicMock(thread_docs_enabled=True, thread_docs_inline_max_chars=20)
+        small = DocumentMetadata(filename="note.txt", format="txt", markdown_content="short note")
+        large = DocumentMetadata(filename="bp.pdf", format="pdf", markdown_content="x" * 500)
+        with patch("api.routes.chat.get_settings", return_value=settings):
+            section, to_index = _build_document_section([small, large])
+
+        assert to_index == [large]
+        assert "short note" in section
+        assert "x" * 500 not in section
+        assert '<document index="1" filename="bp.pdf" format="pdf">' in section
+
+    def test_disabled_keeps_full_content(self):
+        settings = MagicMock(thread_docs_enabled=False, thread_docs_inline_max_chars=20)
+        large = DocumentMetadata(filename="bp.pdf", format="pdf", markdown_content="x" * 500)
+        with patch("api.routes.chat.get_settings", return_value=settings):
+            section, to_index = _build_document_section([large])
+
+        assert to_index == []
+        assert "x" * 500 in section
+
+
+class TestHasIndexedUploads:
+    """测试根据用户消息的结构化标记（而非消息文本）提供检索工具。"""
+
+    def test_only_structured_marker_counts(self):
+        marked = HumanMessage("summarize", additional_kwargs={INDEXED_UPLOADS_KWARG: ["bp.pdf"]})
+        typed = HumanMessage('[500 characters, indexed for retrieval.] <document index="0">')
+
+        assert has_indexed_uploads([marked, HumanMessage("and?")])
+        assert not has_indexed_uploads([typed])
+
+
+class TestIndexingFailureFallback:
+    """测试检索索引建立失败时改为截断附带全文，聊天不中断。"""
+
+    @pytest.mark.asyncio
+    async def test_failed_indexing_inlines_truncated_document(self):
+        settings = MagicMock(thread_docs_enabled=True, thread_docs_inline_max_chars=20)
+        large = DocumentMetadata(filename="bp.pdf", format="pdf", markdown_content="x" * 500)
+        with patch("api.routes.chat.get_settings", return_value=settings):
+            fallback_section, to_index = _build_document_section([large], index_large=False)
+        assert to_index == [] and "x" * 20 + "\n[Truncated" in fallback_section
+        assert "x" * 21 not in fallback_section
+
+        inputs = []
+
+        async def astream(workflow_input, config, stream_mode):
+            inputs.append(workflow_input)
+            return
+            yield
+
+        index = MagicMock(aadd_documents=AsyncMock(side_effect=RuntimeError("embedding down")))
+        publisher = AsyncMock()
+        fallback = {"messages": [{"role": "user", "content": "q" + fallback_section}]}
+        with (
+            patch("api.routes.chat.get_settings", return_value=MagicMock(workflow_timeout_seconds=5)),
+            patch("api.routes.chat.get_thread_document_index", return_value=index),
+        ):
+            await _stream_workflow_to_redis(
+                graph=MagicMock(astream=astream),
+                payload={"messages": []},
+                config={},
+                thread_id="t1",
+                publisher=publisher,
+                documents=[large],
+                fallback_payload=fallback,
+            )
+
+        assert inputs == [fallback]
+        publisher.publish_workflow_complete.assert_awaited_once()
+        publisher.publish_workflow_error.assert_not_awaited()
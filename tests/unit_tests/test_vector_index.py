@@ -0,0 +1,226 @@
+"""Unit tests for per-collection ANN index management."""
+
+from __future__ import annotations
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from agent.vectorstore import _apply_search_params, asimilarity_search_by_vector_with_score
+from psycopg import sql
+
+from db.vector_index import (
+    IndexLayout,
+    IndexReport,
+    _build_parser,
+    _index_sql,
+    ann_distance,
+    create_collection_index,
+    embedding_expression,
+    index_name_for,
+)
+
+COLLECTION_ID = "1b4e28ba-2fa1-11d2-883f-0016d3cca427"
+
+
+class TestIndexSql:
+    """测试索引 DDL 与检索表达式。"""
+
+    def test_index_name_is_stable_and_short(self):
+        name = index_name_for(COLLECTION_ID, "hnsw")
+        assert name == "ix_lpe_hnsw_1b4e28ba2fa1"
+        assert len(name) < 63
+
+    def test_hnsw_partial_index(self):
+        ddl = _index_sql(
+            "ix", COLLECTION_ID, "hnsw", 1024, {"m": 16, "ef_construction": 64}
+        ).as_string(None)
+        assert "CREATE INDEX CONCURRENTLY" in ddl
+        assert "USING hnsw ((embedding::vector(1024)) vector_cosine_ops)" in ddl
+        assert "m = 16, ef_construction = 64" in ddl
+        assert f"WHERE collection_id = '{COLLECTION_ID}'" in ddl
+
+    def test_ivfflat_lists(self):
+        ddl = _index_sql("ix", COLLECTION_ID, "ivfflat", 768, {"lists": 100}).as_string(None)
+        assert "USING ivfflat ((embedding::vector(768))" in ddl
+        assert "lists = 100" in ddl
+
+    def test_search_expression_matches_index_expression(self):
+        assert embedding_expression(1024, "vector").as_string(None) == "e.embedding::vector(1024)"
+
+    def test_no_index_means_no_dimension_cast(self):
+        assert embedding_expression().as_string(None) == "e.embedding"
+        distance = ann_distance(sql.Placeholder("embedding")).as_string(None)
+        assert distance == "e.embedding <=> %(embedding)s::vector"
+
+    def test_halfvec_index(self):
+        ddl = _index_sql(
+            "ix", COLLECTION_ID, "hnsw", 512, {"m": 16, "ef_construction": 64}, "halfvec"
+        ).as_string(None)
+        assert "USING hnsw ((embedding::halfvec(512)) halfvec_cosine_ops)" in ddl
+
+    def test_binary_index_and_distance(self):
+        ddl = _index_sql("ix", COLLECTION_ID, "hnsw", 1024, {"m": 16, "ef_construction": 64}, "binary")
+        assert (
+            "((binary_quantize(embedding::vector(1024))::bit(1024)) bit_hamming_ops)"
+            in ddl.as_string(None)
+        )
+        distance = ann_distance(sql.Placeholder("embedding"), 1024, "binary").as_string(None)
+        assert distance == (
+            "binary_quantize(e.embedding::vector(1024))::bit(1024) <~> "
+            "binary_quantize(%(embedding)s::vector(1024))::bit(1024)"
+        )
+
+    def test_cli_arguments(self):
+        args = _build_parser().parse_args(
+            ["rebuild", "--collection", "bp_pdf", "--method", "ivfflat", "--lists", "50"]
+        )
+        assert args.command == "rebuild"
+        assert args.method == "ivfflat"
+        assert args.lists == 50
+        assert args.storage is None
+
+
+class TestSearchParams:
+    """测试查询时 ANN 参数设置。"""
+
+    @pytest.mark.asyncio
+    async def test_defaults_leave_server_settings(self):
+        cur = AsyncMock()
+        with patch("agent.vectorstore.get_settings") as settings:
+            settings.return_value.hnsw_ef_search = 0
+            settings.return_value.ivfflat_probes = 0
+            await _apply_search_params(cur, k=4)
+        cur.execute.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_ef_search_is_at_least_k(self):
+        cur = AsyncMock()
+        with patch("agent.vectorstore.get_settings"):
+            await _apply_search_params(cur, k=100, ef_search=40, probes=10)
+        calls = [c.args for c in cur.execute.await_args_list]
+        assert calls[0] == ("SELECT set_config('hnsw.ef_search', %s, true)", ("100",))
+        assert calls[1] == ("SELECT set_config('ivfflat.probes', %s, true)", ("10",))
+
+
+def _fake_pool(cur):
+    conn = MagicMock()
+    conn.transaction.return_value.__aenter__ = AsyncMock()
+    conn.transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+    conn.cursor.return_value.__aenter__ = AsyncMock(return_value=cur)
+    conn.cursor.return_value.__aexit__ = AsyncMock(return_value=False)
+    pool = MagicMock()
+    pool.connection.return_value.__aenter__ = AsyncMock(return_value=conn)
+    pool.connection.return_value.__aexit__ = AsyncMock(return_value=False)
+    return pool
+
+
+class TestQuantizedSearch:
+    """测试量化索引检索：按量化距离取候选，按全精度距离重排。"""
+
+    @pytest.mark.asyncio
+    async def test_binary_storage_rescores_candidates(self):
+        cur = AsyncMock()
+        cur.fetchall.return_value = [("id1", "doc", {}, 0.1)]
+        settings = MagicMock(
+            vector_storage="binary",
+            vector_rescore_factor=4,
+            embeddings_dimensions=3,
+            retriever_top_k=2,
+            vector_iterative_scan="",
+            hnsw_ef_search=0,
+            ivfflat_probes=0,
+        )
+
+        with (
+            patch("agent.vectorstore.get_settings", return_value=settings),
+            patch("db.vector_index.get_settings", return_value=settings),
+            patch("agent.vectorstore.resolve_collection_name", return_value="c"),
+            patch("agent.vectorstore.aget_collection_id", AsyncMock(return_value=COLLECTION_ID)),
+            patch(
+                "agent.vectorstore.aget_index_layout",
+                AsyncMock(return_value=IndexLayout(dimensions=3, storage="binary")),
+            ),
+            patch(
+                "agent.vectorstore.DatabaseManager.get_pool",
+                AsyncMock(return_value=_fake_pool(cur)),
+            ),
+        ):
+            results = await asimilarity_search_by_vector_with_score([0.1, 0.2, 0.3], collection_name="c")
+
+        query, params = cur.execute.await_args.args
+        text = query.as_string(None)
+        assert "ORDER BY binary_quantize(e.embedding::vector(3))::bit(3) <~>" in text
+        assert "e.embedding::vector(3) <=> %(embedding)s::vector(3) AS distance" in text
+        assert (params["k"], params["candidates"]) == (2, 8)
+        assert results[0][1] == 0.1
+
+    @pytest.mark.asyncio
+    async def test_collection_without_index_is_not_cast_or_rescored(self):
+        cur = AsyncMock()
+        cur.fetchall.return_value = []
+        settings = MagicMock(
+            vector_rescore_factor=4,
+            retriever_top_k=2,
+            vector_iterative_scan="",
+            hnsw_ef_search=0,
+            ivfflat_probes=0,
+        )
+
+        with (
+            patch("agent.vectorstore.get_settings", return_value=settings),
+            patch("agent.vectorstore.resolve_collection_name", return_value="c"),
+            patch("agent.vectorstore.aget_collection_id", AsyncMock(return_value=COLLECTION_ID)),
+            patch("agent.vectorstore.aget_index_layout", AsyncMock(return_value=None)),
+            patch(
+                "agent.vectorstore.DatabaseManager.get_pool",
+                AsyncMock(return_value=_fake_pool(cur)),
+            ),
+        ):
+            await asimilarity_search_by_vector_with_score([0.1, 0.2, 0.3], collection_name="c")
+
+        query, params = cur.execute.await_args.args
+        text = query.as_string(None)
+        assert "::vector(" not in text
+        assert "ORDER BY e.embedding <=> %(embedding)s::vector" in text
+        assert params["candidates"] == 2
+
+
+class TestCreateCollectionIndex:
+    """测试重建索引时清理旧索引与会话级参数。"""
+
+    @pytest.mark.asyncio
+    async def test_rebuild_drops_other_methods_and_resets_work_mem(self):
+        cur = AsyncMock()
+        stale = index_name_for(COLLECTION_ID, "hnsw")
+        cur.fetchone.side_effect = [(1000,), (False,)]
+        cur.fetchall.return_value = [(stale,)]
+        name = index_name_for(COLLECTION_ID, "ivfflat")
+        report = IndexReport(name, "c", "ivfflat", {}, 3, 1, 0.1, 1000, None, True)
+
+        with (
+            patch("db.vector_index.aget_collection_id", AsyncMock(return_value=COLLECTION_ID)),
+            patch("db.vector_index.index_report", AsyncMock(return_value=[report])),
+            patch(
+                "db.vector_index.DatabaseManager.get_pool",
+                AsyncMock(return_value=_fake_pool(cur)),
+            ),
+        ):
+            result = await create_collection_index(
+                "c",
+                "ivfflat",
+                dimensions=3,
+                storage="vector",
+                maintenance_work_mem="1GB",
+                replace=True,
+            )
+
+        statements = [
+            c.args[0] if isinstance(c.args[0], str) else c.args[0].as_string(None)
+            for c in cur.execute.await_args_list
+        ]
+        assert result is report
+        assert statements.index("RESET maintenance_work_mem") > next(
+            i for i, s in enumerate(statements) if s.startswith("CREATE INDEX CONCURRENTLY")
+        )
+        assert f'DROP INDEX CONCURRENTLY IF EXISTS "{stale}"' in statements